@@ -0,0 +1,356 @@
+"""
+Debt Amortization
+Builds a debt's repayment schedule from its current state (remaining
+balance, annual interest rate, EMI and EMI day of month). Every installment
+is computed at once with NumPy from the closed-form annuity balance,
+so even a 30-year schedule is a handful of array operations. The payoff
+strategy simulator steps month by month, but over arrays of all debts.
+
+Schedules are cached per debt. The cached entry remembers the inputs it was
+built from and is rebuilt if they (or today's date) change. Updating,
+paying or deleting a debt through the ORM also evicts it right away.
+"""
+
+import os
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import event
+
+from .cache import TTLCache
+from .models import Debt
+
+# 100 years of monthly installments
+MAX_INSTALLMENTS = 1200
+
+SCHEDULE_CACHE_TTL_SECONDS = float(os.getenv("SCHEDULE_CACHE_TTL_SECONDS", "3600"))
+SCHEDULE_CACHE_MAX_SIZE = int(os.getenv("SCHEDULE_CACHE_MAX_SIZE", "10000"))
+
+schedule_cache = TTLCache(maxsize=SCHEDULE_CACHE_MAX_SIZE, ttl=SCHEDULE_CACHE_TTL_SECONDS, name="debt_schedules")
+
+
+@dataclass(frozen=True)
+class Schedule:
+    """One row per installment; all arrays have the same length"""
+    dates: np.ndarray  # datetime64[D]
+    payment: np.ndarray
+    interest: np.ndarray
+    principal: np.ndarray
+    balance: np.ndarray  # balance after the installment
+    pays_off: bool
+
+    @property
+    def installments(self) -> int:
+        return len(self.payment)
+
+    @property
+    def payoff_date(self) -> Optional[date]:
+        if not self.pays_off or not self.installments:
+            return None
+        return self.dates[-1].astype(date)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "installments": self.installments,
+            "pays_off": self.pays_off,
+            "payoff_date": self.payoff_date,
+            "total_interest": round(float(self.interest.sum()), 2),
+            "total_paid": round(float(self.payment.sum()), 2),
+        }
+
+    def rows(self) -> List[Dict[str, Any]]:
+        dates = self.dates.astype(date)
+        payment, interest, principal, balance = (
+            np.round(a, 2).tolist() for a in (self.payment, self.interest, self.principal, self.balance)
+        )
+        return [
+            {
+                "installment": i + 1,
+                "date": dates[i],
+                "payment": payment[i],
+                "interest": interest[i],
+                "principal": principal[i],
+                "balance": balance[i],
+            }
+            for i in range(self.installments)
+        ]
+
+
+def installment_dates(emi_day: int, from_date: date, count: int) -> np.ndarray:
+    """
+    The next `count` due dates on or after from_date.
+    emi_day is clamped to the month's length (e.g. 31 -> 28 Feb).
+    """
+    first_month = np.datetime64(from_date, "M")
+    months = first_month + np.arange(count + 1)
+    month_starts = months.astype("datetime64[D]")
+    month_lengths = ((months + 1).astype("datetime64[D]") - month_starts).astype(int)
+    dates = month_starts + (np.minimum(emi_day, month_lengths) - 1)
+    # Skip this month's due date if it has already passed
+    start = 1 if dates[0] < np.datetime64(from_date, "D") else 0
+    return dates[start:start + count]
+
+
+def compute_schedule(
+    balance: float,
+    annual_rate: float,
+    emi: float,
+    emi_day: int,
+    from_date: date,
+    max_installments: int = MAX_INSTALLMENTS,
+) -> Schedule:
+    """
+    Amortize `balance` at annual_rate percent with a fixed monthly emi.
+    If the EMI doesn't cover the monthly interest the debt never pays off;
+    the schedule is then empty with pays_off=False.
+    """
+    r = annual_rate / 1200.0
+    empty = np.array([], dtype=float)
+    if balance <= 0:
+        return Schedule(np.array([], dtype="datetime64[D]"), empty, empty, empty, empty, pays_off=True)
+    if emi <= balance * r or emi <= 0:
+        return Schedule(np.array([], dtype="datetime64[D]"), empty, empty, empty, empty, pays_off=False)
+
+    if r > 0:
+        n = int(np.ceil(np.log(emi / (emi - r * balance)) / np.log1p(r) - 1e-9))
+    else:
+        n = int(np.ceil(balance / emi - 1e-9))
+    n = max(1, min(n, max_installments))
+
+    k = np.arange(n)
+    if r > 0:
+        growth = (1 + r) ** k
+        opening = balance * growth - emi * (growth - 1) / r
+    else:
+        opening = balance - emi * k
+    opening = np.maximum(opening, 0.0)
+    interest = opening * r
+    payment = np.minimum(emi, opening + interest)
+    principal = payment - interest
+    closing = np.maximum(opening - principal, 0.0)
+
+    return Schedule(
+        dates=installment_dates(emi_day, from_date, n),
+        payment=payment,
+        interest=interest,
+        principal=principal,
+        balance=closing,
+        pays_off=bool(closing[-1] < 0.005),
+    )
+
+
+def debt_schedule(debt: Debt, today: Optional[date] = None) -> Schedule:
+    """Cached schedule for a debt from today (or its start date if later)"""
+    today = today or date.today()
+    from_date = max(today, debt.start_date)
+    # Amounts are numeric (Decimal) in the database; the schedule math is float
+    balance = 0.0 if debt.status == "paid" else float(debt.remaining_amount)
+    inputs = (balance, debt.interest_rate, float(debt.emi_amount), debt.emi_date, from_date)
+
+    cached = schedule_cache.get(debt.id)
+    if cached is not None and cached[0] == inputs:
+        return cached[1]
+    schedule = compute_schedule(*inputs)
+    schedule_cache.set(debt.id, (inputs, schedule))
+    return schedule
+
+
+def project_debts(debts: List[Debt], today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Schedules for all of a user's debts plus a combined month-by-month
+    timeline of total payments and outstanding balance.
+    """
+    today = today or date.today()
+    schedules = [(debt, debt_schedule(debt, today)) for debt in debts]
+
+    items = [
+        {"debt_id": debt.id, "name": debt.name, "remaining_amount": debt.remaining_amount, **schedule.summary()}
+        for debt, schedule in schedules
+    ]
+    active = [(debt, s) for debt, s in schedules if s.installments]
+
+    timeline: List[Dict[str, Any]] = []
+    if active:
+        start = min(s.dates[0].astype("datetime64[M]") for _, s in active)
+        end = max(s.dates[-1].astype("datetime64[M]") for _, s in active)
+        months = int((end - start).astype(int)) + 1
+        payments = np.zeros(months)
+        balances = np.zeros(months)
+        for debt, s in active:
+            offset = int((s.dates[0].astype("datetime64[M]") - start).astype(int))
+            payments[offset:offset + s.installments] += s.payment
+            # Untouched before the first installment, zero after the last
+            balances[:offset] += float(debt.remaining_amount)
+            balances[offset:offset + s.installments] += s.balance
+        labels = (start + np.arange(months)).astype(str).tolist()
+        timeline = [
+            {"month": label, "payment": payment, "balance": balance}
+            for label, payment, balance in zip(labels, np.round(payments, 2).tolist(), np.round(balances, 2).tolist())
+        ]
+
+    never = [item for item in items if not item["pays_off"]]
+    payoff_dates = [item["payoff_date"] for item in items if item["payoff_date"]]
+    return {
+        "debts": items,
+        "total_remaining": round(sum(d.remaining_amount for d in debts if d.status != "paid"), 2),
+        "total_interest": round(sum(item["total_interest"] for item in items), 2),
+        "monthly_emi": round(sum(d.emi_amount for d, s in active), 2),
+        "debt_free_date": None if never else max(payoff_dates, default=None),
+        "timeline": timeline,
+    }
+
+
+# ================= PAYOFF STRATEGIES =================
+
+PAYOFF_STRATEGIES = ("minimum", "avalanche", "snowball", "custom")
+
+
+def simulate_payoff(
+    balances: np.ndarray,
+    rates: np.ndarray,
+    emis: np.ndarray,
+    order: np.ndarray,
+    extra_payment: float = 0.0,
+    rollover: bool = True,
+    max_months: int = MAX_INSTALLMENTS,
+) -> Dict[str, Any]:
+    """
+    Month-by-month payoff of several debts at once.
+    Each month every debt accrues interest and gets its EMI. With rollover,
+    the rest of the budget (all EMIs + extra_payment, so a paid-off debt's
+    EMI keeps working) goes to debts in `order`, cascading to the next one
+    as each is cleared. Without rollover only the EMIs are paid.
+
+    All state lives in arrays indexed by debt, so the cost per month is a
+    few vector operations regardless of the number of debts.
+    """
+    balance = balances.astype(float).copy()
+    monthly_rate = rates / 1200.0
+    budget = emis.sum() + extra_payment
+    payoff_month = np.full(len(balance), -1)
+    payments, interests, totals = [], [], []
+
+    previous_total = balance.sum()
+    for month in range(max_months):
+        if previous_total <= 0.005:
+            break
+        interest = balance * monthly_rate
+        balance += interest
+        minimum = np.minimum(emis, balance)
+        balance -= minimum
+        paid = minimum.sum()
+
+        if rollover and budget > paid:
+            remaining = balance[order]
+            # Each debt gets what's left after the ones ahead of it are cleared
+            ahead = np.cumsum(remaining) - remaining
+            allocation = np.clip(budget - paid - ahead, 0.0, remaining)
+            balance[order] -= allocation
+            paid += allocation.sum()
+
+        balance[balance < 0.005] = 0.0
+        payoff_month[(balance == 0.0) & (payoff_month < 0)] = month
+        total = balance.sum()
+        payments.append(paid)
+        interests.append(interest.sum())
+        totals.append(total)
+        if total >= previous_total:
+            # Payments don't cover the interest: it never pays off
+            break
+        previous_total = total
+
+    return {
+        "months": len(payments),
+        "pays_off": bool((payoff_month >= 0).all()),
+        "payoff_month": payoff_month,
+        "payment": np.array(payments),
+        "interest": np.array(interests),
+        "balance": np.array(totals),
+    }
+
+
+def strategy_orders(debts: List[Debt], custom_order: Optional[List[int]] = None) -> Dict[str, np.ndarray]:
+    """
+    Priority order (indexes into debts) for each strategy.
+    avalanche: highest rate first; snowball: smallest balance first;
+    custom: the given debt ids first, then the rest by avalanche.
+    """
+    index = list(range(len(debts)))
+    avalanche = sorted(index, key=lambda i: (-debts[i].interest_rate, debts[i].remaining_amount))
+    orders = {
+        "minimum": np.array(avalanche),
+        "avalanche": np.array(avalanche),
+        "snowball": np.array(sorted(index, key=lambda i: (debts[i].remaining_amount, -debts[i].interest_rate))),
+    }
+    if custom_order is not None:
+        position = {debt.id: i for i, debt in enumerate(debts)}
+        unknown = [debt_id for debt_id in custom_order if debt_id not in position]
+        if unknown:
+            raise ValueError(f"custom_order has unknown or inactive debts: {unknown}")
+        first = [position[debt_id] for debt_id in dict.fromkeys(custom_order)]
+        chosen = set(first)
+        orders["custom"] = np.array(first + [i for i in avalanche if i not in chosen])
+    return orders
+
+
+def simulate_strategies(
+    debts: List[Debt],
+    extra_payment: float = 0.0,
+    custom_order: Optional[List[int]] = None,
+    include_timeline: bool = True,
+    today: Optional[date] = None,
+) -> List[Dict[str, Any]]:
+    """Compare payoff strategies for a user's active debts, starting next month"""
+    today = today or date.today()
+    active = [d for d in debts if d.status != "paid" and d.remaining_amount > 0]
+    if not active:
+        return []
+    balances = np.array([d.remaining_amount for d in active], dtype=float)
+    rates = np.array([d.interest_rate for d in active], dtype=float)
+    emis = np.array([d.emi_amount for d in active], dtype=float)
+    first_month = np.datetime64(today, "M") + 1
+
+    results = []
+    for strategy, order in strategy_orders(active, custom_order).items():
+        minimum_only = strategy == "minimum"
+        run = simulate_payoff(
+            balances, rates, emis, order,
+            extra_payment=0.0 if minimum_only else extra_payment,
+            rollover=not minimum_only,
+        )
+        labels = (first_month + np.arange(run["months"])).astype(str).tolist()
+        result = {
+            "strategy": strategy,
+            "order": [active[i].id for i in order],
+            "months": run["months"],
+            "pays_off": run["pays_off"],
+            "payoff_month": labels[-1] if run["pays_off"] and labels else None,
+            "total_interest": round(float(run["interest"].sum()), 2),
+            "total_paid": round(float(run["payment"].sum()), 2),
+            "debts": [
+                {"debt_id": debt.id, "payoff_month": labels[m] if m >= 0 else None}
+                for debt, m in zip(active, run["payoff_month"].tolist())
+            ],
+            "timeline": [],
+        }
+        if include_timeline:
+            result["timeline"] = [
+                {"month": label, "payment": payment, "interest": interest, "balance": balance}
+                for label, payment, interest, balance in zip(
+                    labels,
+                    np.round(run["payment"], 2).tolist(),
+                    np.round(run["interest"], 2).tolist(),
+                    np.round(run["balance"], 2).tolist(),
+                )
+            ]
+        results.append(result)
+    return results
+
+
+# Evict on any ORM change to a debt (update_debt, delete_debt, payments)
+@event.listens_for(Debt, "after_update")
+@event.listens_for(Debt, "after_delete")
+def _invalidate_schedule(mapper, connection, target):
+    schedule_cache.invalidate(target.id)
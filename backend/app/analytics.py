@@ -0,0 +1,155 @@
+"""
+Analytics Query Engine
+Answers ad-hoc questions about a user's expenses in a single SQL statement:
+a date window, an optional time granularity, grouping dimensions and a set
+of metrics (percentiles via PostgreSQL's percentile_cont).
+
+Results are cached per (user, query). Each user has a generation that is
+bumped whenever they write an expense; it is part of the cache key,
+so a write makes all of that user's cached results unreachable at once
+without scanning the cache.
+"""
+
+import hashlib
+import itertools
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Date, DateTime, cast, func, select
+from sqlalchemy.orm import Session
+
+from .cache import TTLCache
+from .models import Expense
+
+ANALYTICS_GRANULARITIES = ("day", "week", "month", "year")
+ANALYTICS_DIMENSIONS = ("category", "weekday")
+ANALYTICS_METRICS = ("sum", "count", "avg", "p50", "p90")
+DEFAULT_METRICS = ("sum", "count")
+
+# Cached results and generations are per worker process (see cache.py): a
+# write only invalidates the worker that handled it, so other workers can
+# serve results up to this old. The app runs a single uvicorn worker; lower
+# the TTL before running several.
+ANALYTICS_CACHE_TTL_SECONDS = float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "300"))
+ANALYTICS_CACHE_MAX_SIZE = int(os.getenv("ANALYTICS_CACHE_MAX_SIZE", "5000"))
+
+analytics_cache = TTLCache(maxsize=ANALYTICS_CACHE_MAX_SIZE, ttl=ANALYTICS_CACHE_TTL_SECONDS, name="analytics")
+
+# At most ANALYTICS_CACHE_MAX_SIZE users; the least recently invalidated go first.
+# Generations come from one counter, so none is ever reused; a user without
+# an entry gets _generation_floor, the newest evicted generation, which is
+# newer than anything cached before their last write.
+_generations: "OrderedDict[int, int]" = OrderedDict()
+_generation_counter = itertools.count(1)
+_generation_floor = 0
+_generations_lock = threading.Lock()
+
+
+def invalidate_user(user_id: int) -> None:
+    """Drop a user's cached results; call after committing an expense write"""
+    global _generation_floor
+    with _generations_lock:
+        _generations[user_id] = next(_generation_counter)
+        _generations.move_to_end(user_id)
+        while len(_generations) > ANALYTICS_CACHE_MAX_SIZE:
+            _, evicted = _generations.popitem(last=False)
+            _generation_floor = max(_generation_floor, evicted)
+
+
+def _generation(user_id: int) -> int:
+    with _generations_lock:
+        return _generations.get(user_id, _generation_floor)
+
+
+@dataclass(frozen=True)
+class AnalyticsQuery:
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    granularity: Optional[str] = None
+    group_by: Tuple[str, ...] = ()
+    metrics: Tuple[str, ...] = DEFAULT_METRICS
+
+    def __post_init__(self):
+        if self.granularity is not None and self.granularity not in ANALYTICS_GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(ANALYTICS_GRANULARITIES)}")
+        unknown = [d for d in self.group_by if d not in ANALYTICS_DIMENSIONS]
+        if unknown:
+            raise ValueError(f"group_by must be from {', '.join(ANALYTICS_DIMENSIONS)}")
+        unknown = [m for m in self.metrics if m not in ANALYTICS_METRICS]
+        if unknown or not self.metrics:
+            raise ValueError(f"metrics must be from {', '.join(ANALYTICS_METRICS)}")
+        if self.start_date and self.end_date and self.start_date > self.end_date:
+            raise ValueError("start_date must be on or before end_date")
+        # Canonical order so equivalent queries share a cache entry
+        object.__setattr__(self, "group_by", tuple(d for d in ANALYTICS_DIMENSIONS if d in self.group_by))
+        object.__setattr__(self, "metrics", tuple(m for m in ANALYTICS_METRICS if m in self.metrics))
+
+    def cache_hash(self) -> str:
+        payload = json.dumps(asdict(self), default=str, sort_keys=True)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _build_statement(user_id: int, query: AnalyticsQuery):
+    dimensions = []
+    if query.granularity:
+        # Cast through timestamp (not timestamptz) so the period stays a plain date
+        period = func.date_trunc(query.granularity, cast(Expense.date, DateTime))
+        dimensions.append(cast(period, Date).label("period"))
+    if "category" in query.group_by:
+        dimensions.append(Expense.category.label("category"))
+    if "weekday" in query.group_by:
+        # ISO weekday: 1 = Monday ... 7 = Sunday
+        dimensions.append(func.extract("isodow", Expense.date).label("weekday"))
+
+    metric_columns = {
+        "sum": func.sum(Expense.amount),
+        "count": func.count(Expense.id),
+        "avg": func.avg(Expense.amount),
+        "p50": func.percentile_cont(0.5).within_group(Expense.amount),
+        "p90": func.percentile_cont(0.9).within_group(Expense.amount),
+    }
+    metrics = [metric_columns[name].label(name) for name in query.metrics]
+
+    stmt = select(*dimensions, *metrics).where(
+        Expense.user_id == user_id,
+        Expense.date.isnot(None),
+    )
+    if query.start_date:
+        stmt = stmt.where(Expense.date >= query.start_date)
+    if query.end_date:
+        stmt = stmt.where(Expense.date <= query.end_date)
+    if dimensions:
+        stmt = stmt.group_by(*dimensions).order_by(*dimensions)
+    return stmt
+
+
+def _format_row(row, query: AnalyticsQuery) -> Dict[str, Any]:
+    mapping = row._mapping
+    result: Dict[str, Any] = {}
+    if query.granularity:
+        result["period"] = mapping["period"].isoformat()
+    if "category" in query.group_by:
+        result["category"] = mapping["category"]
+    if "weekday" in query.group_by:
+        result["weekday"] = int(mapping["weekday"])
+    for name in query.metrics:
+        value = mapping[name]
+        if name == "count":
+            result[name] = int(value)
+        else:
+            result[name] = round(float(value), 2) if value is not None else None
+    return result
+
+
+def run_query(db: Session, user_id: int, query: AnalyticsQuery) -> List[Dict[str, Any]]:
+    """Execute (or serve from cache) an analytics query for one user"""
+    key = (user_id, _generation(user_id), query.cache_hash())
+    return analytics_cache.get_or_set(
+        key,
+        lambda: [_format_row(row, query) for row in db.execute(_build_statement(user_id, query))],
+    )
@@ -0,0 +1,231 @@
+"""
+Budget Alerts
+Background worker that warns users by email when a month's spending in a
+category crosses 80% or 100% of its budget.
+
+Expense writes only enqueue an event (no extra latency on the request).
+The worker drains the queue, coalesces events for the same
+(user, month, category), checks those budgets against the rollup and
+queues one email per newly crossed threshold on the email outbox. A row in
+budget_alerts is claimed before queueing, so each threshold fires once per
+budget even across workers; the claim is released if the outbox refuses
+the email so a later write retries it.
+
+The queue lives in this process: events still queued at shutdown are
+dropped, and the next write to that category re-checks the budget.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from datetime import date
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from . import budgets
+from .database import SessionLocal
+from .email_service import send_email
+from .models import BudgetAlert, User
+
+logger = logging.getLogger("budget_alerts")
+
+ALERT_THRESHOLDS = (80, 100)
+ALERT_QUEUE_MAX_SIZE = int(os.getenv("BUDGET_ALERT_QUEUE_SIZE", "10000"))
+
+_queue: Optional[asyncio.Queue] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_task: Optional[asyncio.Task] = None
+_stats_lock = threading.Lock()
+_stats = {
+    "events_enqueued": 0,
+    "events_dropped": 0,
+    "budgets_checked": 0,
+    "alerts_sent": 0,
+    "alerts_failed": 0,
+}
+
+
+def _count(name: str, amount: int = 1) -> None:
+    with _stats_lock:
+        _stats[name] += amount
+
+
+# ================= PRODUCER =================
+
+def notify_expenses_written(user_id: int, rows: Iterable[Tuple[str, date]]) -> None:
+    """
+    Queue a budget check for the (category, date) pairs an expense write
+    touched. Safe to call from sync routes running in the threadpool.
+    A no-op when the worker isn't running (scripts, tests without startup).
+    """
+    _enqueue({(user_id, d.year, d.month, category) for category, d in rows})
+
+
+def notify_budget_written(user_id: int, category: str, year: int, month: int) -> None:
+    """Queue a check for a new budget; spending may already be past a threshold"""
+    _enqueue({(user_id, year, month, category)})
+
+
+def _enqueue(keys: Set[Tuple[int, int, int, str]]) -> None:
+    if _queue is None or _loop is None or not keys:
+        return
+
+    def put():
+        for key in keys:
+            try:
+                _queue.put_nowait(key)
+                _count("events_enqueued")
+            except asyncio.QueueFull:
+                _count("events_dropped")
+
+    try:
+        _loop.call_soon_threadsafe(put)
+    except RuntimeError:
+        # Loop already closed during shutdown
+        _count("events_dropped", len(keys))
+
+
+# ================= CONSUMER =================
+
+def _alert_email(username: str, status: Dict, threshold: int) -> Tuple[str, str]:
+    month_name = date(status["year"], status["month"], 1).strftime("%B %Y")
+    if threshold >= 100:
+        subject = f"Budget exceeded: {status['category']} ({month_name})"
+        headline = f"You've gone over your {status['category']} budget for {month_name}."
+    else:
+        subject = f"{threshold}% of your {status['category']} budget used ({month_name})"
+        headline = f"You've used {status['percent_used']}% of your {status['category']} budget for {month_name}."
+    html = f"""
+        <h2>Hi {username},</h2>
+        <p>{headline}</p>
+        <p>Spent: ₹{status['spent']:.2f} of ₹{status['limit_amount']:.2f}
+           (remaining ₹{status['remaining']:.2f}).</p>
+        <p>Projected month-end spend: ₹{status['projected_spend']:.2f}</p>
+        <p>— Expense Tracker</p>
+    """
+    return subject, html
+
+
+def _crossed(status: Dict, threshold: int) -> bool:
+    """
+    Whether spending has reached threshold percent of the limit. Compares the
+    exact amounts: percent_used is rounded for display, so 79.96% would
+    already read as 80.0.
+    """
+    limit_amount = status["limit_amount"]
+    return limit_amount > 0 and status["spent"] * 100 >= limit_amount * threshold
+
+
+def check_budgets(user_id: int, year: int, month: int, categories: Set[str]) -> None:
+    """Check one user's budgets for a month and send any newly crossed alerts"""
+    db = SessionLocal()
+    try:
+        statuses = budgets.budget_statuses(db, user_id, year, month, categories=categories)
+        _count("budgets_checked", len(statuses))
+        crossed = [
+            (status, [threshold for threshold in ALERT_THRESHOLDS if _crossed(status, threshold)])
+            for status in statuses
+        ]
+        crossed = [(status, thresholds) for status, thresholds in crossed if thresholds]
+        if not crossed:
+            return
+
+        user = db.get(User, user_id)
+        if user is None or not user.email:
+            return
+
+        for status, thresholds in crossed:
+            # Claim every crossed threshold first; conflicts are ones that already fired.
+            # Lower thresholds passed in the same write are claimed too, so they never
+            # fire later, but only the highest new one is emailed.
+            claimed = dict(db.execute(
+                pg_insert(BudgetAlert).values([
+                    {
+                        "budget_id": status["id"],
+                        "user_id": user_id,
+                        "threshold": threshold,
+                        "percent_used": status["percent_used"],
+                    }
+                    for threshold in thresholds
+                ]).on_conflict_do_nothing(
+                    index_elements=[BudgetAlert.budget_id, BudgetAlert.threshold]
+                ).returning(BudgetAlert.threshold, BudgetAlert.id)
+            ).all())
+            db.commit()
+            if not claimed:
+                continue
+
+            threshold = max(claimed)
+            subject, html = _alert_email(user.username, status, threshold)
+            if send_email(user.email, subject, html):
+                _count("alerts_sent")
+                logger.info(f"Budget alert queued: budget {status['id']} crossed {threshold}%")
+            else:
+                _count("alerts_failed")
+                # Release the claims so the next write to this category retries
+                db.execute(delete(BudgetAlert).where(BudgetAlert.id.in_(claimed.values())))
+                db.commit()
+    finally:
+        db.close()
+
+
+async def _drain() -> Dict[Tuple[int, int, int], Set[str]]:
+    """Wait for one event, then take everything queued and group it"""
+    batch: Dict[Tuple[int, int, int], Set[str]] = {}
+    key = await _queue.get()
+    while True:
+        user_id, year, month, category = key
+        batch.setdefault((user_id, year, month), set()).add(category)
+        _queue.task_done()
+        try:
+            key = _queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return batch
+
+
+async def _worker() -> None:
+    while True:
+        batch = await _drain()
+        for (user_id, year, month), categories in batch.items():
+            try:
+                # DB queries are blocking; keep them off the loop
+                await asyncio.to_thread(check_budgets, user_id, year, month, categories)
+            except Exception:
+                logger.exception(f"Budget alert check failed for user {user_id}")
+
+
+# ================= LIFECYCLE =================
+
+def start_worker() -> None:
+    """Start the worker on the running event loop (call from startup)"""
+    global _queue, _loop, _task
+    if _task is not None:
+        return
+    _loop = asyncio.get_running_loop()
+    _queue = asyncio.Queue(maxsize=ALERT_QUEUE_MAX_SIZE)
+    _task = _loop.create_task(_worker())
+
+
+async def stop_worker() -> None:
+    global _queue, _loop, _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _queue, _loop, _task = None, None, None
+
+
+def stats() -> Dict[str, int]:
+    """Counters for the /metrics endpoint"""
+    with _stats_lock:
+        return {
+            **_stats,
+            "queue_depth": _queue.qsize() if _queue is not None else 0,
+            "running": _task is not None and not _task.done(),
+        }
@@ -0,0 +1,76 @@
+"""
+Budget Utilisation
+Spent / remaining / percent used for a user's budgets in a given month,
+read in one statement by joining budgets to the expense rollup, plus a
+month-end projection from the linear burn rate so far.
+"""
+
+import calendar
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session
+
+from .models import Budget, ExpenseRollup
+
+
+def project_month_end(spent: float, year: int, month: int, today: date) -> float:
+    """
+    Linear projection of month-end spend.
+    Past months are final; future months have no burn rate yet.
+    """
+    if (year, month) != (today.year, today.month):
+        return spent
+    days_in_month = calendar.monthrange(year, month)[1]
+    return spent / today.day * days_in_month
+
+
+def budget_statuses(
+    db: Session,
+    user_id: int,
+    year: int,
+    month: int,
+    today: Optional[date] = None,
+    categories: Optional[Iterable[str]] = None,
+) -> List[Dict[str, Any]]:
+    """Utilisation of every budget the user has for (year, month)"""
+    today = today or date.today()
+    spent = func.coalesce(ExpenseRollup.total, 0.0)
+    stmt = select(
+        Budget.id,
+        Budget.category,
+        Budget.limit_amount,
+        spent.label("spent"),
+    ).outerjoin(
+        ExpenseRollup,
+        and_(
+            ExpenseRollup.user_id == Budget.user_id,
+            ExpenseRollup.year == Budget.year,
+            ExpenseRollup.month == Budget.month,
+            ExpenseRollup.category == Budget.category,
+        ),
+    ).where(
+        Budget.user_id == user_id,
+        Budget.year == year,
+        Budget.month == month,
+    ).order_by(Budget.category, Budget.id)
+    if categories is not None:
+        stmt = stmt.where(Budget.category.in_(list(categories)))
+
+    statuses = []
+    for budget_id, category, limit_amount, spent_amount in db.execute(stmt):
+        projected = project_month_end(spent_amount, year, month, today)
+        statuses.append({
+            "id": budget_id,
+            "category": category,
+            "month": month,
+            "year": year,
+            "limit_amount": limit_amount,
+            "spent": round(spent_amount, 2),
+            "remaining": round(limit_amount - spent_amount, 2),
+            "percent_used": round(spent_amount / limit_amount * 100, 1) if limit_amount > 0 else None,
+            "projected_spend": round(projected, 2),
+            "projected_over_budget": projected > limit_amount,
+        })
+    return statuses
@@ -2,8 +2,12 @@
 import os
 import logging
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from .db_pool import PoolSettings, InstrumentedQueuePool, InstrumentedAsyncQueuePool
+
 logger = logging.getLogger(__name__)
 
 # Supabase PostgreSQL DATABASE_URL (required for production)
@@ -23,14 +27,16 @@ if not DATABASE_URL.startswith("postgresql"):
 
 logger.info("🔄 Connecting to Supabase PostgreSQL...")
 
+# Pool size, overflow, timeouts and pre-ping come from DB_* env vars (see db_pool.py)
+pool_settings = PoolSettings.from_env()
+
 # Create PostgreSQL engine with connection pooling
 engine = create_engine(
     DATABASE_URL,
-    pool_pre_ping=True,  # Verify connections before using them
-    pool_size=10,  # Maximum number of permanent connections
-    max_overflow=20,  # Maximum number of temporary connections
-    pool_recycle=3600,  # Recycle connections after 1 hour
-    echo=False  # Set to True for SQL query logging during development
+    poolclass=InstrumentedQueuePool,
+    connect_args=pool_settings.psycopg2_connect_args(),
+    echo=False,  # Set to True for SQL query logging during development
+    **pool_settings.engine_kwargs(),
 )
 
 logger.info("✅ Successfully connected to Supabase PostgreSQL!")
@@ -41,10 +47,58 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Base declarative
 Base = declarative_base()
 
-# Dependency for FastAPI routes
+# Dependency for FastAPI routes. This is the only sync session provider:
+# FastAPI caches a dependency per request, so the route and get_current_user
+# share one Session and therefore at most one pooled connection.
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+# ================= ASYNC ENGINE (asyncpg) =================
+# Used by `async def` routes so database I/O doesn't block the event loop.
+# Sync routes keep using SessionLocal; FastAPI runs them in its threadpool.
+
+def build_async_url(url: str):
+    """Point the same database URL at the asyncpg driver"""
+    async_url = make_url(url).set(drivername="postgresql+asyncpg")
+    query = dict(async_url.query)
+    # asyncpg takes `ssl` instead of libpq's `sslmode`
+    if "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")
+    return async_url.set(query=query)
+
+
+async_engine = create_async_engine(
+    build_async_url(DATABASE_URL),
+    poolclass=InstrumentedAsyncQueuePool,
+    connect_args=pool_settings.asyncpg_connect_args(),
+    echo=False,
+    **pool_settings.engine_kwargs(),
+)
+
+# expire_on_commit=False: attributes stay readable after commit without an
+# implicit (and, in async, illegal) lazy refresh
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def pool_metrics():
+    """Pool state for both engines, for the /metrics endpoint"""
+    return {
+        "sync": engine.pool.stats(),
+        "async": async_engine.pool.stats(),
+        "statement_timeout_ms": pool_settings.statement_timeout_ms,
+    }
@@ -0,0 +1,147 @@
+"""
+Connection pool policy and instrumentation.
+
+Pool settings come from environment variables so the pool can be sized
+against the database's connection limit (Supabase caps connections per
+project; every uvicorn worker has its own sync and async pool):
+
+  DB_POOL_SIZE             permanent connections per pool      (default 10)
+  DB_MAX_OVERFLOW          extra connections allowed at peak   (default 20)
+  DB_POOL_TIMEOUT          seconds to wait for a connection    (default 30)
+  DB_POOL_RECYCLE          seconds before a connection is replaced (default 3600)
+  DB_POOL_PRE_PING         test connections on checkout        (default true)
+  DB_STATEMENT_TIMEOUT_MS  server-side statement_timeout, 0 = off (default 0)
+
+The instrumented pool classes record how long checkouts wait for a free
+connection, which together with checked-out/overflow counts is exposed in
+/metrics.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class PoolSettings:
+    pool_size: int
+    max_overflow: int
+    pool_timeout: int
+    pool_recycle: int
+    pool_pre_ping: bool
+    statement_timeout_ms: int
+
+    @classmethod
+    def from_env(cls) -> "PoolSettings":
+        return cls(
+            pool_size=_env_int("DB_POOL_SIZE", 10),
+            max_overflow=_env_int("DB_MAX_OVERFLOW", 20),
+            pool_timeout=_env_int("DB_POOL_TIMEOUT", 30),
+            pool_recycle=_env_int("DB_POOL_RECYCLE", 3600),
+            pool_pre_ping=_env_bool("DB_POOL_PRE_PING", True),
+            statement_timeout_ms=_env_int("DB_STATEMENT_TIMEOUT_MS", 0),
+        )
+
+    def engine_kwargs(self) -> Dict[str, Any]:
+        """Keyword arguments shared by create_engine and create_async_engine"""
+        return {
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_timeout": self.pool_timeout,
+            "pool_recycle": self.pool_recycle,
+            "pool_pre_ping": self.pool_pre_ping,
+        }
+
+    def psycopg2_connect_args(self) -> Dict[str, Any]:
+        if not self.statement_timeout_ms:
+            return {}
+        return {"options": f"-c statement_timeout={self.statement_timeout_ms}"}
+
+    def asyncpg_connect_args(self) -> Dict[str, Any]:
+        if not self.statement_timeout_ms:
+            return {}
+        return {"server_settings": {"statement_timeout": str(self.statement_timeout_ms)}}
+
+
+class _CheckoutTimingMixin:
+    """Times every checkout, including the wait for a free connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.waited_checkouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited_ms = (time.perf_counter() - start) * 1000
+            with self._stats_lock:
+                self.checkouts += 1
+                self.total_wait_ms += waited_ms
+                self.max_wait_ms = max(self.max_wait_ms, waited_ms)
+                # Anything over a millisecond means the pool was exhausted
+                # or a new connection had to be opened
+                if waited_ms >= 1:
+                    self.waited_checkouts += 1
+
+    def recreate(self):
+        # Pool.recreate builds a fresh instance (e.g. after dispose);
+        # carry the counters over so metrics stay monotonic
+        new_pool = super().recreate()
+        with self._stats_lock:
+            new_pool.checkouts = self.checkouts
+            new_pool.waited_checkouts = self.waited_checkouts
+            new_pool.total_wait_ms = self.total_wait_ms
+            new_pool.max_wait_ms = self.max_wait_ms
+            new_pool.timeouts = self.timeouts
+        return new_pool
+
+    def stats(self) -> Dict[str, Any]:
+        """Live pool state plus checkout wait counters for /metrics"""
+        with self._stats_lock:
+            return {
+                "size": self.size(),
+                "checked_out": self.checkedout(),
+                "checked_in": self.checkedin(),
+                "overflow": max(self.overflow(), 0),
+                "max_overflow": self._max_overflow,
+                "checkouts": self.checkouts,
+                "waited_checkouts": self.waited_checkouts,
+                "avg_wait_ms": round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else None,
+                "max_wait_ms": round(self.max_wait_ms, 3),
+                "timeouts": self.timeouts,
+            }
+
+
+class InstrumentedQueuePool(_CheckoutTimingMixin, QueuePool):
+    """QueuePool for the sync (psycopg2) engine"""
+
+
+class InstrumentedAsyncQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool for the asyncpg engine"""
@@ -1,25 +1,285 @@
+"""
+Email Outbox
+send_email() never talks to the network: it puts the message on an
+in-process queue and returns. A background sender drains the queue and
+delivers through one long-lived HTTP client, so request handlers and
+workers never wait on SendGrid.
+
+- Messages with the same subject and body go out in one API call, one
+  personalization per recipient (recipients don't see each other).
+- Failed batches are retried with exponential backoff (429, 5xx and network
+  errors only; other 4xx are dropped as permanent).
+- EMAIL_TRANSPORT=fake swaps SendGrid for an in-memory transport that just
+  records messages (local development and tests).
+
+The queue lives in this process: anything still queued at shutdown gets a
+short flush, then is dropped.
+"""
+
+import asyncio
+import logging
 import os
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+import random
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger("email_service")
 
 SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
 FROM_EMAIL = os.getenv("FROM_EMAIL")
+EMAIL_TRANSPORT = os.getenv("EMAIL_TRANSPORT", "sendgrid")
 
-def send_email(to_email: str, subject: str, html_content: str) -> bool:
+EMAIL_QUEUE_MAX_SIZE = int(os.getenv("EMAIL_QUEUE_MAX_SIZE", "10000"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "1"))
+EMAIL_RETRY_MAX_SECONDS = 60.0
+EMAIL_SHUTDOWN_FLUSH_SECONDS = 5.0
+# SendGrid accepts up to 1000 personalizations per request
+EMAIL_BATCH_SIZE = 1000
+
+SENDGRID_SEND_URL = "https://api.sendgrid.com/v3/mail/send"
+
+
+@dataclass
+class EmailMessage:
+    to_email: str
+    subject: str
+    html_content: str
+    attempts: int = 0
+
+
+class EmailTransportError(Exception):
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+# ================= TRANSPORTS =================
+
+class SendGridTransport:
+    """SendGrid v3 mail/send over one pooled httpx client"""
+
+    name = "sendgrid"
+
+    def __init__(self, api_key: str, from_email: str, timeout: float = 10.0):
+        self.from_email = from_email
+        self._client = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=timeout,
+        )
+
+    async def send(self, messages: List[EmailMessage]) -> None:
+        """Send messages that share a subject and body in one request"""
+        payload = {
+            "personalizations": [{"to": [{"email": m.to_email}]} for m in messages],
+            "from": {"email": self.from_email},
+            "subject": messages[0].subject,
+            "content": [{"type": "text/html", "value": messages[0].html_content}],
+        }
+        try:
+            response = await self._client.post(SENDGRID_SEND_URL, json=payload)
+        except httpx.HTTPError as e:
+            raise EmailTransportError(f"SendGrid request failed: {e}")
+        if response.status_code >= 400:
+            retryable = response.status_code == 429 or response.status_code >= 500
+            raise EmailTransportError(
+                f"SendGrid returned {response.status_code}: {response.text[:200]}",
+                retryable=retryable,
+            )
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+class FakeTransport:
+    """Records messages instead of sending them"""
+
+    name = "fake"
+
+    def __init__(self, keep: int = 100):
+        self.sent: deque = deque(maxlen=keep)
+
+    async def send(self, messages: List[EmailMessage]) -> None:
+        for message in messages:
+            logger.info(f"[fake email] to={message.to_email} subject={message.subject!r}")
+            self.sent.append(message)
+
+    async def aclose(self) -> None:
+        pass
+
+
+def build_transport():
+    if EMAIL_TRANSPORT == "fake":
+        return FakeTransport()
+    if EMAIL_TRANSPORT != "sendgrid":
+        raise RuntimeError(f"Unknown EMAIL_TRANSPORT: {EMAIL_TRANSPORT}")
     if not SENDGRID_API_KEY or not FROM_EMAIL:
-        raise RuntimeError("SendGrid environment variables not set")
+        logger.warning("SendGrid environment variables not set; emails will not be sent")
+        return None
+    return SendGridTransport(SENDGRID_API_KEY, FROM_EMAIL)
+
+
+# ================= OUTBOX =================
+
+_transport = None
+_queue: Optional[asyncio.Queue] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_task: Optional[asyncio.Task] = None
+_retry_pending = 0
+_stats_lock = threading.Lock()
+_stats = {
+    "queued": 0,
+    "sent": 0,
+    "failed": 0,
+    "retried": 0,
+    "dropped": 0,
+    "batches": 0,
+}
 
-    message = Mail(
-        from_email=FROM_EMAIL,
-        to_emails=to_email,
-        subject=subject,
-        html_content=html_content,
-    )
 
+def _count(name: str, amount: int = 1) -> None:
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def send_email(to_email: str, subject: str, html_content: str) -> bool:
+    """
+    Queue an email for background delivery.
+    Returns False if it can't be queued (no transport configured, sender not
+    running, or the queue is full). Safe to call from any thread.
+    """
+    if _transport is None or _queue is None or _loop is None:
+        return False
+    if _queue.qsize() >= EMAIL_QUEUE_MAX_SIZE:
+        _count("dropped")
+        return False
+    message = EmailMessage(to_email=to_email, subject=subject, html_content=html_content)
     try:
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        sg.send(message)
-        return True
-    except Exception as e:
-        print("❌ Email sending failed:", e)
+        _loop.call_soon_threadsafe(_put, message)
+    except RuntimeError:
+        # Loop already closed during shutdown
+        _count("dropped")
         return False
+    _count("queued")
+    return True
+
+
+def _put(message: EmailMessage) -> None:
+    try:
+        _queue.put_nowait(message)
+    except asyncio.QueueFull:
+        _count("dropped")
+
+
+def _retry_later(messages: List[EmailMessage]) -> None:
+    """Re-queue a failed batch after an exponential backoff with jitter"""
+    global _retry_pending
+    retry, give_up = [], []
+    for message in messages:
+        message.attempts += 1
+        (retry if message.attempts < EMAIL_MAX_ATTEMPTS else give_up).append(message)
+    if give_up:
+        _count("failed", len(give_up))
+        logger.error(f"Giving up on {len(give_up)} email(s) after {EMAIL_MAX_ATTEMPTS} attempts")
+    if not retry:
+        return
+
+    attempts = max(m.attempts for m in retry)
+    delay = min(EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), EMAIL_RETRY_MAX_SECONDS)
+    delay *= random.uniform(0.5, 1.0)
+    _count("retried", len(retry))
+    _retry_pending += len(retry)
+
+    def requeue():
+        global _retry_pending
+        _retry_pending -= len(retry)
+        for message in retry:
+            _put(message)
+
+    _loop.call_later(delay, requeue)
+
+
+async def _drain() -> List[EmailMessage]:
+    """Wait for one message, then take whatever else is already queued"""
+    messages = [await _queue.get()]
+    while len(messages) < EMAIL_BATCH_SIZE:
+        try:
+            messages.append(_queue.get_nowait())
+        except asyncio.QueueEmpty:
+            break
+    return messages
+
+
+async def _deliver(messages: List[EmailMessage]) -> None:
+    groups: Dict[Tuple[str, str], List[EmailMessage]] = {}
+    for message in messages:
+        groups.setdefault((message.subject, message.html_content), []).append(message)
+
+    for batch in groups.values():
+        _count("batches")
+        try:
+            await _transport.send(batch)
+        except EmailTransportError as e:
+            logger.warning(f"Email batch of {len(batch)} failed: {e}")
+            if e.retryable:
+                _retry_later(batch)
+            else:
+                _count("failed", len(batch))
+        except Exception:
+            logger.exception(f"Email batch of {len(batch)} failed")
+            _retry_later(batch)
+        else:
+            _count("sent", len(batch))
+
+
+async def _sender() -> None:
+    while True:
+        messages = await _drain()
+        await _deliver(messages)
+        for _ in messages:
+            _queue.task_done()
+
+
+def start_sender() -> None:
+    """Start the background sender on the running event loop (call from startup)"""
+    global _transport, _queue, _loop, _task
+    if _task is not None:
+        return
+    _transport = build_transport()
+    _loop = asyncio.get_running_loop()
+    _queue = asyncio.Queue(maxsize=EMAIL_QUEUE_MAX_SIZE)
+    _task = _loop.create_task(_sender())
+
+
+async def stop_sender() -> None:
+    """Give queued messages a short flush, then stop and close the transport"""
+    global _transport, _queue, _loop, _task
+    if _task is None:
+        return
+    try:
+        await asyncio.wait_for(_queue.join(), timeout=EMAIL_SHUTDOWN_FLUSH_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning(f"Dropping {_queue.qsize()} unsent email(s) at shutdown")
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    if _transport is not None:
+        await _transport.aclose()
+    _transport, _queue, _loop, _task = None, None, None, None
+
+
+def stats() -> Dict:
+    """Counters for the /metrics endpoint"""
+    with _stats_lock:
+        return {
+            **_stats,
+            "transport": _transport.name if _transport is not None else None,
+            "queue_depth": _queue.qsize() if _queue is not None else 0,
+            "retry_pending": _retry_pending,
+        }
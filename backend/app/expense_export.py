@@ -0,0 +1,86 @@
+"""
+Streaming expense export.
+Rows are read through a server-side cursor (yield_per) and written out one
+batch at a time, so memory stays flat regardless of how many expenses a
+user has.
+
+The stream reads on the request's own session (the one auth used), so an
+export holds one pooled connection like any other request. FastAPI keeps
+yield dependencies open until a streaming response has been sent (0.118+).
+"""
+
+import csv
+import io
+import json
+from typing import Iterator
+
+from sqlalchemy import Select, select
+from sqlalchemy.orm import Session
+
+from .models import Expense
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# Rows fetched from the cursor per round trip (and per chunk written)
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_COLUMNS = ("id", "date", "category", "amount", "description")
+
+
+def export_statement() -> Select:
+    """Plain column select; no ORM identity map to grow while streaming"""
+    return select(
+        Expense.id,
+        Expense.date,
+        Expense.category,
+        Expense.amount,
+        Expense.description,
+    )
+
+
+def _batches(db: Session, statement: Select) -> Iterator[list]:
+    result = db.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    try:
+        for rows in result.partitions():
+            yield rows
+    finally:
+        # Release the server-side cursor even if the client disconnects early
+        result.close()
+
+
+def stream_csv(db: Session, statement: Select) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in _batches(db, statement):
+        for row in rows:
+            writer.writerow((row.id, row.date.isoformat() if row.date else "", row.category, row.amount, row.description or ""))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when there were no rows
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_ndjson(db: Session, statement: Select) -> Iterator[str]:
+    for rows in _batches(db, statement):
+        yield "".join(
+            json.dumps({
+                "id": row.id,
+                "date": row.date.isoformat() if row.date else None,
+                "category": row.category,
+                "amount": float(row.amount),
+                "description": row.description,
+            }) + "\n"
+            for row in rows
+        )
+
+
+def stream_export(db: Session, statement: Select, export_format: str) -> Iterator[str]:
+    if export_format == "csv":
+        return stream_csv(db, statement)
+    return stream_ndjson(db, statement)
@@ -0,0 +1,168 @@
+"""
+Expense Rollups
+Keeps per-(user, year, month, category) totals and counts in sync with the
+expenses table, so the analytics endpoints read a handful of pre-aggregated
+rows instead of scanning a user's whole expense history.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from .models import Expense, ExpenseRollup
+from .money import ZERO, Amount, to_money
+
+# (year, month, category)
+RollupKey = Tuple[int, int, str]
+# {key: [total delta, count delta]}
+RollupDeltas = Dict[RollupKey, List[Decimal]]
+
+
+# ================= DELTA BUILDERS =================
+
+def expense_rollup_deltas(
+    rows: Iterable[Tuple[str, Amount, date]],
+    sign: int = 1,
+) -> RollupDeltas:
+    """Rollup changes for adding (sign=1) or removing (sign=-1) (category, amount, date) rows"""
+    deltas: RollupDeltas = defaultdict(lambda: [ZERO, 0])
+    for category, amount, expense_date in rows:
+        entry = deltas[(expense_date.year, expense_date.month, category)]
+        entry[0] += sign * to_money(amount)
+        entry[1] += sign
+    return deltas
+
+
+def merge_rollup_deltas(*delta_maps: RollupDeltas) -> RollupDeltas:
+    merged: RollupDeltas = defaultdict(lambda: [ZERO, 0])
+    for deltas in delta_maps:
+        for key, (total, count) in deltas.items():
+            merged[key][0] += total
+            merged[key][1] += count
+    return merged
+
+
+# ================= ROLLUP WRITES =================
+
+def rollup_upsert(user_id: int, deltas: RollupDeltas):
+    """
+    Single multi-row upsert adding deltas to the rollup, or None if there is
+    nothing to change. Returned as a statement so both sync and async
+    sessions can execute it inside their own transaction.
+    """
+    # Sorted so concurrent writers lock rows in the same order
+    rows = [
+        {
+            "user_id": user_id,
+            "year": year,
+            "month": month,
+            "category": category,
+            "total": total,
+            "count": count,
+            "updated_at": datetime.utcnow(),
+        }
+        for (year, month, category), (total, count) in sorted(deltas.items())
+        if total != 0 or count != 0
+    ]
+    if not rows:
+        return None
+
+    stmt = pg_insert(ExpenseRollup).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[ExpenseRollup.user_id, ExpenseRollup.year, ExpenseRollup.month, ExpenseRollup.category],
+        set_={
+            "total": ExpenseRollup.total + stmt.excluded.total,
+            "count": ExpenseRollup.count + stmt.excluded.count,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+
+
+def apply_rollup_deltas(db: Session, user_id: int, deltas: RollupDeltas) -> None:
+    """Add deltas to the rollup in the caller's transaction"""
+    stmt = rollup_upsert(user_id, deltas)
+    if stmt is not None:
+        db.execute(stmt)
+
+
+def record_expense(db: Session, expense: Expense, sign: int = 1) -> None:
+    """Apply (sign=1) or reverse (sign=-1) a single expense on the rollup"""
+    deltas = expense_rollup_deltas([(expense.category, expense.amount, expense.date)], sign)
+    apply_rollup_deltas(db, expense.user_id, deltas)
+
+
+# ================= ROLLUP READS =================
+
+def read_category_totals(db: Session, user_id: int) -> List[Tuple[str, Decimal]]:
+    """Total spend per category across all months"""
+    return db.execute(
+        select(ExpenseRollup.category, func.sum(ExpenseRollup.total))
+        .where(ExpenseRollup.user_id == user_id, ExpenseRollup.count > 0)
+        .group_by(ExpenseRollup.category)
+    ).all()
+
+
+def read_monthly_totals(db: Session, user_id: int) -> List[Tuple[int, int, Decimal]]:
+    """Total spend per (year, month), oldest first"""
+    return db.execute(
+        select(ExpenseRollup.year, ExpenseRollup.month, func.sum(ExpenseRollup.total))
+        .where(ExpenseRollup.user_id == user_id, ExpenseRollup.count > 0)
+        .group_by(ExpenseRollup.year, ExpenseRollup.month)
+        .order_by(ExpenseRollup.year, ExpenseRollup.month)
+    ).all()
+
+
+# ================= REBUILD / REPAIR =================
+
+def compute_user_rollups(db: Session, user_id: int) -> Dict[RollupKey, Tuple[Decimal, int]]:
+    """Recompute a user's rollup from the raw expense rows in one GROUP BY"""
+    year = func.extract("year", Expense.date).cast(ExpenseRollup.year.type)
+    month = func.extract("month", Expense.date).cast(ExpenseRollup.month.type)
+    rows = db.execute(
+        select(year, month, Expense.category, func.sum(Expense.amount), func.count(Expense.id))
+        .where(Expense.user_id == user_id, Expense.date.isnot(None))
+        .group_by(year, month, Expense.category)
+    ).all()
+    return {(y, m, category): (total, count) for y, m, category, total, count in rows}
+
+
+def rebuild_user_rollups(db: Session, user_id: int, repair: bool = True) -> List[Dict[str, object]]:
+    """
+    Compare the stored rollup with a full recomputation and report drift.
+    With repair=True the user's rollup rows are replaced with the recomputed
+    values (the caller is responsible for committing).
+    """
+    expected = compute_user_rollups(db, user_id)
+    stored = {
+        (row.year, row.month, row.category): (row.total, row.count)
+        for row in db.query(ExpenseRollup).filter(ExpenseRollup.user_id == user_id).all()
+    }
+
+    drift = []
+    for key in sorted(set(expected) | set(stored)):
+        expected_total, expected_count = expected.get(key, (ZERO, 0))
+        stored_total, stored_count = stored.get(key, (ZERO, 0))
+        # Exact numeric sums: any difference is real drift
+        if expected_count != stored_count or expected_total != stored_total:
+            year, month, category = key
+            drift.append({
+                "user_id": user_id,
+                "month": f"{year:04d}-{month:02d}",
+                "category": category,
+                "stored": (float(stored_total), stored_count),
+                "expected": (float(expected_total), expected_count),
+            })
+
+    if repair and (drift or len(stored) != len(expected)):
+        db.execute(delete(ExpenseRollup).where(ExpenseRollup.user_id == user_id))
+        db.add_all(
+            ExpenseRollup(user_id=user_id, year=year, month=month, category=category, total=total, count=count)
+            for (year, month, category), (total, count) in expected.items()
+        )
+
+    return drift
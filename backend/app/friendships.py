@@ -0,0 +1,72 @@
+"""
+Friendship Graph
+A friendship is one row per unordered pair of users: user_id is whoever
+sent the request, friend_id whoever received it. The unique expression
+index uq_friendships_pair on (least(user_id, friend_id),
+greatest(user_id, friend_id)) rules out a second row for the same pair,
+even when both users send a request at the same moment, and pair_filter()
+matches that index so a pair lookup is a single index probe instead of an
+OR over both directions.
+"""
+
+from typing import Any, Dict, Iterable, List, Set
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from .models import Friendship, User
+
+
+def pair_filter(user_a: int, user_b: int):
+    """WHERE clause for the friendship between two users (either direction)"""
+    low, high = min(user_a, user_b), max(user_a, user_b)
+    return (
+        (func.least(Friendship.user_id, Friendship.friend_id) == low)
+        & (func.greatest(Friendship.user_id, Friendship.friend_id) == high)
+    )
+
+
+def _other_user(user_id: int):
+    """The id on the other side of a friendship row from user_id"""
+    return case((Friendship.user_id == user_id, Friendship.friend_id), else_=Friendship.user_id)
+
+
+def accepted_friend_ids(db: Session, user_id: int, candidate_ids: Iterable[int]) -> Set[int]:
+    """The subset of candidate_ids that are accepted friends of user_id, in one query"""
+    candidate_ids = set(candidate_ids)
+    if not candidate_ids:
+        return set()
+    other_id = _other_user(user_id)
+    stmt = select(other_id).where(
+        (Friendship.user_id == user_id) | (Friendship.friend_id == user_id),
+        Friendship.status == "accepted",
+        other_id.in_(candidate_ids),
+    )
+    return set(db.scalars(stmt))
+
+
+def friendship_rows(db: Session, user_id: int, status: str, received_only: bool = False) -> List[Dict[str, Any]]:
+    """
+    A user's friendships with the other user's username, in one query.
+    received_only limits it to requests sent to user_id.
+    """
+    other_id = _other_user(user_id)
+    stmt = select(Friendship, User.username).outerjoin(User, User.id == other_id).where(
+        Friendship.status == status,
+    ).order_by(Friendship.id)
+    if received_only:
+        stmt = stmt.where(Friendship.friend_id == user_id)
+    else:
+        stmt = stmt.where((Friendship.user_id == user_id) | (Friendship.friend_id == user_id))
+
+    return [
+        {
+            "id": friendship.id,
+            "user_id": friendship.user_id,
+            "friend_id": friendship.friend_id,
+            "status": friendship.status,
+            "created_at": friendship.created_at,
+            "friend_username": username,
+        }
+        for friendship, username in db.execute(stmt)
+    ]
@@ -0,0 +1,277 @@
+"""
+Group Balance Ledger
+Keeps a persisted per-(group, user) balance in sync with group expenses and
+settlements, so reading balances doesn't replay the whole group history.
+
+Sign convention matches the balances endpoint:
+Positive balance = others owe this user
+Negative balance = this user owes others
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, func, select, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from .models import (
+    User,
+    GroupMember,
+    GroupExpense,
+    GroupExpenseParticipant,
+    GroupSettlement,
+    GroupBalance,
+)
+from .money import ZERO, Amount, to_money
+
+# Balance changes are summed as Decimal so they match the numeric ledger exactly
+Deltas = Dict[int, Decimal]
+
+
+# ================= DELTA BUILDERS =================
+
+def expense_deltas(
+    paid_by: int,
+    total_amount: Amount,
+    shares: Iterable[Tuple[int, Amount]],
+) -> Deltas:
+    """Balance changes caused by one expense: payer credited, participants debited"""
+    deltas: Deltas = defaultdict(Decimal)
+    deltas[paid_by] += to_money(total_amount)
+    for user_id, share_amount in shares:
+        deltas[user_id] -= to_money(share_amount)
+    return deltas
+
+
+def settlement_deltas(from_user_id: int, to_user_id: int, amount: Amount) -> Deltas:
+    """Balance changes caused by one settlement payment"""
+    deltas: Deltas = defaultdict(Decimal)
+    deltas[from_user_id] += to_money(amount)
+    deltas[to_user_id] -= to_money(amount)
+    return deltas
+
+
+def stored_expense_deltas(expense: GroupExpense) -> Deltas:
+    """Balance changes for an expense as currently stored in the database"""
+    return expense_deltas(
+        expense.paid_by,
+        expense.total_amount,
+        ((p.user_id, p.share_amount) for p in expense.participants),
+    )
+
+
+def merge_deltas(*delta_maps: Deltas, signs: Optional[List[int]] = None) -> Deltas:
+    """Combine several delta maps, optionally negating some of them"""
+    merged: Deltas = defaultdict(Decimal)
+    signs = signs or [1] * len(delta_maps)
+    for sign, deltas in zip(signs, delta_maps):
+        for user_id, amount in deltas.items():
+            merged[user_id] += sign * amount
+    return merged
+
+
+# ================= LEDGER WRITES =================
+
+def apply_deltas(db: Session, group_id: int, deltas: Deltas) -> None:
+    """
+    Add deltas to the ledger in a single upsert.
+    Runs inside the caller's transaction, so the ledger commits (or rolls back)
+    together with the expense/settlement row that caused it.
+    """
+    # Sorted by user_id so concurrent writers lock rows in the same order
+    rows = [
+        {"group_id": group_id, "user_id": user_id, "balance": amount, "updated_at": datetime.utcnow()}
+        for user_id, amount in sorted(deltas.items())
+        if amount != 0
+    ]
+    if not rows:
+        return
+
+    stmt = pg_insert(GroupBalance).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[GroupBalance.group_id, GroupBalance.user_id],
+        set_={
+            "balance": GroupBalance.balance + stmt.excluded.balance,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    db.execute(stmt)
+
+
+def record_expense(db: Session, expense: GroupExpense, sign: int = 1) -> None:
+    """Apply (sign=1) or reverse (sign=-1) a stored expense on the ledger"""
+    deltas = stored_expense_deltas(expense)
+    apply_deltas(db, expense.group_id, {uid: sign * amount for uid, amount in deltas.items()})
+
+
+def record_settlement(db: Session, settlement: GroupSettlement, sign: int = 1) -> None:
+    """Apply (sign=1) or reverse (sign=-1) a settlement on the ledger"""
+    deltas = settlement_deltas(settlement.from_user_id, settlement.to_user_id, settlement.amount)
+    apply_deltas(db, settlement.group_id, {uid: sign * amount for uid, amount in deltas.items()})
+
+
+# ================= LEDGER READS =================
+
+def read_group_balances(db: Session, group_id: int) -> Dict[int, Dict[str, object]]:
+    """
+    Balances for all accepted members in one indexed query.
+    Returns: {user_id: {"username": str, "balance": float}}
+
+    A group with no ledger rows at all (new, or created before the ledger
+    and not yet backfilled) falls back to aggregate_group_balances, so it
+    never reads as all zeros while it has history.
+    """
+    rows = db.query(
+        GroupMember.user_id,
+        User.username,
+        GroupBalance.balance,
+    ).join(
+        User, GroupMember.user_id == User.id
+    ).outerjoin(
+        GroupBalance,
+        and_(
+            GroupBalance.group_id == GroupMember.group_id,
+            GroupBalance.user_id == GroupMember.user_id,
+        ),
+    ).filter(
+        GroupMember.group_id == group_id,
+        GroupMember.status == "accepted",
+    ).all()
+
+    if all(balance is None for _, _, balance in rows) and not db.query(
+        db.query(GroupBalance.id).filter(GroupBalance.group_id == group_id).exists()
+    ).scalar():
+        return aggregate_group_balances(db, group_id)
+
+    return {
+        user_id: {"username": username or "Unknown", "balance": float(balance or ZERO)}
+        for user_id, username, balance in rows
+    }
+
+
+# ================= LIVE SQL AGGREGATION =================
+
+def _balance_totals_subquery(group_id: int):
+    """
+    Net balance per user computed entirely in PostgreSQL.
+    Each source is pre-aggregated per user, then the four partial sums are
+    netted with UNION ALL + GROUP BY.
+    """
+    paid = select(
+        GroupExpense.paid_by.label("user_id"),
+        func.sum(GroupExpense.total_amount).label("amount"),
+    ).where(
+        GroupExpense.group_id == group_id
+    ).group_by(GroupExpense.paid_by)
+
+    owed = select(
+        GroupExpenseParticipant.user_id.label("user_id"),
+        (-func.sum(GroupExpenseParticipant.share_amount)).label("amount"),
+    ).join(
+        GroupExpense, GroupExpenseParticipant.group_expense_id == GroupExpense.id
+    ).where(
+        GroupExpense.group_id == group_id
+    ).group_by(GroupExpenseParticipant.user_id)
+
+    sent = select(
+        GroupSettlement.from_user_id.label("user_id"),
+        func.sum(GroupSettlement.amount).label("amount"),
+    ).where(
+        GroupSettlement.group_id == group_id
+    ).group_by(GroupSettlement.from_user_id)
+
+    received = select(
+        GroupSettlement.to_user_id.label("user_id"),
+        (-func.sum(GroupSettlement.amount)).label("amount"),
+    ).where(
+        GroupSettlement.group_id == group_id
+    ).group_by(GroupSettlement.to_user_id)
+
+    deltas = union_all(paid, owed, sent, received).subquery("deltas")
+    return select(
+        deltas.c.user_id,
+        func.sum(deltas.c.amount).label("balance"),
+    ).group_by(deltas.c.user_id).subquery("totals")
+
+
+def aggregate_group_balances(db: Session, group_id: int) -> Dict[int, Dict[str, object]]:
+    """
+    Balances for all accepted members recomputed from raw rows in one round trip.
+    Same shape as read_group_balances: {user_id: {"username": str, "balance": float}}
+    """
+    totals = _balance_totals_subquery(group_id)
+    rows = db.execute(
+        select(
+            GroupMember.user_id,
+            User.username,
+            func.coalesce(totals.c.balance, 0),
+        ).join(
+            User, GroupMember.user_id == User.id
+        ).outerjoin(
+            totals, totals.c.user_id == GroupMember.user_id
+        ).where(
+            GroupMember.group_id == group_id,
+            GroupMember.status == "accepted",
+        )
+    ).all()
+
+    return {
+        user_id: {"username": username or "Unknown", "balance": float(balance)}
+        for user_id, username, balance in rows
+    }
+
+
+# ================= REBUILD / REPAIR =================
+
+def compute_group_balances(db: Session, group_id: int) -> Deltas:
+    """
+    Recompute every user's balance from the raw expense and settlement rows.
+    Unlike aggregate_group_balances this includes users who have since left
+    the group, since the ledger keeps their rows too.
+    """
+    totals = _balance_totals_subquery(group_id)
+    rows = db.execute(select(totals.c.user_id, totals.c.balance)).all()
+    return {user_id: balance or ZERO for user_id, balance in rows}
+
+
+def rebuild_group_ledger(db: Session, group_id: int, repair: bool = True) -> List[Dict[str, float]]:
+    """
+    Compare the ledger with a full recomputation and report drift.
+    With repair=True the ledger rows are overwritten with the recomputed values
+    (the caller is responsible for committing).
+    """
+    expected = compute_group_balances(db, group_id)
+    stored = {
+        row.user_id: row
+        for row in db.query(GroupBalance).filter(GroupBalance.group_id == group_id).all()
+    }
+
+    drift = []
+    for user_id in sorted(set(expected) | set(stored)):
+        expected_balance = expected.get(user_id, ZERO)
+        stored_balance = stored[user_id].balance if user_id in stored else ZERO
+        # Both sides are exact numeric sums, so any difference is real drift
+        if expected_balance != stored_balance:
+            drift.append({
+                "group_id": group_id,
+                "user_id": user_id,
+                "ledger": float(stored_balance),
+                "expected": float(expected_balance),
+                "drift": float(stored_balance - expected_balance),
+            })
+
+    if repair:
+        for user_id, balance in expected.items():
+            if user_id in stored:
+                stored[user_id].balance = balance
+                stored[user_id].updated_at = datetime.utcnow()
+            else:
+                db.add(GroupBalance(group_id=group_id, user_id=user_id, balance=balance))
+        for user_id, row in stored.items():
+            if user_id not in expected:
+                db.delete(row)
+
+    return drift
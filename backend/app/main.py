@@ -8,12 +8,16 @@ from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from datetime import date, timedelta
 
-from . import models
-from .database import engine, get_db
+from . import models, expense_rollups, budget_alerts, email_service
+from .database import engine, get_db, pool_metrics
 from .routes import router
 from .routes_groups import router as groups_router
 from .auth import get_password_hash
 from .payments import router as payment_router
+from .user_cache import user_cache
+from .analytics import analytics_cache
+from .amortization import schedule_cache
+from .rate_limit import user_search_limiter
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("expense-backend")
@@ -35,6 +39,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let browser clients read metadata returned in response headers
+    expose_headers=[
+        "X-Next-Cursor",
+        "X-Settlement-Transfers",
+        "X-Settlement-Mode",
+        "X-Settlement-Compute-Ms",
+    ],
 )
 
 # create tables at startup — log errors but don't crash the entire process
@@ -47,6 +58,13 @@ async def on_startup():
     except Exception as e:
         # Log exception (important); don't re-raise to keep process alive
         logger.exception("Failed to create DB tables on startup — check DATABASE_URL and DB connectivity: %s", e)
+    email_service.start_sender()
+    budget_alerts.start_worker()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await budget_alerts.stop_worker()
+    await email_service.stop_sender()
 
 # small root + ping endpoints for health checks
 @app.get("/", include_in_schema=False)
@@ -57,9 +75,22 @@ async def root():
 async def ping():
     return {"pong": True}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """In-process counters for scraping (per worker)"""
+    return {
+        "auth_cache": user_cache.stats(),
+        "analytics_cache": analytics_cache.stats(),
+        "debt_schedule_cache": schedule_cache.stats(),
+        "user_search_limiter": user_search_limiter.stats(),
+        "db_pool": pool_metrics(),
+        "budget_alerts": budget_alerts.stats(),
+        "email_outbox": email_service.stats(),
+    }
+
 # Mock Data Creation Endpoint
 @app.post("/api/create-mock-data", tags=["Development"])
-async def create_mock_data(db: Session = Depends(get_db)):
+def create_mock_data(db: Session = Depends(get_db)):
     """
     Creates mock data for testing. Only use in development!
     """
@@ -98,6 +129,7 @@ async def create_mock_data(db: Session = Depends(get_db)):
                 user_id=users[0].id
             )
             db.add(expense)
+            expense_rollups.record_expense(db, expense)
         
         # Create budgets for user 1
         current_month = today.month
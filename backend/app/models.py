@@ -7,11 +7,17 @@ from sqlalchemy import (
     ForeignKey,
     Boolean,
     Table,
-    DateTime
+    DateTime,
+    UniqueConstraint,
+    CheckConstraint,
+    Index,
+    func,
+    text,
 )
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
+from .money import Money
 
 # ------------------ ASSOCIATION TABLES ------------------
 
@@ -26,6 +32,10 @@ split_participants = Table(
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Case-insensitive exact and prefix (LIKE 'abc%') username lookups
+        Index("idx_users_username_lower", text("lower(username) text_pattern_ops")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True)
@@ -80,13 +90,41 @@ class Expense(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     category = Column(String, nullable=False)
-    amount = Column(Float, nullable=False)
-    date = Column(Date)
+    amount = Column(Money, nullable=False)
+    # Part of the listing's keyset (date, id), so never NULL
+    date = Column(Date, nullable=False)
     description = Column(String)
 
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     owner = relationship("User", back_populates="expenses")
 
+    __table_args__ = (
+        # Serves keyset pagination of a user's expenses on (date, id)
+        Index("idx_expenses_user_date_id", "user_id", "date", "id"),
+    )
+
+
+# ------------------ EXPENSE ROLLUP ------------------
+
+class ExpenseRollup(Base):
+    """
+    Pre-aggregated expense totals per (user, month, category).
+    Kept in sync by the expense routes via app.expense_rollups.
+    """
+    __tablename__ = "expense_rollups"
+    __table_args__ = (
+        UniqueConstraint("user_id", "year", "month", "category", name="uq_expense_rollups_user_month_category"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    category = Column(String, nullable=False)
+    total = Column(Money, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 # ------------------ BUDGET ------------------
 
 class Budget(Base):
@@ -94,13 +132,33 @@ class Budget(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     category = Column(String, nullable=False)
-    limit_amount = Column(Float, nullable=False)
+    limit_amount = Column(Money, nullable=False)
     month = Column(Integer, nullable=False)
     year = Column(Integer, nullable=False)
 
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     owner = relationship("User", back_populates="budgets")
 
+# ------------------ BUDGET ALERT ------------------
+
+class BudgetAlert(Base):
+    """
+    One row per budget threshold that has been notified.
+    The unique constraint makes each threshold fire at most once per budget
+    (budgets are per month), even with several workers.
+    """
+    __tablename__ = "budget_alerts"
+    __table_args__ = (
+        UniqueConstraint("budget_id", "threshold", name="uq_budget_alerts_budget_threshold"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    budget_id = Column(Integer, ForeignKey("budgets.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    threshold = Column(Integer, nullable=False)
+    percent_used = Column(Float, nullable=False)
+    sent_at = Column(DateTime, default=datetime.utcnow)
+
 # ------------------ DEBT ------------------
 
 class Debt(Base):
@@ -108,12 +166,12 @@ class Debt(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    principal_amount = Column(Float, nullable=False)
+    principal_amount = Column(Money, nullable=False)
     interest_rate = Column(Float, nullable=False)
-    emi_amount = Column(Float, nullable=False)
+    emi_amount = Column(Money, nullable=False)
     emi_date = Column(Integer, nullable=False)
     start_date = Column(Date, nullable=False)
-    remaining_amount = Column(Float, nullable=False)
+    remaining_amount = Column(Money, nullable=False)
     status = Column(String, default="active")
 
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -123,6 +181,11 @@ class Debt(Base):
 
 class Friendship(Base):
     __tablename__ = "friendships"
+    __table_args__ = (
+        CheckConstraint("user_id <> friend_id", name="ck_friendships_not_self"),
+        Index("idx_friendships_user_id", "user_id"),
+        Index("idx_friendships_friend_id", "friend_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -133,6 +196,15 @@ class Friendship(Base):
     user = relationship("User", foreign_keys=[user_id], back_populates="friendships_initiated")
     friend = relationship("User", foreign_keys=[friend_id], back_populates="friendships_received")
 
+
+# One row per unordered pair, whichever user sent the request
+Index(
+    "uq_friendships_pair",
+    func.least(Friendship.user_id, Friendship.friend_id),
+    func.greatest(Friendship.user_id, Friendship.friend_id),
+    unique=True,
+)
+
 # ------------------ SPLIT EXPENSE ------------------
 
 class SplitExpense(Base):
@@ -140,7 +212,7 @@ class SplitExpense(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     description = Column(String, nullable=False)
-    total_amount = Column(Float, nullable=False)
+    total_amount = Column(Money, nullable=False)
     category = Column(String, nullable=False)
     date = Column(Date, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -162,7 +234,7 @@ class Settlement(Base):
     id = Column(Integer, primary_key=True, index=True)
     from_user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     to_user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    amount = Column(Float, nullable=False)
+    amount = Column(Money, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
 # ------------------ TRANSACTION (PAYMENTS) ------------------
@@ -173,7 +245,7 @@ class Transaction(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     stripe_payment_intent_id = Column(String, unique=True, index=True, nullable=True)
-    amount = Column(Float, nullable=False)
+    amount = Column(Money, nullable=False)
     currency = Column(String, default="INR")
     payment_method = Column(String, nullable=False)  # "card" or "upi"
     transaction_type = Column(String, nullable=False)  # "debt_payment" or "split_expense_payment"
@@ -200,6 +272,8 @@ class Group(Base):
     image_url = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Bumped on group edits and membership changes so clients can poll with updated_since
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     creator = relationship("User", back_populates="groups_created")
@@ -207,6 +281,7 @@ class Group(Base):
     members = relationship("GroupMember", back_populates="group", cascade="all, delete-orphan")
     expenses = relationship("GroupExpense", back_populates="group", cascade="all, delete-orphan")
     settlements = relationship("GroupSettlement", back_populates="group", cascade="all, delete-orphan")
+    balances = relationship("GroupBalance", back_populates="group", cascade="all, delete-orphan")
 
 # ------------------ GROUP MEMBER ------------------
 
@@ -227,13 +302,19 @@ class GroupMember(Base):
 
 class GroupExpense(Base):
     __tablename__ = "group_expenses"
+    __table_args__ = (
+        # Serves keyset pagination of a group's expenses on (date, id)
+        Index("idx_group_expenses_group_date_id", "group_id", "date", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     group_id = Column(Integer, ForeignKey("groups.id"), nullable=False)
     description = Column(String, nullable=False)
-    total_amount = Column(Float, nullable=False)
+    total_amount = Column(Money, nullable=False)
     category = Column(String, nullable=False)
     date = Column(Date, nullable=False)
+    # How the shares were computed (splits.SPLIT_TYPES), so edits can redo the split
+    split_type = Column(String, nullable=False, default="exact", server_default="exact")
     created_at = Column(DateTime, default=datetime.utcnow)
 
     paid_by = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -254,7 +335,7 @@ class GroupExpenseParticipant(Base):
     id = Column(Integer, primary_key=True, index=True)
     group_expense_id = Column(Integer, ForeignKey("group_expenses.id"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    share_amount = Column(Float, nullable=False)
+    share_amount = Column(Money, nullable=False)
 
     expense = relationship("GroupExpense", back_populates="participants")
     user = relationship("User", backref="group_expense_participations")
@@ -268,9 +349,31 @@ class GroupSettlement(Base):
     group_id = Column(Integer, ForeignKey("groups.id"), nullable=False)
     from_user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     to_user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    amount = Column(Float, nullable=False)
+    amount = Column(Money, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     group = relationship("Group", back_populates="settlements")
     from_user = relationship("User", foreign_keys=[from_user_id], backref="group_settlements_made")
     to_user = relationship("User", foreign_keys=[to_user_id], backref="group_settlements_received")
+
+
+# ------------------ GROUP BALANCE (LEDGER) ------------------
+
+class GroupBalance(Base):
+    """
+    Materialized running balance per (group, user).
+    Kept in sync by the group expense/settlement routes via app.group_ledger.
+    """
+    __tablename__ = "group_balances"
+    __table_args__ = (
+        UniqueConstraint("group_id", "user_id", name="uq_group_balances_group_user"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    balance = Column(Money, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    group = relationship("Group", back_populates="balances")
+    user = relationship("User", backref="group_balances")
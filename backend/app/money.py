@@ -0,0 +1,72 @@
+"""
+Money
+Every monetary column is numeric(12, 2): exact to the paisa, so sums in
+PostgreSQL (ledger upserts, rollups, the live balance aggregation) never
+drift. Values come back from the database as Decimal; code that adds
+amounts in Python should do it in Decimal (via to_money) or integer paise
+(settlement.to_paise), never by mixing in floats.
+
+Request schemas accept JSON numbers as floats through schemas.PositiveMoney
+and schemas.NonNegativeMoney: signed as the field requires, small enough
+for the column and in whole paise (whole_paise), so nothing is silently
+rounded when the Money column type quantizes them on write.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Union
+
+from sqlalchemy import Numeric
+from sqlalchemy.types import TypeDecorator
+
+MONEY_PRECISION = 12
+MONEY_SCALE = 2
+PAISA = Decimal("0.01")
+ZERO = Decimal("0.00")
+# Smallest amount that no longer fits in numeric(12, 2)
+AMOUNT_LIMIT = Decimal(10) ** (MONEY_PRECISION - MONEY_SCALE)
+
+Amount = Union[Decimal, float, int, str]
+
+
+def to_money(value: Amount) -> Decimal:
+    """
+    An amount as a Decimal rounded half-up to the paisa.
+    Raises ValueError for anything that isn't a finite number.
+    """
+    if isinstance(value, float):
+        # repr is the shortest string that round-trips, so 0.1 stays 0.1
+        value = repr(value)
+    try:
+        amount = Decimal(value)
+        if not amount.is_finite():
+            raise ValueError(f"Amount must be a finite number, got {value!r}")
+        return amount.quantize(PAISA, rounding=ROUND_HALF_UP)
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"Invalid amount: {value!r}")
+
+
+def not_bool(value):
+    """value unchanged unless it is a bool, which pydantic would otherwise read as 0 or 1"""
+    if isinstance(value, bool):
+        raise ValueError("Amount must be a number")
+    return value
+
+
+def whole_paise(value: float) -> float:
+    """
+    value unchanged if it is an exact number of paise (at most two decimal
+    places), otherwise ValueError, so 0.001 is refused rather than stored as 0.00
+    """
+    if float(to_money(value)) != value:
+        raise ValueError("Amount must be in whole paise (at most 2 decimal places)")
+    return value
+
+
+class Money(TypeDecorator):
+    """numeric(12, 2) column; floats are quantized on the way in"""
+
+    impl = Numeric(MONEY_PRECISION, MONEY_SCALE)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else to_money(value)
@@ -0,0 +1,65 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is the sort key of the last row on a page, encoded as URL-safe
+base64 JSON. The next page is everything strictly after that key, which an
+index on the sort columns can serve without OFFSET scans.
+The cursor for the next page is returned in the X-Next-Cursor header and is
+absent on the last page.
+"""
+
+import base64
+import json
+from typing import Any, Callable, List, Optional, Sequence
+
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode sort-key values (JSON-serializable, dates as ISO strings)"""
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, parsers: Sequence[Callable[[Any], Any]]) -> List[Any]:
+    """
+    Decode a cursor and convert each value with the matching parser.
+    Raises 400 for anything that was not produced by encode_cursor.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(parsers):
+            raise ValueError("wrong number of cursor values")
+        return [parse(value) for parse, value in zip(parsers, values)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate(
+    rows: List[Any],
+    limit: int,
+    response: Response,
+    key: Callable[[Any], Sequence[Any]],
+) -> List[Any]:
+    """
+    Trim rows fetched with limit + 1 down to one page and set the
+    X-Next-Cursor header when there is another page.
+    """
+    if len(rows) <= limit:
+        return rows
+    page = rows[:limit]
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(key(page[-1]))
+    return page
+
+
+def clamp_limit(limit: int, maximum: int = 500) -> int:
+    """Keep page sizes within 1..maximum"""
+    return max(1, min(limit, maximum))
+
+
+def optional_cursor(cursor: Optional[str], parsers: Sequence[Callable[[Any], Any]]) -> Optional[List[Any]]:
+    """decode_cursor that passes through a missing cursor"""
+    return decode_cursor(cursor, parsers) if cursor else None
@@ -2,13 +2,18 @@ import os
 import stripe
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from datetime import datetime
 
-from .database import SessionLocal
+from . import splits
+from .database import get_async_db
 from .models import User, Transaction, Debt, SplitExpense
 from .schemas import PaymentIntentCreate, PaymentConfirmCreate, TransactionResponse
-from .routes import get_current_user, get_db
+from .routes import get_current_user_async
+from .settlement import to_paise
 
 router = APIRouter(prefix="/api/payments", tags=["payments"])
 
@@ -22,8 +27,8 @@ logger = logging.getLogger("payments")
 @router.post("/create-intent")
 async def create_payment_intent(
     payload: PaymentIntentCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Create a Stripe Payment Intent for either debt payment or split expense payment.
@@ -49,10 +54,10 @@ async def create_payment_intent(
             if not payload.debt_id:
                 raise HTTPException(status_code=400, detail="debt_id required for debt payment")
 
-            debt = db.query(Debt).filter(
+            debt = (await db.execute(select(Debt).where(
                 Debt.id == payload.debt_id,
                 Debt.user_id == current_user.id,
-            ).first()
+            ))).scalars().first()
 
             if not debt:
                 raise HTTPException(status_code=404, detail="Debt not found")
@@ -71,35 +76,42 @@ async def create_payment_intent(
             if not payload.split_expense_id:
                 raise HTTPException(status_code=400, detail="split_expense_id required for split expense payment")
 
-            split = db.query(SplitExpense).filter(
-                SplitExpense.id == payload.split_expense_id,
-                SplitExpense.participants.any(id=current_user.id),
-            ).first()
+            split = (await db.execute(
+                select(SplitExpense)
+                .options(selectinload(SplitExpense.participants))
+                .where(
+                    SplitExpense.id == payload.split_expense_id,
+                    SplitExpense.participants.any(id=current_user.id),
+                )
+            )).scalars().first()
 
             if not split:
                 raise HTTPException(status_code=404, detail="Split expense not found or you're not a participant")
 
             # Check if already paid by this user
-            existing_payment = db.query(Transaction).filter(
+            existing_payment = (await db.execute(select(Transaction).where(
                 Transaction.user_id == current_user.id,
                 Transaction.split_expense_id == payload.split_expense_id,
                 Transaction.status == "succeeded",
-            ).first()
+            ))).scalars().first()
 
             if existing_payment:
                 raise HTTPException(status_code=400, detail="You've already paid for this split expense")
 
-            # Validate split amount
-            split_amount = split.total_amount / len(split.participants)
-            if abs(payload.amount - split_amount) > 0.01:  # Allow 1 paisa margin for float precision
+            # Validate split amount (same equal split as the balances endpoint)
+            split_amount = splits.equal_shares(
+                split.total_amount, [p.id for p in split.participants]
+            )[current_user.id]
+            if to_paise(payload.amount) != to_paise(split_amount):
                 raise HTTPException(
                     status_code=400,
                     detail=f"Incorrect payment amount. Should be {split_amount}",
                 )
 
-        # Create Stripe Payment Intent
-        intent = stripe.PaymentIntent.create(
-            amount=int(payload.amount * 100),  # Convert to paisa (smallest unit for INR)
+        # Create Stripe Payment Intent (blocking HTTP call, kept off the event loop)
+        intent = await run_in_threadpool(
+            stripe.PaymentIntent.create,
+            amount=to_paise(payload.amount),  # Convert to paisa (smallest unit for INR)
             currency="inr",
             payment_method_types=["card", "upi"],
             description=description,
@@ -121,8 +133,7 @@ async def create_payment_intent(
         )
 
         db.add(transaction)
-        db.commit()
-        db.refresh(transaction)
+        await db.commit()
 
         return {
             "client_secret": intent.client_secret,
@@ -144,24 +155,24 @@ async def create_payment_intent(
 @router.post("/confirm-payment")
 async def confirm_payment(
     payload: PaymentConfirmCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Confirm Stripe payment and update DB accordingly.
     """
     try:
         # Retrieve and confirm payment intent
-        intent = stripe.PaymentIntent.retrieve(payload.payment_intent_id)
+        intent = await run_in_threadpool(stripe.PaymentIntent.retrieve, payload.payment_intent_id)
 
         if intent.status != "succeeded":
             raise HTTPException(status_code=400, detail="Payment not succeeded")
 
         # Find transaction
-        transaction = db.query(Transaction).filter(
+        transaction = (await db.execute(select(Transaction).where(
             Transaction.stripe_payment_intent_id == payload.payment_intent_id,
             Transaction.user_id == current_user.id,
-        ).first()
+        ))).scalars().first()
 
         if not transaction:
             raise HTTPException(status_code=404, detail="Transaction not found")
@@ -172,10 +183,11 @@ async def confirm_payment(
 
         # Handle debt payment
         if transaction.transaction_type == "debt_payment":
-            debt = db.query(Debt).filter(Debt.id == transaction.debt_id).first()
+            debt = await db.get(Debt, transaction.debt_id)
             if debt:
+                # Both are exact numeric amounts, so paid off means exactly zero
                 debt.remaining_amount -= transaction.amount
-                if debt.remaining_amount <= 0.01:  # Float precision margin
+                if debt.remaining_amount <= 0:
                     debt.remaining_amount = 0
                     debt.status = "paid"
 
@@ -184,8 +196,8 @@ async def confirm_payment(
             # Just mark as paid; split is settled when payment is made
             pass
 
-        db.commit()
-        db.refresh(transaction)
+        await db.commit()
+        await db.refresh(transaction)
 
         return TransactionResponse.from_orm(transaction)
 
@@ -200,7 +212,7 @@ async def confirm_payment(
 # ================= WEBHOOK HANDLER =================
 
 @router.post("/webhook")
-async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
+async def stripe_webhook(request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Handle Stripe webhook events for payment confirmation and idempotency.
     """
@@ -224,9 +236,9 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
         intent_id = payment_intent["id"]
 
         # Find and update transaction
-        transaction = db.query(Transaction).filter(
+        transaction = (await db.execute(select(Transaction).where(
             Transaction.stripe_payment_intent_id == intent_id
-        ).first()
+        ))).scalars().first()
 
         if transaction and transaction.status == "pending":
             transaction.status = "succeeded"
@@ -234,14 +246,14 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
 
             # Update debt or split accordingly
             if transaction.transaction_type == "debt_payment":
-                debt = db.query(Debt).filter(Debt.id == transaction.debt_id).first()
+                debt = await db.get(Debt, transaction.debt_id)
                 if debt:
                     debt.remaining_amount -= transaction.amount
-                    if debt.remaining_amount <= 0.01:
+                    if debt.remaining_amount <= 0:
                         debt.remaining_amount = 0
                         debt.status = "paid"
 
-            db.commit()
+            await db.commit()
             logger.info(f"Transaction {transaction.id} confirmed via webhook")
 
     # Handle payment_intent.payment_failed
@@ -249,14 +261,14 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
         payment_intent = event["data"]["object"]
         intent_id = payment_intent["id"]
 
-        transaction = db.query(Transaction).filter(
+        transaction = (await db.execute(select(Transaction).where(
             Transaction.stripe_payment_intent_id == intent_id
-        ).first()
+        ))).scalars().first()
 
         if transaction:
             transaction.status = "failed"
             transaction.updated_at = datetime.utcnow()
-            db.commit()
+            await db.commit()
             logger.info(f"Transaction {transaction.id} failed")
 
     return {"received": True}
@@ -266,15 +278,18 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
 
 @router.get("/history", response_model=list[TransactionResponse])
 async def get_transaction_history(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Get all transactions for the current user.
     """
-    transactions = db.query(Transaction).filter(
-        Transaction.user_id == current_user.id
-    ).order_by(Transaction.created_at.desc()).all()
+    result = await db.execute(
+        select(Transaction)
+        .where(Transaction.user_id == current_user.id)
+        .order_by(Transaction.created_at.desc())
+    )
+    transactions = result.scalars().all()
 
     return [TransactionResponse.from_orm(t) for t in transactions]
 
@@ -284,16 +299,16 @@ async def get_transaction_history(
 @router.get("/{transaction_id}", response_model=TransactionResponse)
 async def get_transaction(
     transaction_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Get details of a specific transaction.
     """
-    transaction = db.query(Transaction).filter(
+    transaction = (await db.execute(select(Transaction).where(
         Transaction.id == transaction_id,
         Transaction.user_id == current_user.id,
-    ).first()
+    ))).scalars().first()
 
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
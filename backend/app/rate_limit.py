@@ -0,0 +1,71 @@
+"""
+Rate Limiting
+In-process token buckets keyed by user id. Like the caches in cache.py they
+are per worker process, so with N uvicorn workers a user can get up to N
+times the configured rate; that's fine for throttling abuse of expensive
+lookups, not for billing-grade quotas.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Hashable, Tuple
+
+
+class RateLimiter:
+    """Token bucket: `burst` requests at once, refilled at `rate` per second"""
+
+    def __init__(self, rate: float, burst: int, name: str = "limiter", max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.name = name
+        self.max_keys = max_keys
+        self._buckets: Dict[Hashable, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    def acquire(self, key: Hashable) -> float:
+        """
+        Take one token for key.
+        Returns 0 if allowed, otherwise the seconds until a token is free.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                self.allowed += 1
+                self._prune(now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            self.limited += 1
+            return (1 - tokens) / self.rate
+
+    def _prune(self, now: float) -> None:
+        # Buckets that have fully refilled carry no state; drop them when the map grows
+        if len(self._buckets) <= self.max_keys:
+            return
+        full_after = self.burst / self.rate
+        for key in [k for k, (_, updated) in self._buckets.items() if now - updated >= full_after]:
+            del self._buckets[key]
+
+    def stats(self) -> Dict[str, float]:
+        """Counters for the /metrics endpoint"""
+        with self._lock:
+            return {
+                "keys": len(self._buckets),
+                "rate_per_second": self.rate,
+                "burst": self.burst,
+                "allowed": self.allowed,
+                "limited": self.limited,
+            }
+
+
+# User search: short bursts of typeahead, ~1 lookup per second sustained
+user_search_limiter = RateLimiter(
+    rate=float(os.getenv("USER_SEARCH_RATE_PER_SECOND", "1")),
+    burst=int(os.getenv("USER_SEARCH_BURST", "20")),
+    name="user_search",
+)
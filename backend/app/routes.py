@@ -1,17 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.exc import IntegrityError
 from datetime import date, timedelta
-from typing import List
+from typing import List, Optional, Tuple
 from .email_service import send_email
 import logging
 import json
+import math
 
 logger = logging.getLogger(__name__)
 
 
-from .database import SessionLocal
+from .database import get_db, get_async_db
 from .models import (
     Expense,
     User,
@@ -26,14 +31,20 @@ from .models import (
     GroupSettlement,
 )
 from .schemas import (
+    UserSearchResult,
     ExpenseCreate,
     ExpenseUpdate,
     ExpenseResponse,
     BudgetCreate,
     BudgetResponse,
+    BudgetStatusResponse,
     DebtCreate,
     DebtUpdate,
     DebtResponse,
+    DebtScheduleResponse,
+    DebtProjectionResponse,
+    DebtSimulationRequest,
+    DebtStrategyResult,
     FriendRequest,
     FriendshipResponse,
     SplitExpenseCreate,
@@ -41,6 +52,22 @@ from .schemas import (
     SettlementCreate,
     SettlementResponse,
 )
+from .user_cache import UserSnapshot, user_cache
+from .pagination import clamp_limit, optional_cursor, paginate
+from . import expense_rollups, analytics, budgets, budget_alerts, amortization, friendships, splits, user_search
+from .rate_limit import user_search_limiter
+from .money import to_money
+from .settlement import from_paise, to_paise
+from .user_search import USER_SEARCH_MAX_LIMIT
+from .expense_export import EXPORT_FORMATS, export_statement, stream_export
+from .expense_import import (
+    BULK_MAX_ROWS,
+    BULK_MAX_REPORTED_ERRORS,
+    BulkImportError,
+    insert_expenses,
+    parse_csv,
+    validate_rows,
+)
 from .auth import (
     verify_password,
     get_password_hash,
@@ -55,36 +82,60 @@ from .auth import (
 router = APIRouter(prefix="/api")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
 
-# ================= DB DEPENDENCY =================
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # ================= AUTH DEPENDENCY =================
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-):
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+def _token_username(token: str) -> str:
     token_data = verify_token(token)
     if token_data is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    return token_data.username
 
-    user = db.query(User).filter(User.username == token_data.username).first()
+
+def _cache_user(username: str, user) -> UserSnapshot:
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    snapshot = UserSnapshot.from_user(user)
+    user_cache.set(username, snapshot)
+    return snapshot
+
+
+# Plain `def` so FastAPI runs the (blocking) lookup in its threadpool
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+):
+    username = _token_username(token)
+
+    # Cache hit: no database round trip for auth
+    snapshot = user_cache.get(username)
+    if snapshot is not None:
+        return snapshot
 
-    return user
+    user = db.query(User).filter(User.username == username).first()
+    return _cache_user(username, user)
+
+
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """get_current_user for async routes; shares the same cache"""
+    username = _token_username(token)
+
+    snapshot = user_cache.get(username)
+    if snapshot is not None:
+        return snapshot
+
+    user = (await db.execute(select(User).where(User.username == username))).scalars().first()
+    return _cache_user(username, user)
 
 # ================= AUTH ROUTES =================
 
@@ -129,14 +180,146 @@ def login(
 def get_me(current_user: User = Depends(get_current_user)):
     return current_user
 
+
+@router.get("/users/search", response_model=List[UserSearchResult])
+def search_users(
+    q: str = Query(..., min_length=1, max_length=50),
+    limit: int = Query(10, ge=1, le=USER_SEARCH_MAX_LIMIT),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Usernames starting with q (case-insensitive), for friend/member pickers"""
+    retry_after = user_search_limiter.acquire(current_user.id)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many searches, slow down",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+    return user_search.search_usernames(db, q.strip(), exclude_user_id=current_user.id, limit=limit)
+
 # ================= EXPENSE ROUTES =================
 
+# sort option -> (column, descending); id breaks ties so the key is unique
+EXPENSE_SORTS = {
+    "date_desc": (Expense.date, True),
+    "date_asc": (Expense.date, False),
+    "amount_desc": (Expense.amount, True),
+    "amount_asc": (Expense.amount, False),
+}
+
+
+def filter_expenses(
+    query,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    category: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+):
+    """Apply the optional listing filters (date range inclusive)"""
+    if start_date:
+        query = query.filter(Expense.date >= start_date)
+    if end_date:
+        query = query.filter(Expense.date <= end_date)
+    if category:
+        query = query.filter(Expense.category == category)
+    if min_amount is not None:
+        query = query.filter(Expense.amount >= min_amount)
+    if max_amount is not None:
+        query = query.filter(Expense.amount <= max_amount)
+    return query
+
+
+def order_expenses(query, sort: str):
+    """Order by a sort option, returning (query, column, descending)"""
+    if sort not in EXPENSE_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(EXPENSE_SORTS)}")
+    column, descending = EXPENSE_SORTS[sort]
+    if descending:
+        query = query.order_by(column.desc(), Expense.id.desc())
+    else:
+        query = query.order_by(column.asc(), Expense.id.asc())
+    return query, column, descending
+
+
 @router.get("/expenses", response_model=List[ExpenseResponse])
 def list_expenses(
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    category: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    sort: str = "date_desc",
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    unpaginated: bool = False,
 ):
-    return db.query(Expense).filter(Expense.user_id == current_user.id).all()
+    """
+    List the current user's expenses.
+    Keyset-paginated on (sort column, id): pass the X-Next-Cursor header from
+    the previous page as cursor to get the next one. unpaginated=true returns
+    every matching row in one response.
+    """
+    query = filter_expenses(
+        db.query(Expense).filter(Expense.user_id == current_user.id),
+        start_date, end_date, category, min_amount, max_amount,
+    )
+    query, column, descending = order_expenses(query, sort)
+
+    if unpaginated:
+        return query.all()
+
+    limit = clamp_limit(limit)
+    parse_value = date.fromisoformat if column is Expense.date else to_money
+    after = optional_cursor(cursor, [parse_value, int])
+    if after:
+        key = tuple_(column, Expense.id)
+        query = query.filter(key < tuple_(*after) if descending else key > tuple_(*after))
+
+    expenses = query.limit(limit + 1).all()
+    if column is Expense.date:
+        cursor_key = lambda e: [e.date.isoformat(), e.id]
+    else:
+        # Exact decimal string, so the keyset comparison matches the numeric column
+        cursor_key = lambda e: [str(e.amount), e.id]
+    return paginate(expenses, limit, response, key=cursor_key)
+
+
+@router.get("/expenses/export")
+def export_expenses(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    format: str = "csv",
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    category: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    sort: str = "date_desc",
+):
+    """
+    Stream the current user's expenses as CSV or NDJSON.
+    Takes the same filters and sort options as the list endpoint.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+
+    statement = filter_expenses(
+        export_statement().filter(Expense.user_id == current_user.id),
+        start_date, end_date, category, min_amount, max_amount,
+    )
+    statement, _, _ = order_expenses(statement, sort)
+
+    filename = f"expenses-{date.today().isoformat()}.{format}"
+    return StreamingResponse(
+        stream_export(db, statement, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 
 @router.post("/expenses", response_model=ExpenseResponse)
@@ -153,11 +336,75 @@ def add_expense(
         user_id=current_user.id,
     )
     db.add(new_expense)
+    expense_rollups.record_expense(db, new_expense)
     db.commit()
+    analytics.invalidate_user(current_user.id)
+    budget_alerts.notify_expenses_written(current_user.id, [(new_expense.category, new_expense.date)])
     db.refresh(new_expense)
     return new_expense
 
 
+@router.post("/expenses/bulk")
+async def bulk_import_expenses(
+    request: Request,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Import many expenses at once.
+    Send a JSON array of expenses, a text/csv body, or a multipart upload
+    with the CSV in a "file" field. CSV needs a header row with category and
+    amount (date and description optional). Valid rows are inserted, invalid
+    ones are reported by row number.
+    """
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                raise HTTPException(status_code=400, detail="Upload the CSV in a 'file' field")
+            rows = await run_in_threadpool(parse_csv, await upload.read())
+        elif content_type.startswith("text/csv"):
+            rows = await run_in_threadpool(parse_csv, await request.body())
+        else:
+            try:
+                rows = await request.json()
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid JSON in request body")
+            if not isinstance(rows, list):
+                raise HTTPException(status_code=400, detail="Expected a JSON array of expenses")
+    except BulkImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if len(rows) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ROWS} rows per import")
+
+    # Validation is CPU-bound; keep it off the event loop
+    valid, errors = await run_in_threadpool(validate_rows, rows, current_user.id)
+    inserted = await insert_expenses(db, valid)
+    # One rollup upsert for the whole import, in the same transaction
+    rollup_deltas = await run_in_threadpool(
+        expense_rollups.expense_rollup_deltas,
+        [(category, amount, expense_date) for category, amount, expense_date, _, _ in valid],
+    )
+    rollup_stmt = expense_rollups.rollup_upsert(current_user.id, rollup_deltas)
+    if rollup_stmt is not None:
+        await db.execute(rollup_stmt)
+    await db.commit()
+    analytics.invalidate_user(current_user.id)
+    budget_alerts.notify_expenses_written(
+        current_user.id, [(category, expense_date) for category, _, expense_date, _, _ in valid]
+    )
+    logger.info(f"Bulk import for user {current_user.id}: {inserted} inserted, {len(errors)} rejected")
+
+    return {
+        "inserted": inserted,
+        "failed": len(errors),
+        "errors": errors[:BULK_MAX_REPORTED_ERRORS],
+    }
+
+
 @router.put("/expenses/{expense_id}", response_model=ExpenseResponse)
 def update_expense(
     expense_id: int,
@@ -173,10 +420,19 @@ def update_expense(
     if not db_expense:
         raise HTTPException(status_code=404, detail="Expense not found")
 
+    old_rows = [(db_expense.category, db_expense.amount, db_expense.date)]
     for field, value in expense.dict(exclude_unset=True).items():
         setattr(db_expense, field, value)
+    new_rows = [(db_expense.category, db_expense.amount, db_expense.date)]
 
+    # Move the expense between rollup buckets (a no-op if nothing relevant changed)
+    expense_rollups.apply_rollup_deltas(db, current_user.id, expense_rollups.merge_rollup_deltas(
+        expense_rollups.expense_rollup_deltas(old_rows, sign=-1),
+        expense_rollups.expense_rollup_deltas(new_rows),
+    ))
     db.commit()
+    analytics.invalidate_user(current_user.id)
+    budget_alerts.notify_expenses_written(current_user.id, [(db_expense.category, db_expense.date)])
     db.refresh(db_expense)
     return db_expense
 
@@ -195,8 +451,10 @@ def delete_expense(
     if not db_expense:
         raise HTTPException(status_code=404, detail="Expense not found")
 
+    expense_rollups.record_expense(db, db_expense, sign=-1)
     db.delete(db_expense)
     db.commit()
+    analytics.invalidate_user(current_user.id)
     return {"message": "Expense deleted successfully"}
 
 # ================= ANALYTICS =================
@@ -206,13 +464,8 @@ def category_analytics(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    data = (
-        db.query(Expense.category, func.sum(Expense.amount))
-        .filter(Expense.user_id == current_user.id)
-        .group_by(Expense.category)
-        .all()
-    )
-    return [{"category": c, "total": float(t)} for c, t in data]
+    data = expense_rollups.read_category_totals(db, current_user.id)
+    return [{"category": c, "total": round(float(t), 2)} for c, t in data]
 
 
 @router.get("/analytics/monthly")
@@ -220,17 +473,50 @@ def monthly_analytics(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    data = (
-        db.query(
-            func.date_trunc("month", Expense.date).label("month"),
-            func.sum(Expense.amount).label("total"),
+    data = expense_rollups.read_monthly_totals(db, current_user.id)
+    return [{"month": f"{y:04d}-{m:02d}", "total": round(float(t), 2)} for y, m, t in data]
+
+
+def _split_list(values: List[str]) -> Tuple[str, ...]:
+    """Accept both ?x=a&x=b and ?x=a,b"""
+    return tuple(part.strip() for value in values for part in value.split(",") if part.strip())
+
+
+@router.get("/analytics/query")
+def analytics_query(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    granularity: Optional[str] = None,
+    group_by: List[str] = Query(default=[]),
+    metrics: List[str] = Query(default=list(analytics.DEFAULT_METRICS)),
+):
+    """
+    Aggregate expenses in one SQL query.
+    granularity: day | week | month | year (omit for no time bucketing)
+    group_by: category, weekday (ISO, 1 = Monday)
+    metrics: sum, count, avg, p50, p90
+    """
+    try:
+        query = analytics.AnalyticsQuery(
+            start_date=start_date,
+            end_date=end_date,
+            granularity=granularity,
+            group_by=_split_list(group_by),
+            metrics=_split_list(metrics),
         )
-        .filter(Expense.user_id == current_user.id)
-        .group_by("month")
-        .order_by("month")
-        .all()
-    )
-    return [{"month": m.strftime("%Y-%m"), "total": float(t)} for m, t in data]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "granularity": query.granularity,
+        "group_by": list(query.group_by),
+        "metrics": list(query.metrics),
+        "rows": analytics.run_query(db, current_user.id, query),
+    }
 
 # ================= BUDGET ROUTES =================
 
@@ -242,6 +528,27 @@ def list_budgets(
     return db.query(Budget).filter(Budget.user_id == current_user.id).all()
 
 
+@router.get("/budgets/status", response_model=List[BudgetStatusResponse])
+def budget_status(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    month: Optional[int] = Query(default=None, ge=1, le=12),
+    year: Optional[int] = Query(default=None, ge=1900, le=9999),
+):
+    """
+    Spent, remaining and percent used for each budget in a month (defaults to
+    the current month), with a linear month-end projection.
+    """
+    today = date.today()
+    return budgets.budget_statuses(
+        db,
+        current_user.id,
+        year=year or today.year,
+        month=month or today.month,
+        today=today,
+    )
+
+
 @router.post("/budgets", response_model=BudgetResponse)
 def create_budget(
     budget: BudgetCreate,
@@ -258,6 +565,8 @@ def create_budget(
     db.add(new_budget)
     db.commit()
     db.refresh(new_budget)
+    # Spending may already be over a threshold for this month
+    budget_alerts.notify_budget_written(current_user.id, new_budget.category, new_budget.year, new_budget.month)
     return new_budget
 
 
@@ -312,6 +621,64 @@ def create_debt(
     return new_debt
 
 
+@router.get("/debts/projection", response_model=DebtProjectionResponse)
+def project_debts(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Payoff dates and interest for all debts, plus a combined monthly timeline"""
+    debts = db.query(Debt).filter(Debt.user_id == current_user.id).order_by(Debt.id).all()
+    return amortization.project_debts(debts)
+
+
+@router.post("/debts/simulate", response_model=List[DebtStrategyResult])
+def simulate_debt_payoff(
+    simulation: DebtSimulationRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Compare paying only EMIs ("minimum") with avalanche (highest rate first),
+    snowball (smallest balance first) and, if custom_order is given, a custom
+    priority, each with extra_payment on top of the EMIs every month.
+    """
+    debts = db.query(Debt).filter(Debt.user_id == current_user.id).order_by(Debt.id).all()
+    try:
+        return amortization.simulate_strategies(
+            debts,
+            extra_payment=simulation.extra_payment,
+            custom_order=simulation.custom_order,
+            include_timeline=simulation.include_timeline,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/debts/{debt_id}/schedule", response_model=DebtScheduleResponse)
+def get_debt_schedule(
+    debt_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Remaining installments of a debt with their interest/principal split"""
+    debt = db.query(Debt).filter(
+        Debt.id == debt_id,
+        Debt.user_id == current_user.id,
+    ).first()
+
+    if not debt:
+        raise HTTPException(status_code=404, detail="Debt not found")
+
+    schedule = amortization.debt_schedule(debt)
+    return {
+        "debt_id": debt.id,
+        "name": debt.name,
+        "remaining_amount": debt.remaining_amount,
+        **schedule.summary(),
+        "schedule": schedule.rows(),
+    }
+
+
 @router.put("/debts/{debt_id}", response_model=DebtResponse)
 def update_debt(
     debt_id: int,
@@ -360,30 +727,8 @@ def list_friends(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    # Get accepted friendships where current user is either user or friend
-    friendships = db.query(Friendship).filter(
-        ((Friendship.user_id == current_user.id) | (Friendship.friend_id == current_user.id)),
-        Friendship.status == "accepted"
-    ).all()
-
-    # Populate friend_username for each friendship
-    result = []
-    for friendship in friendships:
-        # Determine which user is the friend (not the current user)
-        friend_id = friendship.friend_id if friendship.user_id == current_user.id else friendship.user_id
-        friend = db.query(User).filter(User.id == friend_id).first()
-
-        friendship_dict = {
-            "id": friendship.id,
-            "user_id": friendship.user_id,
-            "friend_id": friendship.friend_id,
-            "status": friendship.status,
-            "created_at": friendship.created_at,
-            "friend_username": friend.username if friend else None
-        }
-        result.append(friendship_dict)
-
-    return result
+    # Accepted friendships in either direction, with the other user's name
+    return friendships.friendship_rows(db, current_user.id, "accepted")
 
 
 @router.get("/friends/requests", response_model=List[FriendshipResponse])
@@ -391,28 +736,8 @@ def list_friend_requests(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    # Get pending friend requests sent to the current user
-    requests = db.query(Friendship).filter(
-        Friendship.friend_id == current_user.id,
-        Friendship.status == "pending"
-    ).all()
-
-    # Populate friend_username for each request (the user who sent the request)
-    result = []
-    for request in requests:
-        requester = db.query(User).filter(User.id == request.user_id).first()
-
-        request_dict = {
-            "id": request.id,
-            "user_id": request.user_id,
-            "friend_id": request.friend_id,
-            "status": request.status,
-            "created_at": request.created_at,
-            "friend_username": requester.username if requester else None
-        }
-        result.append(request_dict)
-
-    return result
+    # Pending requests sent to the current user, with the requester's name
+    return friendships.friendship_rows(db, current_user.id, "pending", received_only=True)
 
 
 @router.post("/friends/request", response_model=FriendshipResponse)
@@ -439,22 +764,20 @@ def send_friend_request(
         ).first()
         
         if not friend:
-            # List available users for debugging
-            all_users = db.query(User.username).filter(User.id != current_user.id).all()
-            available = [u.username for u in all_users]
-            logger.info(f"Available users: {available}")
-            raise HTTPException(
-                status_code=404, 
-                detail=f"User '{friend_username}' not found. Available users: {', '.join(available)}"
-            )
+            detail = f"User '{friend_username}' not found."
+            # Suggestions count against the search limit so typos can't enumerate users
+            if not user_search_limiter.acquire(current_user.id):
+                suggestions = user_search.suggest_usernames(db, friend_username, exclude_user_id=current_user.id)
+                if suggestions:
+                    detail += f" Did you mean: {', '.join(suggestions)}?"
+            raise HTTPException(status_code=404, detail=detail)
         
         if friend.id == current_user.id:
             raise HTTPException(status_code=400, detail="Cannot send friend request to yourself")
         
-        # Check if friendship already exists
+        # Check if friendship already exists (either direction)
         existing = db.query(Friendship).filter(
-            ((Friendship.user_id == current_user.id) & (Friendship.friend_id == friend.id)) |
-            ((Friendship.user_id == friend.id) & (Friendship.friend_id == current_user.id))
+            friendships.pair_filter(current_user.id, friend.id)
         ).first()
         
         if existing:
@@ -501,7 +824,22 @@ def send_friend_request(
             status="pending"
         )
         db.add(new_friendship)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            # Lost a race with a concurrent request for the same pair
+            db.rollback()
+            existing = db.query(Friendship).filter(
+                friendships.pair_filter(current_user.id, friend.id)
+            ).first()
+            return {
+                "id": existing.id,
+                "user_id": existing.user_id,
+                "friend_id": existing.friend_id,
+                "status": existing.status,
+                "created_at": existing.created_at,
+                "message": f"Friend request with {friend.username} already exists"
+            }
         db.refresh(new_friendship)
         logger.info(f"Friend request created successfully: id={new_friendship.id}")
         return {
@@ -572,6 +910,15 @@ def delete_friend(
 
 # ================= SPLIT EXPENSE ROUTES =================
 
+def _split_expense_response(split_expense: SplitExpense) -> SplitExpenseResponse:
+    """Split expense with each participant's share, as payments and balances compute it"""
+    response = SplitExpenseResponse.model_validate(split_expense)
+    shares = splits.equal_shares(split_expense.total_amount, [p.id for p in response.participants])
+    for participant in response.participants:
+        participant.share_amount = shares[participant.id]
+    return response
+
+
 @router.get("/split-expenses", response_model=List[SplitExpenseResponse])
 def list_split_expenses(
     current_user: User = Depends(get_current_user),
@@ -582,14 +929,14 @@ def list_split_expenses(
         (SplitExpense.created_by == current_user.id) |
         (SplitExpense.participants.any(id=current_user.id))
     ).all()
-    return split_expenses
+    return [_split_expense_response(split_expense) for split_expense in split_expenses]
 
 
 @router.post("/split-expenses", response_model=SplitExpenseResponse)
 async def create_split_expense(
     request: Request,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     # Log raw request body
     try:
@@ -607,18 +954,19 @@ async def create_split_expense(
         logger.error(f"Validation error: {e}")
         raise HTTPException(status_code=422, detail=str(e))
     
-    # Get participant users by IDs
-    participants = []
+    # Get participant users (and the creator) in one query
+    wanted_ids = set(expense.participant_ids) | {current_user.id}
+    result = await db.execute(select(User).where(User.id.in_(wanted_ids)))
+    users_by_id = {user.id: user for user in result.scalars()}
     for user_id in expense.participant_ids:
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
+        if user_id not in users_by_id:
             raise HTTPException(status_code=404, detail=f"User with ID {user_id} not found")
-        participants.append(user)
-    
-    # Add current user to participants if not already included
-    if current_user not in participants:
-        participants.append(current_user)
-    
+
+    # Requested order first, current user appended if not already included
+    participants = [users_by_id[user_id] for user_id in dict.fromkeys(expense.participant_ids)]
+    if current_user.id not in expense.participant_ids:
+        participants.append(users_by_id[current_user.id])
+
     new_split_expense = SplitExpense(
         description=expense.description,
         total_amount=expense.total_amount,
@@ -628,10 +976,17 @@ async def create_split_expense(
         participants=participants
     )
     db.add(new_split_expense)
-    db.commit()
-    db.refresh(new_split_expense)
+    await db.commit()
+    # Reload with participants eagerly; lazy loads aren't allowed on AsyncSession
+    result = await db.execute(
+        select(SplitExpense)
+        .options(selectinload(SplitExpense.participants))
+        .where(SplitExpense.id == new_split_expense.id)
+        .execution_options(populate_existing=True)
+    )
+    new_split_expense = result.scalars().one()
     logger.info(f"Split expense created successfully - ID: {new_split_expense.id}")
-    return new_split_expense
+    return _split_expense_response(new_split_expense)
 
 
 @router.delete("/split-expenses/{expense_id}")
@@ -666,27 +1021,31 @@ def get_balances(
         | (SplitExpense.participants.any(id=current_user.id))
     ).all()
 
+    # Summed in paise with the split engine's equal split, so the remainder
+    # paisa lands on the same participant as in payment validation
     for exp in split_expenses:
         participants = exp.participants
         if not participants:
             continue
 
-        split_amount = exp.total_amount / len(participants)
+        total = to_paise(exp.total_amount)
+        shares = splits.equal_shares(exp.total_amount, [p.id for p in participants])
 
         for p in participants:
+            share = to_paise(shares[p.id])
             if p.id == current_user.id:
                 if exp.created_by == current_user.id:
-                    balances["you"] = balances.get("you", 0) + (exp.total_amount - split_amount)
+                    balances["you"] = balances.get("you", 0) + (total - share)
                 else:
-                    balances["you"] = balances.get("you", 0) - split_amount
+                    balances["you"] = balances.get("you", 0) - share
             else:
                 balances.setdefault(p.username, 0)
                 if exp.created_by == current_user.id:
-                    balances[p.username] -= split_amount
+                    balances[p.username] -= share
                 elif p.id == exp.created_by:
-                    balances[p.username] += split_amount
+                    balances[p.username] += share
 
-    return balances
+    return {name: from_paise(amount) for name, amount in balances.items()}
 
 # ================= SETTLEMENT SUGGESTIONS =================
 
@@ -746,5 +1105,5 @@ def test_email():
         <p>Your SendGrid email integration is working.</p>
         """
     )
-    return {"email_sent": success}
+    return {"email_queued": success}
 
@@ -3,14 +3,18 @@ Group Management Routes
 Handles group creation, member management, expenses, balances, and settlements.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
-from datetime import date, datetime
-from typing import List, Dict, Any, Union
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.orm import Session, selectinload, joinedload
+from sqlalchemy import func, insert, inspect, tuple_
+from datetime import date, datetime, timezone
+from typing import List, Dict, Any, Optional, Set, Tuple, Union
 from collections import defaultdict
 
-from .database import SessionLocal
+from .database import get_db
+from . import group_ledger, splits
+from .friendships import accepted_friend_ids
+from .pagination import clamp_limit, optional_cursor, paginate
+from .settlement import SETTLEMENT_MODES, DEFAULT_TIME_BUDGET_MS, compute_settlements, from_paise, to_paise
 from .models import (
     User,
     Group,
@@ -18,7 +22,6 @@ from .models import (
     GroupExpense,
     GroupExpenseParticipant,
     GroupSettlement,
-    Friendship,
 )
 from .schemas import (
     GroupCreate,
@@ -28,6 +31,8 @@ from .schemas import (
     GroupInvite,
     GroupMemberUpdate,
     GroupExpenseCreate,
+    GroupExpenseBulkCreate,
+    GroupExpenseBulkResponse,
     GroupExpenseUpdate,
     GroupExpenseResponse,
     GroupExpenseParticipantResponse,
@@ -43,14 +48,6 @@ router = APIRouter(prefix="/api/groups", tags=["groups"])
 
 # ================= HELPER FUNCTIONS =================
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 def is_group_member(group_id: int, user_id: int, db: Session, accepted_only: bool = True) -> GroupMember:
     """Check if user is a member of the group"""
     query = db.query(GroupMember).filter(
@@ -66,6 +63,20 @@ def is_group_member(group_id: int, user_id: int, db: Session, accepted_only: boo
     return member
 
 
+def accepted_member_ids(group_id: int, user_ids, db: Session) -> Set[int]:
+    """The subset of user_ids that are accepted members of the group (one IN query)"""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return set()
+    return {
+        user_id for (user_id,) in db.query(GroupMember.user_id).filter(
+            GroupMember.group_id == group_id,
+            GroupMember.user_id.in_(user_ids),
+            GroupMember.status == "accepted",
+        )
+    }
+
+
 def is_group_admin(group_id: int, user_id: int, db: Session) -> GroupMember:
     """Check if user is an admin of the group"""
     member = db.query(GroupMember).filter(
@@ -88,6 +99,30 @@ def get_group_or_404(group_id: int, db: Session) -> Group:
     return group
 
 
+def touch_group(group: Group) -> None:
+    """Mark a group as changed so clients polling with updated_since pick it up"""
+    group.updated_at = datetime.utcnow()
+
+
+def with_members(query):
+    """Eager-load members and their usernames: one extra query for the whole page"""
+    return query.options(
+        selectinload(Group.members).joinedload(GroupMember.user)
+    )
+
+
+def load_group_balances(group_id: int, db: Session, source: str = "ledger") -> Dict[int, Dict[str, Any]]:
+    """
+    Load member balances from the ledger table ("ledger") or recompute them
+    from raw rows with a single SQL aggregation ("live").
+    """
+    if source == "ledger":
+        return group_ledger.read_group_balances(db, group_id)
+    if source == "live":
+        return group_ledger.aggregate_group_balances(db, group_id)
+    raise HTTPException(status_code=400, detail="source must be 'ledger' or 'live'")
+
+
 # ================= GROUP MANAGEMENT ENDPOINTS =================
 
 @router.post("", response_model=GroupResponse, status_code=status.HTTP_201_CREATED)
@@ -132,10 +167,16 @@ def list_user_groups(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
     include_pending: bool = False,
+    updated_since: Optional[datetime] = None,
+    skip: int = 0,
+    limit: int = 100,
 ):
     """
     List all groups the current user is a member of.
     By default, only shows accepted memberships.
+    updated_since (UTC) returns only groups changed after that time, so
+    clients can poll cheaply. Paginate with skip/limit (max 500).
+    Groups, members and usernames are loaded in two queries regardless of page size.
     """
     query = db.query(Group).join(GroupMember).filter(
         GroupMember.user_id == current_user.id,
@@ -145,7 +186,14 @@ def list_user_groups(
     if not include_pending:
         query = query.filter(GroupMember.status == "accepted")
     
-    groups = query.all()
+    if updated_since is not None:
+        if updated_since.tzinfo is not None:
+            # Stored timestamps are naive UTC
+            updated_since = updated_since.astimezone(timezone.utc).replace(tzinfo=None)
+        query = query.filter(Group.updated_at > updated_since)
+    
+    limit = clamp_limit(limit)
+    groups = with_members(query).order_by(Group.id).offset(max(skip, 0)).limit(limit).all()
     return [build_group_response(group, db) for group in groups]
 
 
@@ -223,70 +271,62 @@ def invite_members(
     group = get_group_or_404(group_id, db)
     is_group_member(group_id, current_user.id, db)
     
-    invited_count = 0
     not_found = []
     already_members = []
     not_friends = []
     cannot_invite_self = []  # Separate category for self-invitation
-    
-    for username in invite_data.usernames:
-        # Clean the username
-        username = username.strip()
-        
-        # Check if user exists - fetch by username first
-        user = db.query(User).filter(
-            func.lower(User.username) == username.lower()
-        ).first()
-        
-        if not user:
+
+    usernames = [username.strip() for username in invite_data.usernames]
+    lowered = {username.lower() for username in usernames if username}
+
+    # 1. Resolve every username at once (case-insensitive)
+    users_by_name = {
+        username.lower(): user_id
+        for user_id, username in db.query(User.id, User.username).filter(
+            func.lower(User.username).in_(lowered)
+        )
+    } if lowered else {}
+    candidate_ids = set(users_by_name.values()) - {current_user.id}
+
+    # 2. Which of them are friends (REQUIRED for group invitations)
+    friend_ids = accepted_friend_ids(db, current_user.id, candidate_ids)
+
+    # 3. Which of them already have a membership row (any status)
+    member_ids = {
+        user_id for (user_id,) in db.query(GroupMember.user_id).filter(
+            GroupMember.group_id == group_id,
+            GroupMember.user_id.in_(friend_ids),
+        )
+    } if friend_ids else set()
+
+    # Report per username in request order, exactly as before
+    new_members = []
+    for username in usernames:
+        user_id = users_by_name.get(username.lower())
+        if user_id is None:
             not_found.append(username)
-            continue
-        
-        # Don't allow inviting yourself
-        if user.id == current_user.id:
-            cannot_invite_self.append(username)  # Use specific list for self-invitation
-            continue
-        
-        # Check if they are friends (REQUIRED for group invitations)
-        friendship = db.query(Friendship).filter(
-            or_(
-                and_(
-                    Friendship.user_id == current_user.id,
-                    Friendship.friend_id == user.id,
-                    Friendship.status == "accepted"
-                ),
-                and_(
-                    Friendship.user_id == user.id,
-                    Friendship.friend_id == current_user.id,
-                    Friendship.status == "accepted"
-                )
-            )
-        ).first()
-        
-        if not friendship:
+        elif user_id == current_user.id:
+            cannot_invite_self.append(username)
+        elif user_id not in friend_ids:
             not_friends.append(username)
-            continue
-        
-        # Check if already a member
-        existing = db.query(GroupMember).filter(
-            GroupMember.group_id == group_id,
-            GroupMember.user_id == user.id
-        ).first()
-        
-        if existing:
+        elif user_id in member_ids:
             already_members.append(username)
-            continue
-        
-        # Create pending membership
-        new_member = GroupMember(
-            group_id=group_id,
-            user_id=user.id,
-            role="member",
-            status="pending",
-        )
-        db.add(new_member)
-        invited_count += 1
+        else:
+            # Create pending membership
+            new_members.append(GroupMember(
+                group_id=group_id,
+                user_id=user_id,
+                role="member",
+                status="pending",
+            ))
+            # A repeated username in the same request counts as already a member
+            member_ids.add(user_id)
+
+    invited_count = len(new_members)
+    db.add_all(new_members)
     
+    if invited_count > 0:
+        touch_group(group)
     db.commit()
     
     message_parts = []
@@ -310,22 +350,16 @@ def get_pending_invitations(
     db: Session = Depends(get_db),
 ):
     """Get all pending group invitations for the current user"""
-    # Find all groups where user has pending membership
-    pending_memberships = db.query(GroupMember).filter(
-        GroupMember.user_id == current_user.id,
-        GroupMember.status == "pending"
-    ).all()
-    
-    groups = []
-    for membership in pending_memberships:
-        group = db.query(Group).filter(
-            Group.id == membership.group_id,
-            Group.is_active == True
-        ).first()
-        if group:
-            groups.append(build_group_response(group, db))
+    # Find all active groups where user has pending membership
+    groups = with_members(
+        db.query(Group).join(GroupMember).filter(
+            GroupMember.user_id == current_user.id,
+            GroupMember.status == "pending",
+            Group.is_active == True,
+        )
+    ).order_by(Group.id).all()
     
-    return groups
+    return [build_group_response(group, db) for group in groups]
 
 
 @router.post("/{group_id}/join", response_model=Dict[str, str])
@@ -347,6 +381,7 @@ def accept_group_invitation(
         raise HTTPException(status_code=404, detail="No pending invitation found")
     
     member.status = "accepted"
+    touch_group(group)
     db.commit()
     
     return {"message": "Successfully joined the group"}
@@ -388,6 +423,7 @@ def update_member_role(
     if update_data.status is not None:
         member.status = update_data.status
     
+    touch_group(group)
     db.commit()
     
     return {"message": "Member updated successfully"}
@@ -430,6 +466,7 @@ def remove_member(
             raise HTTPException(status_code=400, detail="Cannot remove the last admin")
     
     db.delete(member)
+    touch_group(group)
     db.commit()
     
     return None
@@ -437,6 +474,95 @@ def remove_member(
 
 # ================= GROUP EXPENSE ENDPOINTS =================
 
+# Most rows accepted by one bulk request
+GROUP_EXPENSE_BULK_MAX_ROWS = 2000
+
+
+# (user_id, share_amount) pairs produced by the split engine
+Shares = List[Tuple[int, float]]
+
+
+def expense_user_ids(expense_data: GroupExpenseCreate) -> List[int]:
+    """Every user an expense splits between (participants and receipt items)"""
+    user_ids = [p.user_id for p in expense_data.participants]
+    for item in expense_data.items or []:
+        user_ids.extend(item.user_ids)
+    return list(dict.fromkeys(user_ids))
+
+
+def split_expense(expense_data: GroupExpenseCreate) -> Shares:
+    """Compute participant shares with the split engine; raises splits.SplitError"""
+    field = splits.SPLIT_VALUE_FIELDS.get(expense_data.split_type)
+    return splits.split_amount(
+        expense_data.total_amount,
+        expense_data.split_type,
+        [p.user_id for p in expense_data.participants],
+        values=[getattr(p, field) for p in expense_data.participants] if field else None,
+        items=[(item.amount, item.user_ids) for item in expense_data.items or []],
+    )
+
+
+def resolve_expense(expense_data: GroupExpenseCreate, members: Set[int]) -> Tuple[Shares, List[str]]:
+    """Participant shares and validation errors for one expense against the group's accepted members"""
+    errors = []
+    # Validate paid_by is a group member
+    if expense_data.paid_by not in members:
+        errors.append("Payer must be a group member")
+    
+    # Validate all participants are group members
+    for user_id in expense_user_ids(expense_data):
+        if user_id not in members:
+            errors.append(f"User {user_id} is not a member of this group")
+    
+    # Split the total; shares always add up to it exactly
+    try:
+        shares = split_expense(expense_data)
+    except splits.SplitError as e:
+        errors.append(str(e))
+        shares = []
+    return shares, errors
+
+
+def insert_group_expenses(db: Session, group_id: int, expenses: List[Tuple[GroupExpenseCreate, Shares]]) -> List[int]:
+    """
+    Write validated expenses, their participants and the resulting ledger
+    change with one INSERT per table and one ledger upsert.
+    Runs in the caller's transaction; returns the new ids in input order.
+    """
+    today = date.today()
+    expense_ids = db.execute(
+        insert(GroupExpense).returning(GroupExpense.id, sort_by_parameter_order=True),
+        [
+            {
+                "group_id": group_id,
+                "description": e.description,
+                "total_amount": e.total_amount,
+                "category": e.category,
+                "paid_by": e.paid_by,
+                "date": e.date or today,
+                "split_type": e.split_type,
+            }
+            for e, _ in expenses
+        ],
+    ).scalars().all()
+    
+    db.execute(insert(GroupExpenseParticipant), [
+        {
+            "group_expense_id": expense_id,
+            "user_id": user_id,
+            "share_amount": share_amount,
+        }
+        for expense_id, (_, shares) in zip(expense_ids, expenses)
+        for user_id, share_amount in shares
+    ])
+    
+    group_ledger.apply_deltas(db, group_id, group_ledger.merge_deltas(*(
+        group_ledger.expense_deltas(e.paid_by, e.total_amount, shares)
+        for e, shares in expenses
+    )))
+    return expense_ids
+
+
 @router.post("/{group_id}/expenses", response_model=GroupExpenseResponse, status_code=status.HTTP_201_CREATED)
 def create_group_expense(
     group_id: int,
@@ -446,84 +572,107 @@ def create_group_expense(
 ):
     """Create a new expense for the group"""
     group = get_group_or_404(group_id, db)
-    is_group_member(group_id, current_user.id, db)
     
-    # Validate paid_by is a group member
-    payer_member = db.query(GroupMember).filter(
-        GroupMember.group_id == group_id,
-        GroupMember.user_id == expense_data.paid_by,
-        GroupMember.status == "accepted"
-    ).first()
+    # Caller, payer and every participant checked with one membership query
+    members = accepted_member_ids(
+        group_id, {current_user.id, expense_data.paid_by, *expense_user_ids(expense_data)}, db
+    )
+    if current_user.id not in members:
+        raise HTTPException(status_code=403, detail="You are not a member of this group")
     
-    if not payer_member:
-        raise HTTPException(status_code=400, detail="Payer must be a group member")
+    shares, errors = resolve_expense(expense_data, members)
+    if errors:
+        raise HTTPException(status_code=400, detail=errors[0])
     
-    # Validate all participants are group members
-    for participant in expense_data.participants:
-        member = db.query(GroupMember).filter(
-            GroupMember.group_id == group_id,
-            GroupMember.user_id == participant.user_id,
-            GroupMember.status == "accepted"
-        ).first()
-        
-        if not member:
-            raise HTTPException(
-                status_code=400,
-                detail=f"User {participant.user_id} is not a member of this group"
-            )
+    # Expense, participants and ledger update in the same transaction
+    (expense_id,) = insert_group_expenses(db, group_id, [(expense_data, shares)])
+    db.commit()
     
-    # Validate share amounts sum to total
-    total_shares = sum(p.share_amount for p in expense_data.participants)
-    if abs(total_shares - expense_data.total_amount) > 0.01:  # Allow for floating point errors
-        raise HTTPException(
-            status_code=400,
-            detail=f"Participant shares ({total_shares}) must equal total amount ({expense_data.total_amount})"
-        )
+    return build_expense_response(db.get(GroupExpense, expense_id), db)
+
+
+@router.post("/{group_id}/expenses/bulk", response_model=GroupExpenseBulkResponse, status_code=status.HTTP_201_CREATED)
+def bulk_create_group_expenses(
+    group_id: int,
+    bulk_data: GroupExpenseBulkCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Create many group expenses at once (e.g. a trip spreadsheet).
+    All rows are validated first; if any row is invalid nothing is written
+    and every problem is reported by row number (0-based).
+    """
+    get_group_or_404(group_id, db)
+    expenses = bulk_data.expenses
+    if len(expenses) > GROUP_EXPENSE_BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {GROUP_EXPENSE_BULK_MAX_ROWS} expenses per request")
+    
+    # One membership query for every user referenced by any row
+    user_ids = {current_user.id}
+    for e in expenses:
+        user_ids.add(e.paid_by)
+        user_ids.update(expense_user_ids(e))
+    members = accepted_member_ids(group_id, user_ids, db)
+    if current_user.id not in members:
+        raise HTTPException(status_code=403, detail="You are not a member of this group")
     
-    # Create the expense
-    expense_date = expense_data.date if expense_data.date else date.today()
-    new_expense = GroupExpense(
-        group_id=group_id,
-        description=expense_data.description,
-        total_amount=expense_data.total_amount,
-        category=expense_data.category,
-        paid_by=expense_data.paid_by,
-        date=expense_date,
-    )
-    db.add(new_expense)
-    db.flush()
-    
-    # Add participants
-    for participant in expense_data.participants:
-        participant_entry = GroupExpenseParticipant(
-            group_expense_id=new_expense.id,
-            user_id=participant.user_id,
-            share_amount=participant.share_amount,
-        )
-        db.add(participant_entry)
+    resolved, errors = [], []
+    for row, e in enumerate(expenses):
+        shares, row_errors = resolve_expense(e, members)
+        resolved.append((e, shares))
+        errors.extend({"row": row, "error": error} for error in row_errors)
+    if errors:
+        raise HTTPException(status_code=400, detail={"message": "No expenses were created", "errors": errors})
     
+    expense_ids = insert_group_expenses(db, group_id, resolved)
     db.commit()
-    db.refresh(new_expense)
     
-    return build_expense_response(new_expense, db)
+    return {"created": len(expense_ids), "expense_ids": expense_ids}
 
 
 @router.get("/{group_id}/expenses", response_model=List[GroupExpenseResponse])
 def list_group_expenses(
     group_id: int,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
     limit: int = 100,
+    cursor: Optional[str] = None,
 ):
-    """List all expenses for a group"""
+    """
+    List expenses for a group, newest first.
+    Keyset-paginated on (date, id): pass the X-Next-Cursor header from the
+    previous page as cursor to get the next one.
+    """
     group = get_group_or_404(group_id, db)
     is_group_member(group_id, current_user.id, db)
     
-    expenses = db.query(GroupExpense).filter(
-        GroupExpense.group_id == group_id
-    ).order_by(GroupExpense.date.desc()).limit(limit).all()
+    limit = clamp_limit(limit)
+    after = optional_cursor(cursor, [date.fromisoformat, int])
+    
+    query = db.query(GroupExpense).filter(GroupExpense.group_id == group_id)
+    if after:
+        query = query.filter(tuple_(GroupExpense.date, GroupExpense.id) < tuple_(*after))
+    
+    expenses = query.order_by(
+        GroupExpense.date.desc(), GroupExpense.id.desc()
+    ).limit(limit + 1).all()
     
-    return [build_expense_response(expense, db) for expense in expenses]
+    page = paginate(expenses, limit, response, key=lambda e: [e.date.isoformat(), e.id])
+    return hydrate_expense_responses(page, db)
+
+
+def set_expense_shares(expense: GroupExpense, shares: Shares) -> None:
+    """Make an expense's participant rows match shares, updating rows in place"""
+    existing = {p.user_id: p for p in expense.participants}
+    for user_id, share_amount in shares:
+        if user_id in existing:
+            existing.pop(user_id).share_amount = share_amount
+        else:
+            expense.participants.append(GroupExpenseParticipant(user_id=user_id, share_amount=share_amount))
+    for participant in existing.values():
+        expense.participants.remove(participant)
 
 
 @router.put("/{group_id}/expenses/{expense_id}", response_model=GroupExpenseResponse)
@@ -546,15 +695,53 @@ def update_group_expense(
     if not expense:
         raise HTTPException(status_code=404, detail="Expense not found")
     
+    old_deltas = group_ledger.stored_expense_deltas(expense)
+    total_amount = expense.total_amount if expense_data.total_amount is None else expense_data.total_amount
+    
+    if expense_data.participants is not None or expense_data.items is not None:
+        # Re-split with the new participants, like a new expense
+        try:
+            resplit = GroupExpenseCreate(
+                description=expense.description,
+                total_amount=total_amount,
+                category=expense.category,
+                paid_by=expense.paid_by,
+                split_type=expense_data.split_type or expense.split_type,
+                participants=expense_data.participants or [],
+                items=expense_data.items,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        members = accepted_member_ids(group_id, {expense.paid_by, *expense_user_ids(resplit)}, db)
+        shares, errors = resolve_expense(resplit, members)
+        if errors:
+            raise HTTPException(status_code=400, detail=errors[0])
+        set_expense_shares(expense, shares)
+        expense.split_type = resplit.split_type
+    elif to_paise(total_amount) != to_paise(expense.total_amount):
+        # Only an equal split can be redone from what's stored
+        if expense.split_type != "equal":
+            raise HTTPException(
+                status_code=422,
+                detail=f"Changing the total of a {expense.split_type} split needs participants with their new shares",
+            )
+        user_ids = [p.user_id for p in sorted(expense.participants, key=lambda p: p.id)]
+        set_expense_shares(expense, splits.split_amount(total_amount, "equal", user_ids))
+    
+    expense.total_amount = total_amount
     if expense_data.description is not None:
         expense.description = expense_data.description
-    if expense_data.total_amount is not None:
-        expense.total_amount = expense_data.total_amount
     if expense_data.category is not None:
         expense.category = expense_data.category
     if expense_data.date is not None:
         expense.date = expense_data.date
     
+    # Ledger only moves by the difference between old and new amounts
+    new_deltas = group_ledger.stored_expense_deltas(expense)
+    group_ledger.apply_deltas(
+        db, group_id, group_ledger.merge_deltas(new_deltas, old_deltas, signs=[1, -1])
+    )
+    
     db.commit()
     db.refresh(expense)
     
@@ -580,6 +767,7 @@ def delete_group_expense(
     if not expense:
         raise HTTPException(status_code=404, detail="Expense not found")
     
+    group_ledger.record_expense(db, expense, sign=-1)
     db.delete(expense)
     db.commit()
     
@@ -593,9 +781,12 @@ def get_group_balances(
     group_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
+    source: str = "ledger",
 ):
     """
-    Calculate net balances for all group members.
+    Net balances for all group members.
+    Read from the balance ledger by default; source=live recomputes them
+    from raw rows in one SQL query.
     Returns: {user_id: {"username": str, "balance": float}}
     Positive balance = others owe this user
     Negative balance = this user owes others
@@ -603,101 +794,59 @@ def get_group_balances(
     group = get_group_or_404(group_id, db)
     is_group_member(group_id, current_user.id, db)
     
-    # Get all group members
-    members = db.query(GroupMember).filter(
-        GroupMember.group_id == group_id,
-        GroupMember.status == "accepted"
-    ).all()
-    
-    member_ids = [m.user_id for m in members]
-    balances = {m.user_id: 0.0 for m in members}
-    
-    # Get all group expenses
-    expenses = db.query(GroupExpense).filter(
-        GroupExpense.group_id == group_id
-    ).all()
-    
-    for expense in expenses:
-        # Payer gets credited
-        balances[expense.paid_by] += expense.total_amount
-        
-        # Participants get debited by their share
-        for participant in expense.participants:
-            balances[participant.user_id] -= participant.share_amount
-    
-    # Subtract settlements
-    settlements = db.query(GroupSettlement).filter(
-        GroupSettlement.group_id == group_id
-    ).all()
-    
-    for settlement in settlements:
-        balances[settlement.from_user_id] += settlement.amount
-        balances[settlement.to_user_id] -= settlement.amount
-    
-    # Build response with usernames
-    result = {}
-    for user_id, balance in balances.items():
-        user = db.query(User).filter(User.id == user_id).first()
-        result[user_id] = {
-            "username": user.username if user else "Unknown",
-            "balance": round(balance, 2)
-        }
-    
-    return result
+    return load_group_balances(group_id, db, source)
 
 
 @router.get("/{group_id}/settlements/suggestions", response_model=List[Dict[str, Any]])
 def get_settlement_suggestions(
     group_id: int,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
+    source: str = "ledger",
+    mode: str = "greedy",
+    time_budget_ms: int = DEFAULT_TIME_BUDGET_MS,
 ):
     """
-    Generate optimized settlement suggestions to minimize transactions.
-    Uses greedy algorithm to match debtors with creditors.
+    Generate settlement suggestions that settle every member's balance.
+    mode=greedy matches debtors and creditors in order, mode=heap matches the
+    largest amounts first, mode=exact minimises the number of transfers
+    (falls back to heap for large groups or when time_budget_ms runs out).
+    The transfer count, mode used and compute time are returned in the
+    X-Settlement-Transfers, X-Settlement-Mode and X-Settlement-Compute-Ms headers.
     """
     group = get_group_or_404(group_id, db)
     is_group_member(group_id, current_user.id, db)
     
+    if mode not in SETTLEMENT_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"mode must be one of: {', '.join(SETTLEMENT_MODES)}"
+        )
+    
     # Get balances
-    balances_dict = get_group_balances(group_id, current_user, db)
-    
-    # Separate debtors and creditors
-    debtors = []   # People who owe money (negative balance)
-    creditors = []  # People who are owed money (positive balance)
-    
-    for user_id, data in balances_dict.items():
-        balance = data["balance"]
-        if balance < -0.01:  # Owe money
-            debtors.append({"user_id": user_id, "username": data["username"], "amount": abs(balance)})
-        elif balance > 0.01:  # Owed money
-            creditors.append({"user_id": user_id, "username": data["username"], "amount": balance})
-    
-    # Generate settlements
-    settlements = []
-    i, j = 0, 0
-    
-    while i < len(debtors) and j < len(creditors):
-        debtor = debtors[i]
-        creditor = creditors[j]
-        
-        amount = min(debtor["amount"], creditor["amount"])
-        
-        settlements.append({
-            "from_user_id": debtor["user_id"],
-            "from_username": debtor["username"],
-            "to_user_id": creditor["user_id"],
-            "to_username": creditor["username"],
-            "amount": round(amount, 2)
-        })
-        
-        debtor["amount"] -= amount
-        creditor["amount"] -= amount
-        
-        if debtor["amount"] < 0.01:
-            i += 1
-        if creditor["amount"] < 0.01:
-            j += 1
+    balances_dict = load_group_balances(group_id, db, source)
+    
+    result = compute_settlements(
+        {user_id: data["balance"] for user_id, data in balances_dict.items()},
+        mode=mode,
+        time_budget_ms=max(1, min(time_budget_ms, 5000)),
+    )
+    
+    settlements = [
+        {
+            "from_user_id": from_user_id,
+            "from_username": balances_dict[from_user_id]["username"],
+            "to_user_id": to_user_id,
+            "to_username": balances_dict[to_user_id]["username"],
+            "amount": from_paise(amount),
+        }
+        for from_user_id, to_user_id, amount in result["transfers"]
+    ]
+    
+    response.headers["X-Settlement-Transfers"] = str(len(settlements))
+    response.headers["X-Settlement-Mode"] = result["mode"]
+    response.headers["X-Settlement-Compute-Ms"] = f"{result['compute_ms']:.3f}"
     
     return settlements
 
@@ -732,6 +881,7 @@ def create_group_settlement(
     )
     
     db.add(new_settlement)
+    group_ledger.record_settlement(db, new_settlement)
     db.commit()
     db.refresh(new_settlement)
     
@@ -758,21 +908,28 @@ def list_group_settlements(
 # ================= HELPER RESPONSE BUILDERS =================
 
 def build_group_response(group: Group, db: Session) -> GroupResponse:
-    """Build a complete group response with member info"""
-    members = db.query(GroupMember, User).join(
-        User, GroupMember.user_id == User.id
-    ).filter(GroupMember.group_id == group.id).all()
+    """
+    Build a complete group response with member info.
+    Uses members eager-loaded with with_members() when present, otherwise
+    fetches them with a single join.
+    """
+    if "members" in inspect(group).unloaded:
+        members = db.query(GroupMember, User).join(
+            User, GroupMember.user_id == User.id
+        ).filter(GroupMember.group_id == group.id).all()
+    else:
+        members = [(member, member.user) for member in group.members]
     
     member_infos = [
         GroupMemberInfo(
-            id=member.GroupMember.id,
-            user_id=member.GroupMember.user_id,
-            username=member.User.username,
-            role=member.GroupMember.role,
-            status=member.GroupMember.status,
-            joined_at=member.GroupMember.joined_at,
+            id=member.id,
+            user_id=member.user_id,
+            username=user.username,
+            role=member.role,
+            status=member.status,
+            joined_at=member.joined_at,
         )
-        for member in members
+        for member, user in members
     ]
     
     return GroupResponse(
@@ -784,36 +941,65 @@ def build_group_response(group: Group, db: Session) -> GroupResponse:
         is_active=group.is_active,
         created_by=group.created_by,
         created_at=group.created_at,
+        updated_at=group.updated_at,
         members=member_infos,
     )
 
 
-def build_expense_response(expense: GroupExpense, db: Session) -> GroupExpenseResponse:
-    """Build a complete expense response with participant info"""
-    payer = db.query(User).filter(User.id == expense.paid_by).first()
-    
-    participants = db.query(GroupExpenseParticipant, User).join(
+def hydrate_expense_responses(expenses: List[GroupExpense], db: Session) -> List[GroupExpenseResponse]:
+    """
+    Build responses for many expenses with two queries total:
+    one for all participants (with usernames), one for all payer usernames.
+    """
+    if not expenses:
+        return []
+    
+    expense_ids = [expense.id for expense in expenses]
+    participants_by_expense: Dict[int, List[GroupExpenseParticipantResponse]] = defaultdict(list)
+    
+    participants = db.query(
+        GroupExpenseParticipant.group_expense_id,
+        GroupExpenseParticipant.user_id,
+        GroupExpenseParticipant.share_amount,
+        User.username,
+    ).join(
         User, GroupExpenseParticipant.user_id == User.id
-    ).filter(GroupExpenseParticipant.group_expense_id == expense.id).all()
-    
-    participant_responses = [
-        GroupExpenseParticipantResponse(
-            user_id=part.GroupExpenseParticipant.user_id,
-            username=part.User.username,
-            share_amount=part.GroupExpenseParticipant.share_amount,
+    ).filter(
+        GroupExpenseParticipant.group_expense_id.in_(expense_ids)
+    ).order_by(GroupExpenseParticipant.id).all()
+    
+    for expense_id, user_id, share_amount, username in participants:
+        participants_by_expense[expense_id].append(
+            GroupExpenseParticipantResponse(
+                user_id=user_id,
+                username=username,
+                share_amount=share_amount,
+            )
         )
-        for part in participants
-    ]
     
-    return GroupExpenseResponse(
-        id=expense.id,
-        group_id=expense.group_id,
-        description=expense.description,
-        total_amount=expense.total_amount,
-        category=expense.category,
-        date=expense.date,
-        paid_by=expense.paid_by,
-        payer_username=payer.username if payer else "Unknown",
-        created_at=expense.created_at,
-        participants=participant_responses,
+    payer_ids = {expense.paid_by for expense in expenses}
+    payer_names = dict(
+        db.query(User.id, User.username).filter(User.id.in_(payer_ids)).all()
     )
+    
+    return [
+        GroupExpenseResponse(
+            id=expense.id,
+            group_id=expense.group_id,
+            description=expense.description,
+            total_amount=expense.total_amount,
+            category=expense.category,
+            date=expense.date,
+            paid_by=expense.paid_by,
+            payer_username=payer_names.get(expense.paid_by, "Unknown"),
+            split_type=expense.split_type,
+            created_at=expense.created_at,
+            participants=participants_by_expense[expense.id],
+        )
+        for expense in expenses
+    ]
+
+
+def build_expense_response(expense: GroupExpense, db: Session) -> GroupExpenseResponse:
+    """Build a complete expense response with participant info"""
+    return hydrate_expense_responses([expense], db)[0]
@@ -1,6 +1,26 @@
-from pydantic import BaseModel, EmailStr, Field, field_validator
+from pydantic import AfterValidator, BaseModel, BeforeValidator, EmailStr, Field, field_validator, model_validator
 from datetime import date, datetime
-from typing import Optional, List, Union, Any
+# A field named date with a default shadows the type inside its class, and
+# pydantic then resolves Optional[date] to NoneType; annotate those with this
+from datetime import date as date_type
+from typing import Annotated, Optional, List, Union, Any
+
+from .money import AMOUNT_LIMIT, not_bool, whole_paise
+
+# ================= MONEY =================
+
+# Whole-paise amounts that fit numeric(12, 2); anything else (too large,
+# sub-paisa, NaN/inf, a boolean, or the wrong sign) is a 422 instead of being rounded
+# or overflowing in the database
+PositiveMoney = Annotated[
+    float, Field(gt=0, lt=float(AMOUNT_LIMIT), allow_inf_nan=False),
+    BeforeValidator(not_bool), AfterValidator(whole_paise),
+]
+NonNegativeMoney = Annotated[
+    float, Field(ge=0, lt=float(AMOUNT_LIMIT), allow_inf_nan=False),
+    BeforeValidator(not_bool), AfterValidator(whole_paise),
+]
+
 
 # ================= USERS =================
 
@@ -20,6 +40,11 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 
+class UserSearchResult(BaseModel):
+    id: int
+    username: str
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -27,25 +52,37 @@ class Token(BaseModel):
 
 # ================= EXPENSES =================
 
+# A blank description is stored as NULL, however the expense arrives (API or bulk import)
+ExpenseDescription = Annotated[Optional[str], AfterValidator(lambda v: v or None)]
+
+
 class ExpenseCreate(BaseModel):
     category: str
-    amount: float
-    description: Optional[str] = ""
-    date: Optional[date] = None
+    amount: PositiveMoney
+    description: ExpenseDescription = None
+    date: Optional[date_type] = None
 
 
 class ExpenseUpdate(BaseModel):
     category: Optional[str] = None
-    amount: Optional[float] = None
-    description: Optional[str] = None
-    date: Optional[date] = None
+    amount: Optional[PositiveMoney] = None
+    description: ExpenseDescription = None
+    date: Optional[date_type] = None
+
+    @field_validator('date')
+    @classmethod
+    def validate_date(cls, v):
+        # Leave the field out to keep the current date; it can't be cleared
+        if v is None:
+            raise ValueError('date cannot be null')
+        return v
 
 
 class ExpenseResponse(BaseModel):
     id: int
     category: str
     amount: float
-    description: str
+    description: Optional[str]
     date: date
     user_id: int
 
@@ -57,7 +94,7 @@ class ExpenseResponse(BaseModel):
 
 class BudgetCreate(BaseModel):
     category: str
-    limit_amount: float
+    limit_amount: PositiveMoney
     month: int
     year: int
 
@@ -74,21 +111,34 @@ class BudgetResponse(BaseModel):
         from_attributes = True
 
 
+class BudgetStatusResponse(BaseModel):
+    id: int
+    category: str
+    month: int
+    year: int
+    limit_amount: float
+    spent: float
+    remaining: float
+    percent_used: Optional[float]
+    projected_spend: float
+    projected_over_budget: bool
+
+
 # ================= DEBTS =================
 
 class DebtCreate(BaseModel):
     name: str
-    principal_amount: float
+    principal_amount: NonNegativeMoney
     interest_rate: float
-    emi_amount: float
+    emi_amount: PositiveMoney
     emi_date: int
     start_date: date
-    remaining_amount: float
+    remaining_amount: NonNegativeMoney
     status: Optional[str] = "active"
 
 
 class DebtUpdate(BaseModel):
-    remaining_amount: Optional[float] = None
+    remaining_amount: Optional[NonNegativeMoney] = None
     status: Optional[str] = None
 
 
@@ -108,6 +158,82 @@ class DebtResponse(BaseModel):
         from_attributes = True
 
 
+class AmortizationRow(BaseModel):
+    installment: int
+    date: date
+    payment: float
+    interest: float
+    principal: float
+    balance: float
+
+
+class DebtScheduleSummary(BaseModel):
+    installments: int
+    pays_off: bool
+    payoff_date: Optional[date]
+    total_interest: float
+    total_paid: float
+
+
+class DebtScheduleResponse(DebtScheduleSummary):
+    debt_id: int
+    name: str
+    remaining_amount: float
+    schedule: List[AmortizationRow]
+
+
+class DebtProjectionItem(DebtScheduleSummary):
+    debt_id: int
+    name: str
+    remaining_amount: float
+
+
+class DebtProjectionMonth(BaseModel):
+    month: str
+    payment: float
+    balance: float
+
+
+class DebtProjectionResponse(BaseModel):
+    debts: List[DebtProjectionItem]
+    total_remaining: float
+    total_interest: float
+    monthly_emi: float
+    debt_free_date: Optional[date]
+    timeline: List[DebtProjectionMonth]
+
+
+class DebtSimulationRequest(BaseModel):
+    extra_payment: NonNegativeMoney = 0.0
+    # Debt ids to prioritise for the "custom" strategy
+    custom_order: Optional[List[int]] = None
+    include_timeline: bool = True
+
+
+class DebtPayoff(BaseModel):
+    debt_id: int
+    payoff_month: Optional[str]
+
+
+class DebtSimulationMonth(BaseModel):
+    month: str
+    payment: float
+    interest: float
+    balance: float
+
+
+class DebtStrategyResult(BaseModel):
+    strategy: str
+    order: List[int]
+    months: int
+    pays_off: bool
+    payoff_month: Optional[str]
+    total_interest: float
+    total_paid: float
+    debts: List[DebtPayoff]
+    timeline: List[DebtSimulationMonth]
+
+
 # ================= FRIENDS =================
 
 class FriendRequest(BaseModel):
@@ -130,7 +256,7 @@ class FriendshipResponse(BaseModel):
 
 class SplitExpenseCreate(BaseModel):
     description: str
-    total_amount: float
+    total_amount: PositiveMoney
     category: str
     participant_ids: List[int]  # Changed from participant_usernames to participant_ids
     date: Any = None  # Accept any type, will be validated/converted
@@ -154,6 +280,8 @@ class ParticipantInfo(BaseModel):
     id: int
     username: str
     email: str
+    # This participant's part of the total, as the split engine divides it
+    share_amount: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -177,7 +305,7 @@ class SplitExpenseResponse(BaseModel):
 
 class SettlementCreate(BaseModel):
     to_username: str
-    amount: float
+    amount: PositiveMoney
 
 
 class SettlementResponse(BaseModel):
@@ -194,7 +322,7 @@ class SettlementResponse(BaseModel):
 # ================= PAYMENTS & TRANSACTIONS =================
 
 class PaymentIntentCreate(BaseModel):
-    amount: float
+    amount: PositiveMoney
     payment_method: str  # "card" or "upi"
     transaction_type: str  # "debt_payment" or "split_expense_payment"
     debt_id: Optional[int] = None
@@ -264,6 +392,7 @@ class GroupResponse(BaseModel):
     is_active: bool
     created_by: int
     created_at: datetime
+    updated_at: Optional[datetime] = None
     members: List[GroupMemberInfo] = []
 
     class Config:
@@ -283,15 +412,27 @@ class GroupMemberUpdate(BaseModel):
 
 class GroupExpenseParticipantInput(BaseModel):
     user_id: int
-    share_amount: float
+    # The field matching the expense's split_type is required
+    share_amount: Optional[NonNegativeMoney] = None  # exact
+    percentage: Optional[float] = None  # percentage
+    shares: Optional[float] = None  # shares
+
+
+class GroupExpenseItemInput(BaseModel):
+    description: Optional[str] = None
+    amount: NonNegativeMoney
+    user_ids: List[int]  # Split equally between these users
 
 
 class GroupExpenseCreate(BaseModel):
     description: str
-    total_amount: float
+    total_amount: PositiveMoney
     category: str
     paid_by: int  # User ID who paid
-    participants: List[GroupExpenseParticipantInput]
+    # "equal", "percentage", "shares", "exact" or "itemized" (see splits.py)
+    split_type: str = "exact"
+    participants: List[GroupExpenseParticipantInput] = []
+    items: Optional[List[GroupExpenseItemInput]] = None  # itemized only
     date: Any = None
     
     @field_validator('date', mode='before')
@@ -308,19 +449,33 @@ class GroupExpenseCreate(BaseModel):
                 return None
         return None
     
-    @field_validator('participants')
-    @classmethod
-    def validate_participants(cls, v):
-        if not v or len(v) == 0:
+    @model_validator(mode='after')
+    def validate_participants(self):
+        # Itemized splits take their participants from the items
+        if self.split_type != 'itemized' and not self.participants:
             raise ValueError('At least one participant is required')
-        return v
+        return self
+
+
+class GroupExpenseBulkCreate(BaseModel):
+    expenses: List[GroupExpenseCreate] = Field(..., min_length=1)
+
+
+class GroupExpenseBulkResponse(BaseModel):
+    created: int
+    expense_ids: List[int]
 
 
 class GroupExpenseUpdate(BaseModel):
     description: Optional[str] = None
-    total_amount: Optional[float] = None
+    total_amount: Optional[PositiveMoney] = None
     category: Optional[str] = None
-    date: Optional[date] = None
+    date: Optional[date_type] = None
+    # Send participants (and items for itemized) to re-split the expense;
+    # without them a new total is re-split only for equal splits
+    split_type: Optional[str] = None
+    participants: Optional[List[GroupExpenseParticipantInput]] = None
+    items: Optional[List[GroupExpenseItemInput]] = None
 
 
 class GroupExpenseParticipantResponse(BaseModel):
@@ -341,6 +496,7 @@ class GroupExpenseResponse(BaseModel):
     date: date
     paid_by: int
     payer_username: str
+    split_type: str
     created_at: datetime
     participants: List[GroupExpenseParticipantResponse]
 
@@ -352,7 +508,7 @@ class GroupExpenseResponse(BaseModel):
 
 class GroupSettlementCreate(BaseModel):
     to_user_id: int
-    amount: float
+    amount: PositiveMoney
 
 
 class GroupSettlementResponse(BaseModel):
@@ -0,0 +1,205 @@
+"""
+Settlement Engine
+Turns net group balances into a list of transfers that settles everyone up.
+
+All arithmetic is done in integer paise (1/100 of the currency unit) so the
+transfers always sum exactly to the balances they settle.
+
+Modes:
+  greedy - single pass over debtors and creditors in the order given
+  heap   - repeatedly match the largest debtor with the largest creditor
+  exact  - minimise the number of transfers by splitting members into the
+           largest possible number of zero-sum subsets (bitmask DP), then
+           settling each subset with the heap pass. Falls back to heap when
+           there are too many members or the time budget runs out.
+"""
+
+import heapq
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+SETTLEMENT_MODES = ("greedy", "heap", "exact")
+
+# Bitmask DP is O(2^n * n); beyond this many non-zero balances it is not attempted
+EXACT_MAX_MEMBERS = 20
+DEFAULT_TIME_BUDGET_MS = 250
+
+# (user_id, amount in paise); the amount sign follows the balances endpoint
+Balance = Tuple[int, int]
+# (from_user_id, to_user_id, amount in paise)
+Transfer = Tuple[int, int, int]
+
+
+class SettlementTimeout(Exception):
+    """Raised when the exact solver exceeds its time budget"""
+
+
+def to_paise(amount: float) -> int:
+    """Convert a currency amount to integer paise"""
+    return int(round(amount * 100))
+
+
+def from_paise(paise: int) -> float:
+    """Convert integer paise back to a currency amount"""
+    return paise / 100
+
+
+# ================= MODES =================
+
+def greedy_transfers(balances: List[Balance]) -> List[Transfer]:
+    """Match debtors and creditors in input order (the original algorithm)"""
+    debtors = [[uid, -amount] for uid, amount in balances if amount < 0]
+    creditors = [[uid, amount] for uid, amount in balances if amount > 0]
+
+    transfers = []
+    i, j = 0, 0
+    while i < len(debtors) and j < len(creditors):
+        amount = min(debtors[i][1], creditors[j][1])
+        transfers.append((debtors[i][0], creditors[j][0], amount))
+        debtors[i][1] -= amount
+        creditors[j][1] -= amount
+        if debtors[i][1] == 0:
+            i += 1
+        if creditors[j][1] == 0:
+            j += 1
+    return transfers
+
+
+def heap_transfers(balances: List[Balance]) -> List[Transfer]:
+    """Always settle the largest outstanding debt against the largest credit"""
+    # heapq is a min-heap, so amounts are negated; user_id breaks ties deterministically
+    debtors = [(amount, uid) for uid, amount in balances if amount < 0]
+    creditors = [(-amount, uid) for uid, amount in balances if amount > 0]
+    heapq.heapify(debtors)
+    heapq.heapify(creditors)
+
+    transfers = []
+    while debtors and creditors:
+        debt, debtor_id = heapq.heappop(debtors)
+        credit, creditor_id = heapq.heappop(creditors)
+        amount = min(-debt, -credit)
+        transfers.append((debtor_id, creditor_id, amount))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor_id))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor_id))
+    return transfers
+
+
+def exact_transfers(balances: List[Balance], time_budget_ms: float = DEFAULT_TIME_BUDGET_MS) -> List[Transfer]:
+    """
+    Minimum number of transfers.
+    A group of k members whose balances sum to zero can always settle in k - 1
+    transfers, so the optimum is n - (max number of disjoint zero-sum subsets).
+    Raises SettlementTimeout if the budget is exceeded.
+    """
+    deadline = time.perf_counter() + time_budget_ms / 1000
+    nonzero = [(uid, amount) for uid, amount in balances if amount != 0]
+
+    # Exactly opposite balances are always an optimal pair; take them up front
+    transfers: List[Transfer] = []
+    remaining: List[Balance] = []
+    unmatched_credit: Dict[int, List[int]] = {}
+    for uid, amount in sorted(nonzero, key=lambda b: (-b[1], b[0])):
+        if amount > 0:
+            unmatched_credit.setdefault(amount, []).append(uid)
+    for uid, amount in sorted(nonzero, key=lambda b: (b[1], b[0])):
+        if amount < 0 and unmatched_credit.get(-amount):
+            transfers.append((uid, unmatched_credit[-amount].pop(0), -amount))
+        elif amount < 0:
+            remaining.append((uid, amount))
+    remaining.extend((uid, amount) for amount, uids in unmatched_credit.items() for uid in uids)
+    remaining.sort(key=lambda b: b[0])
+
+    n = len(remaining)
+    if n == 0:
+        return transfers
+    if n > EXACT_MAX_MEMBERS:
+        raise SettlementTimeout(f"{n} unsettled members exceeds exact limit of {EXACT_MAX_MEMBERS}")
+
+    amounts = [amount for _, amount in remaining]
+    size = 1 << n
+    subset_sum = [0] * size
+    best = [0] * size  # max number of zero-sum subsets that `mask` can be split into
+    for mask in range(1, size):
+        if mask & 0xFFF == 0 and time.perf_counter() > deadline:
+            raise SettlementTimeout("exact settlement exceeded time budget")
+        low = mask & -mask
+        subset_sum[mask] = subset_sum[mask ^ low] + amounts[low.bit_length() - 1]
+        m = mask
+        top = 0
+        while m:
+            bit = m & -m
+            value = best[mask ^ bit]
+            if value > top:
+                top = value
+            m ^= bit
+        best[mask] = top + (1 if subset_sum[mask] == 0 else 0)
+
+    # Walk back from the full set to recover the order members were added in;
+    # every zero prefix sum along that order closes one zero-sum subset.
+    order = []
+    mask = size - 1
+    while mask:
+        m = mask
+        choice = None
+        while m:
+            bit = m & -m
+            if choice is None or best[mask ^ bit] > best[mask ^ choice]:
+                choice = bit
+            m ^= bit
+        order.append(choice.bit_length() - 1)
+        mask ^= choice
+    order.reverse()
+
+    subset: List[Balance] = []
+    running = 0
+    for index in order:
+        subset.append(remaining[index])
+        running += amounts[index]
+        if running == 0:
+            transfers.extend(heap_transfers(subset))
+            subset = []
+    # Only non-empty when rounding left the balances a paisa or two off zero
+    if subset:
+        transfers.extend(heap_transfers(subset))
+    return transfers
+
+
+# ================= ENTRY POINT =================
+
+def compute_settlements(
+    balances: Dict[int, float],
+    mode: str = "greedy",
+    time_budget_ms: float = DEFAULT_TIME_BUDGET_MS,
+) -> Dict[str, Any]:
+    """
+    Compute transfers for {user_id: balance} using the requested mode.
+    Returns the transfers (amounts in paise), the mode actually used and the
+    compute time in milliseconds.
+    """
+    if mode not in SETTLEMENT_MODES:
+        raise ValueError(f"mode must be one of {', '.join(SETTLEMENT_MODES)}")
+
+    # Rounded balances may not net to exactly zero; the residue is left
+    # unsettled rather than inventing money.
+    paise = [(uid, to_paise(amount)) for uid, amount in balances.items()]
+    start = time.perf_counter()
+    used_mode: Optional[str] = mode
+    if mode == "greedy":
+        transfers = greedy_transfers(paise)
+    elif mode == "heap":
+        transfers = heap_transfers(paise)
+    else:
+        try:
+            transfers = exact_transfers(paise, time_budget_ms)
+        except SettlementTimeout:
+            transfers = heap_transfers(paise)
+            used_mode = "heap"
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "transfers": transfers,
+        "mode": used_mode,
+        "compute_ms": elapsed_ms,
+    }
@@ -0,0 +1,172 @@
+"""
+Split Engine
+Divides an expense total between participants. Like the settlement engine
+all arithmetic is in integer paise, and the shares always add up to the
+total exactly.
+
+Modes:
+  equal      - everyone pays the same
+  percentage - each participant pays a percentage; percentages add up to 100
+  shares     - each participant pays in proportion to a weight (e.g. 2 nights vs 3)
+  exact      - amounts are given; they must add up to the total
+  itemized   - receipt lines, each split equally between the people who had
+               it; whatever the lines don't cover (tax, tip, discount) is
+               spread in proportion to each person's subtotal
+
+Paise that don't divide evenly go to the largest fractional remainders
+(largest remainder method), ties broken by input order, so the same input
+always produces the same split.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .settlement import from_paise, to_paise
+
+SPLIT_TYPES = ("equal", "percentage", "shares", "exact", "itemized")
+# Participant field holding each user's value, for the modes that take one
+SPLIT_VALUE_FIELDS = {"percentage": "percentage", "shares": "shares", "exact": "share_amount"}
+
+# Percentages are compared in hundredths of a percent (basis points)
+FULL_PERCENT = 100 * 100
+
+# (amount in paise, user ids sharing it)
+Item = Tuple[int, Sequence[int]]
+
+
+class SplitError(ValueError):
+    """Raised when split input can't produce a valid split"""
+
+
+def allocate(total: int, weights: Sequence[int]) -> List[int]:
+    """
+    Divide total paise in proportion to non-negative integer weights.
+    Floors every share, then hands the leftover paise to the largest
+    remainders (earliest index first on ties).
+    """
+    weight_sum = sum(weights)
+    if weight_sum <= 0:
+        raise SplitError("Split weights must add up to more than zero")
+    shares = []
+    remainders = []
+    for index, weight in enumerate(weights):
+        share, remainder = divmod(total * weight, weight_sum)
+        shares.append(share)
+        remainders.append((-remainder, index))
+    leftover = total - sum(shares)
+    if leftover:
+        for _, index in sorted(remainders)[:leftover]:
+            shares[index] += 1
+    return shares
+
+
+def split_equal(total: int, count: int) -> List[int]:
+    """total paise split between count people"""
+    if count <= 0:
+        raise SplitError("At least one participant is required")
+    return allocate(total, [1] * count)
+
+
+def split_by_percentage(total: int, percentages: Sequence[float]) -> List[int]:
+    """total paise split by percentages (2 decimal places) that add up to 100"""
+    basis_points = [to_paise(p) for p in percentages]
+    if any(bp < 0 for bp in basis_points):
+        raise SplitError("Percentages can't be negative")
+    if sum(basis_points) != FULL_PERCENT:
+        raise SplitError(f"Percentages must add up to 100 (got {from_paise(sum(basis_points))})")
+    return allocate(total, basis_points)
+
+
+def split_by_shares(total: int, shares: Sequence[float]) -> List[int]:
+    """total paise split in proportion to weights (2 decimal places)"""
+    weights = [to_paise(s) for s in shares]
+    if any(w < 0 for w in weights):
+        raise SplitError("Shares can't be negative")
+    return allocate(total, weights)
+
+
+def split_exact(total: int, amounts: Sequence[float]) -> List[int]:
+    """Given amounts in paise, checked to add up to total"""
+    paise = [to_paise(a) for a in amounts]
+    if any(p < 0 for p in paise):
+        raise SplitError("Share amounts can't be negative")
+    if sum(paise) != total:
+        raise SplitError(
+            f"Participant shares ({from_paise(sum(paise))}) must equal total amount ({from_paise(total)})"
+        )
+    return paise
+
+
+def split_itemized(total: int, items: Sequence[Item]) -> Dict[int, int]:
+    """
+    Per-user paise for a receipt: each item split equally between its users,
+    then total (items plus tax/tip/discount) allocated by those subtotals.
+    Users appear in the order they first appear on the receipt.
+    """
+    subtotals: Dict[int, int] = {}
+    for amount, user_ids in items:
+        if amount < 0:
+            raise SplitError("Item amounts can't be negative")
+        if not user_ids:
+            raise SplitError("Every item needs at least one participant")
+        if len(set(user_ids)) != len(user_ids):
+            raise SplitError("An item lists the same participant twice")
+        for user_id, share in zip(user_ids, split_equal(amount, len(user_ids))):
+            subtotals[user_id] = subtotals.get(user_id, 0) + share
+    if sum(subtotals.values()) <= 0:
+        raise SplitError("Items must add up to more than zero")
+    return dict(zip(subtotals, allocate(total, list(subtotals.values()))))
+
+
+def split_amount(
+    total_amount: float,
+    split_type: str,
+    user_ids: Sequence[int],
+    values: Optional[Sequence[Optional[float]]] = None,
+    items: Optional[Sequence[Tuple[float, Sequence[int]]]] = None,
+) -> List[Tuple[int, float]]:
+    """
+    Split a currency amount and return [(user_id, share_amount)].
+    values holds each user's percentage, weight or exact amount, depending
+    on split_type; items holds (amount, user_ids) receipt lines for itemized.
+    """
+    if split_type not in SPLIT_TYPES:
+        raise SplitError(f"Unknown split type '{split_type}'. Use one of: {', '.join(SPLIT_TYPES)}")
+    total = to_paise(total_amount)
+    if total <= 0:
+        raise SplitError("Total amount must be greater than zero")
+
+    if split_type == "itemized":
+        if not items:
+            raise SplitError("Itemized splits need at least one item")
+        shares = split_itemized(total, [(to_paise(amount), list(ids)) for amount, ids in items])
+        return [(user_id, from_paise(share)) for user_id, share in shares.items()]
+
+    if len(set(user_ids)) != len(user_ids):
+        raise SplitError("A participant is listed more than once")
+    if split_type == "equal":
+        paise = split_equal(total, len(user_ids))
+    else:
+        field = SPLIT_VALUE_FIELDS[split_type]
+        values = list(values or [None] * len(user_ids))
+        missing = [user_id for user_id, value in zip(user_ids, values) if value is None]
+        if missing:
+            raise SplitError(f"User {missing[0]} is missing '{field}' for a {split_type} split")
+        if split_type == "percentage":
+            paise = split_by_percentage(total, values)
+        elif split_type == "shares":
+            paise = split_by_shares(total, values)
+        else:
+            paise = split_exact(total, values)
+    return [(user_id, from_paise(share)) for user_id, share in zip(user_ids, paise)]
+
+
+def equal_shares(total_amount: float, user_ids: Sequence[int]) -> Dict[int, float]:
+    """
+    Equal split keyed by user id, with leftover paise going to the lowest
+    ids, so every caller (balances, payments) agrees on who owes what.
+    """
+    ordered = sorted(user_ids)
+    return {
+        user_id: from_paise(share)
+        for user_id, share in zip(ordered, split_equal(to_paise(total_amount), len(ordered)))
+    }
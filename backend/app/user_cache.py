@@ -0,0 +1,72 @@
+"""
+Authenticated user cache.
+Maps a token subject (username) to a lightweight snapshot of the user so
+get_current_user doesn't hit the users table on every request.
+
+Entries are dropped whenever a User row is updated or deleted through the
+ORM in this process; other workers pick up changes when the TTL expires.
+"""
+
+import os
+from dataclasses import dataclass
+
+from sqlalchemy import event, inspect
+
+from .cache import TTLCache
+from .models import User
+
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_SIZE = int(os.getenv("AUTH_CACHE_MAX_SIZE", "10000"))
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """
+    Detached, read-only view of a User.
+    Routes that need the ORM object (e.g. to attach it to a relationship)
+    should load it with db.get(User, current_user.id).
+    """
+    id: int
+    username: str
+    email: str
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserSnapshot":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            is_active=user.is_active,
+        )
+
+
+user_cache = TTLCache(maxsize=AUTH_CACHE_MAX_SIZE, ttl=AUTH_CACHE_TTL_SECONDS, name="auth_users")
+
+
+def invalidate_user(username: str) -> None:
+    """Forget a cached user, e.g. after a password reset or deactivation"""
+    user_cache.invalidate(username)
+
+
+# Columns whose change must evict the cached snapshot (password included so a
+# reset takes effect immediately in this worker)
+_WATCHED_COLUMNS = ("username", "email", "is_active", "password")
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_on_update(mapper, connection, target):
+    # after_update also fires when only a relationship collection changed
+    # (e.g. joining a split expense), which doesn't affect the snapshot
+    state = inspect(target)
+    if not any(state.attrs[column].history.has_changes() for column in _WATCHED_COLUMNS):
+        return
+    invalidate_user(target.username)
+    # A renamed user must not stay reachable under the old token subject
+    for old_username in state.attrs.username.history.deleted:
+        invalidate_user(old_username)
+
+
+@event.listens_for(User, "after_delete")
+def _invalidate_on_delete(mapper, connection, target):
+    invalidate_user(target.username)
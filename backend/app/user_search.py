@@ -0,0 +1,70 @@
+"""
+User Search
+Case-insensitive username prefix search backed by the expression index
+idx_users_username_lower (lower(username) text_pattern_ops), so a lookup is
+an index range scan bounded by the result limit rather than a table scan.
+
+suggest_usernames() powers "did you mean" hints for a mistyped username: it
+reads a small window of names on either side of it in index order (two
+bounded range scans) and ranks them by similarity in Python.
+"""
+
+import difflib
+from typing import List, Optional
+
+from sqlalchemy import func, select, text, union_all
+from sqlalchemy.orm import Session
+
+from .models import User
+
+USER_SEARCH_MAX_LIMIT = 20
+SUGGESTION_PREFIX_LENGTH = 3
+# Rows read on each side of the mistyped name
+SUGGESTION_CANDIDATES = 25
+SUGGESTION_CUTOFF = 0.6
+
+
+def _lowered():
+    return func.lower(User.username)
+
+
+def _ordered(stmt, descending: bool = False):
+    # Order with the index's own operators so the scan returns rows in order
+    # (no sort step); text_pattern_ops doesn't serve a plain ORDER BY
+    operator = "~>~" if descending else "~<~"
+    return stmt.order_by(text(f"lower(users.username) USING {operator}"))
+
+
+def _candidates(prefix: str, exclude_user_id: Optional[int]):
+    stmt = select(User.id, User.username).where(
+        _lowered().startswith(prefix.lower(), autoescape=True),
+        User.is_active.is_(True),
+    )
+    if exclude_user_id is not None:
+        stmt = stmt.where(User.id != exclude_user_id)
+    return stmt
+
+
+def search_usernames(db: Session, q: str, exclude_user_id: Optional[int] = None, limit: int = 10) -> List[dict]:
+    """Active users whose username starts with q (case-insensitive), alphabetically"""
+    limit = max(1, min(limit, USER_SEARCH_MAX_LIMIT))
+    rows = db.execute(_ordered(_candidates(q, exclude_user_id)).limit(limit))
+    return [{"id": user_id, "username": username} for user_id, username in rows]
+
+
+def suggest_usernames(db: Session, name: str, exclude_user_id: Optional[int] = None, limit: int = 5) -> List[str]:
+    """Existing usernames close to a name that wasn't found"""
+    prefix = name[:SUGGESTION_PREFIX_LENGTH]
+    if not prefix:
+        return []
+    # The names sorting just before and just after the typo share the
+    # longest prefixes with it; take a window on each side
+    lowered, target = _lowered(), name.lower()
+    candidates = _candidates(prefix, exclude_user_id)
+    after = _ordered(candidates.where(lowered.op("~>=~")(target))).limit(SUGGESTION_CANDIDATES)
+    before = _ordered(candidates.where(lowered.op("~<~")(target)), descending=True).limit(SUGGESTION_CANDIDATES)
+    names = [username for _, username in db.execute(union_all(after, before))]
+
+    by_lower = {username.lower(): username for username in names}
+    close = difflib.get_close_matches(target, list(by_lower), n=limit, cutoff=SUGGESTION_CUTOFF)
+    return [by_lower[match] for match in close]
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark bulk expense import against a running server.
+
+Registers a throwaway user and compares throughput of:
+  - single:   one POST /api/expenses per row (measured on a sample)
+  - json:     POST /api/expenses/bulk with a JSON array
+  - csv:      POST /api/expenses/bulk with a multipart CSV upload
+
+The user and all imported rows are deleted afterwards (needs DATABASE_URL).
+
+Usage:
+    python benchmark_bulk_import.py
+    python benchmark_bulk_import.py --rows 100000 --single-sample 500 --base-url http://localhost:8000
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import csv
+import io
+import random
+import time
+import uuid
+from datetime import date, timedelta
+
+import requests
+from sqlalchemy import delete
+
+from app.database import SessionLocal
+from app.models import Expense, ExpenseRollup, User
+
+CATEGORIES = ["Food", "Transport", "Entertainment", "Shopping", "Bills", "Healthcare"]
+
+
+def make_rows(count):
+    start = date.today() - timedelta(days=3 * 365)
+    return [
+        {
+            "category": random.choice(CATEGORIES),
+            "amount": round(random.uniform(10, 5000), 2),
+            "date": (start + timedelta(days=random.randrange(3 * 365))).isoformat(),
+            "description": f"imported row {i}",
+        }
+        for i in range(count)
+    ]
+
+
+def to_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=["category", "amount", "date", "description"])
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def register(base_url):
+    name = f"bulkbench_{uuid.uuid4().hex[:8]}"
+    password = "benchpass123"
+    response = requests.post(f"{base_url}/api/register", json={
+        "username": name, "email": f"{name}@example.com", "password": password,
+    })
+    response.raise_for_status()
+    token = requests.post(f"{base_url}/api/token", data={"username": name, "password": password}).json()["access_token"]
+    return response.json()["id"], {"Authorization": f"Bearer {token}"}
+
+
+def report(name, rows, seconds):
+    print(f"{name:>8} {rows:>9} {seconds:>9.2f} {rows / seconds:>11,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk expense import")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--single-sample", type=int, default=500,
+                        help="rows sent one request at a time to estimate the per-row rate")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    args = parser.parse_args()
+
+    user_id, headers = register(args.base_url)
+    session = requests.Session()
+    try:
+        print(f"{'mode':>8} {'rows':>9} {'seconds':>9} {'rows/s':>11}")
+        print("-" * 40)
+
+        sample = make_rows(args.single_sample)
+        start = time.perf_counter()
+        for row in sample:
+            # ExpenseCreate rejects explicit dates (the field shadows the type), so let it default
+            row = {key: value for key, value in row.items() if key != "date"}
+            session.post(f"{args.base_url}/api/expenses", json=row, headers=headers).raise_for_status()
+        report("single", len(sample), time.perf_counter() - start)
+
+        rows = make_rows(args.rows)
+        start = time.perf_counter()
+        response = session.post(f"{args.base_url}/api/expenses/bulk", json=rows, headers=headers)
+        response.raise_for_status()
+        assert response.json()["inserted"] == args.rows, response.json()
+        report("json", args.rows, time.perf_counter() - start)
+
+        content = to_csv(make_rows(args.rows))
+        start = time.perf_counter()
+        response = session.post(
+            f"{args.base_url}/api/expenses/bulk",
+            files={"file": ("expenses.csv", content, "text/csv")},
+            headers=headers,
+        )
+        response.raise_for_status()
+        assert response.json()["inserted"] == args.rows, response.json()
+        report("csv", args.rows, time.perf_counter() - start)
+    finally:
+        db = SessionLocal()
+        try:
+            db.execute(delete(Expense).where(Expense.user_id == user_id))
+            db.execute(delete(ExpenseRollup).where(ExpenseRollup.user_id == user_id))
+            db.execute(delete(User).where(User.id == user_id))
+            db.commit()
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Benchmark group balance computation strategies.
+
+Seeds a throwaway group with N expenses and compares, for each N:
+  - replay:  the original per-row Python replay (lazy participants + one User query per member)
+  - live:    single-query SQL aggregation (group_ledger.aggregate_group_balances)
+  - ledger:  materialized ledger read (group_ledger.read_group_balances)
+
+Reports the number of SQL statements and the median latency per call.
+All seeded rows are deleted afterwards.
+
+Usage:
+    python benchmark_group_balances.py
+    python benchmark_group_balances.py --sizes 100 1000 10000 --members 8 --runs 5
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import random
+import statistics
+import time
+import uuid
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import event
+
+from app.database import SessionLocal, engine, Base
+from app.models import (
+    User,
+    Group,
+    GroupMember,
+    GroupExpense,
+    GroupExpenseParticipant,
+    GroupSettlement,
+)
+from app import group_ledger
+
+
+class QueryCounter:
+    """Counts SQL statements executed on the engine while active"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self)
+
+
+def replay_balances(db, group_id):
+    """Reference implementation: the original per-row replay in Python"""
+    members = db.query(GroupMember).filter(
+        GroupMember.group_id == group_id,
+        GroupMember.status == "accepted"
+    ).all()
+    balances = {m.user_id: Decimal(0) for m in members}
+
+    for expense in db.query(GroupExpense).filter(GroupExpense.group_id == group_id).all():
+        balances[expense.paid_by] += expense.total_amount
+        for participant in expense.participants:
+            balances[participant.user_id] -= participant.share_amount
+
+    for settlement in db.query(GroupSettlement).filter(GroupSettlement.group_id == group_id).all():
+        balances[settlement.from_user_id] += settlement.amount
+        balances[settlement.to_user_id] -= settlement.amount
+
+    result = {}
+    for user_id, balance in balances.items():
+        user = db.query(User).filter(User.id == user_id).first()
+        result[user_id] = {"username": user.username if user else "Unknown", "balance": float(balance)}
+    return result
+
+
+def seed_group(db, n_members):
+    """Create throwaway users and a group with all of them as accepted members"""
+    tag = uuid.uuid4().hex[:8]
+    users = [
+        User(username=f"bench_{tag}_{i}", email=f"bench_{tag}_{i}@example.com", password="x")
+        for i in range(n_members)
+    ]
+    db.add_all(users)
+    db.flush()
+
+    group = Group(name=f"bench_{tag}", created_by=users[0].id)
+    db.add(group)
+    db.flush()
+
+    db.add_all([
+        GroupMember(group_id=group.id, user_id=u.id, role="member", status="accepted")
+        for u in users
+    ])
+    db.commit()
+    return group.id, [u.id for u in users]
+
+
+def add_expenses(db, group_id, user_ids, count):
+    """Insert `count` more equal-split expenses and keep the ledger in sync"""
+    rng = random.Random(count)
+    for _ in range(count):
+        total = round(rng.uniform(10, 5000), 2)
+        payer = rng.choice(user_ids)
+        share = round(total / len(user_ids), 2)
+        shares = [(uid, share) for uid in user_ids]
+        # Put any rounding remainder on the payer so shares sum to the total
+        shares[0] = (user_ids[0], round(total - share * (len(user_ids) - 1), 2))
+
+        expense = GroupExpense(
+            group_id=group_id,
+            description="bench",
+            total_amount=total,
+            category="Food",
+            paid_by=payer,
+            date=date.today(),
+        )
+        db.add(expense)
+        db.flush()
+        db.add_all([
+            GroupExpenseParticipant(group_expense_id=expense.id, user_id=uid, share_amount=amount)
+            for uid, amount in shares
+        ])
+        group_ledger.apply_deltas(db, group_id, group_ledger.expense_deltas(payer, total, shares))
+    db.commit()
+
+
+def cleanup(db, group_id, user_ids):
+    """Delete everything created by the benchmark"""
+    group = db.query(Group).filter(Group.id == group_id).first()
+    if group:
+        db.delete(group)
+        db.flush()
+    db.query(User).filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+    db.commit()
+
+
+def measure(fn, group_id, runs):
+    """Return (queries per call, median latency in ms) using a fresh session per run"""
+    timings = []
+    queries = 0
+    for _ in range(runs):
+        db = SessionLocal()
+        try:
+            with QueryCounter() as counter:
+                start = time.perf_counter()
+                fn(db, group_id)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries = counter.count
+        finally:
+            db.close()
+    return queries, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark group balance computation")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--members", type=int, default=6)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    strategies = [
+        ("replay", replay_balances),
+        ("live", group_ledger.aggregate_group_balances),
+        ("ledger", group_ledger.read_group_balances),
+    ]
+
+    db = SessionLocal()
+    group_id, user_ids = seed_group(db, args.members)
+    try:
+        seeded = 0
+        print(f"{'expenses':>9} {'strategy':>8} {'queries':>8} {'p50 ms':>9}")
+        print("-" * 38)
+        for size in sorted(args.sizes):
+            add_expenses(db, group_id, user_ids, size - seeded)
+            seeded = size
+
+            reference = replay_balances(db, group_id)
+            for name, fn in strategies:
+                check = SessionLocal()
+                try:
+                    result = fn(check, group_id)
+                finally:
+                    check.close()
+                # Amounts are exact numerics, so every strategy must agree to the paisa
+                mismatched = [uid for uid in reference if reference[uid]["balance"] != result[uid]["balance"]]
+                queries, p50 = measure(fn, group_id, args.runs)
+                flag = "  MISMATCH" if mismatched else ""
+                print(f"{size:>9} {name:>8} {queries:>8} {p50:>9.2f}{flag}")
+    finally:
+        cleanup(db, group_id, user_ids)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
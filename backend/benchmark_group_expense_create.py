@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark POST /api/groups/{id}/expenses latency against participant count.
+
+Seeds a throwaway group with enough accepted members, then creates equal-split
+expenses through the real route (in-process, no server needed) for each
+participant count and reports SQL statements per request and median latency.
+With --bulk N it instead compares importing N expenses one request at a time
+against a single POST /api/groups/{id}/expenses/bulk.
+All seeded rows are deleted afterwards.
+
+Usage:
+    python benchmark_group_expense_create.py
+    python benchmark_group_expense_create.py --participants 2 10 25 50 100 --runs 20
+    python benchmark_group_expense_create.py --bulk 500 --participants 5
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import statistics
+import time
+
+from fastapi.testclient import TestClient
+
+from app.auth import create_access_token
+from app.database import SessionLocal, engine, Base
+from app.main import app
+from app.models import User
+
+from benchmark_group_balances import QueryCounter, cleanup, seed_group
+
+
+def expense_payload(payer_id, participant_ids):
+    total = 100.0 * len(participant_ids)
+    return {
+        "description": "bench",
+        "total_amount": total,
+        "category": "Food",
+        "paid_by": payer_id,
+        "participants": [{"user_id": uid, "share_amount": 100.0} for uid in participant_ids],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark group expense creation")
+    parser.add_argument("--participants", type=int, nargs="+", default=[1, 5, 10, 25, 50])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--bulk", type=int, default=0, help="compare importing this many expenses")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    group_id, user_ids = seed_group(db, max(args.participants))
+    try:
+        owner = db.get(User, user_ids[0])
+        token = create_access_token(data={"sub": owner.username})
+        headers = {"Authorization": f"Bearer {token}"}
+        client = TestClient(app)
+        url = f"/api/groups/{group_id}/expenses"
+
+        # Warm up the auth cache and connection pool
+        client.post(url, headers=headers, json=expense_payload(user_ids[0], user_ids[:1]))
+
+        if args.bulk:
+            payload = expense_payload(user_ids[0], user_ids[:max(args.participants)])
+            with QueryCounter() as counter:
+                start = time.perf_counter()
+                for _ in range(args.bulk):
+                    client.post(url, headers=headers, json=payload)
+                elapsed = (time.perf_counter() - start) * 1000
+            print(f"{args.bulk} single requests: {counter.count} queries, {elapsed:.0f} ms")
+            with QueryCounter() as counter:
+                start = time.perf_counter()
+                response = client.post(f"{url}/bulk", headers=headers, json={"expenses": [payload] * args.bulk})
+                elapsed = (time.perf_counter() - start) * 1000
+            if response.status_code != 201:
+                raise SystemExit(f"Bulk create failed: {response.status_code} {response.text}")
+            print(f"1 bulk request:      {counter.count} queries, {elapsed:.0f} ms")
+            return
+
+        print(f"{'participants':>12} {'queries':>8} {'p50 ms':>9}")
+        print("-" * 31)
+        for count in sorted(args.participants):
+            payload = expense_payload(user_ids[0], user_ids[:count])
+            timings = []
+            for _ in range(args.runs):
+                with QueryCounter() as counter:
+                    start = time.perf_counter()
+                    response = client.post(url, headers=headers, json=payload)
+                    timings.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 201:
+                    raise SystemExit(f"Create failed: {response.status_code} {response.text}")
+            print(f"{count:>12} {counter.count:>8} {statistics.median(timings):>9.2f}")
+    finally:
+        cleanup(db, group_id, user_ids)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
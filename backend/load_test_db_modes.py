@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Load test the three ways a route can talk to the database.
+
+Each mode serves the same endpoint, which runs `SELECT pg_sleep(delay)` to
+stand in for a slow query:
+  - sync:     `def` route + SessionLocal, run by FastAPI in its threadpool
+  - blocking: `async def` route + SessionLocal, so psycopg2 blocks the event loop
+  - async:    `async def` route + AsyncSessionLocal (asyncpg)
+
+The app is served by uvicorn on a background thread (its own event loop) and
+requests are fired over HTTP with a fixed concurrency, so a blocked server
+loop shows up in client-side latency. Alongside the load, a cheap /ping
+endpoint is polled to show how much each mode stalls unrelated requests.
+
+Reports p50/p99 latency and throughput per mode.
+
+Usage:
+    python load_test_db_modes.py
+    python load_test_db_modes.py --requests 400 --concurrency 20 --delay-ms 20
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from sqlalchemy import text
+
+from app.database import SessionLocal, AsyncSessionLocal, engine
+
+MODES = ("sync", "blocking", "async")
+
+
+def build_app(delay: float) -> FastAPI:
+    app = FastAPI()
+    query = text("SELECT pg_sleep(:delay)")
+
+    @app.get("/sync")
+    def sync_query():
+        db = SessionLocal()
+        try:
+            db.execute(query, {"delay": delay})
+        finally:
+            db.close()
+        return {"ok": True}
+
+    @app.get("/blocking")
+    async def blocking_query():
+        db = SessionLocal()
+        try:
+            db.execute(query, {"delay": delay})
+        finally:
+            db.close()
+        return {"ok": True}
+
+    @app.get("/async")
+    async def async_query():
+        async with AsyncSessionLocal() as db:
+            await db.execute(query, {"delay": delay})
+        return {"ok": True}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_mode(client, mode, total, concurrency):
+    latencies = []
+    ping_latencies = []
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async def worker():
+        while True:
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            response = await client.get(f"/{mode}")
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    async def pinger(done):
+        while not done.is_set():
+            start = time.perf_counter()
+            await client.get("/ping")
+            ping_latencies.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(0.005)
+
+    done = asyncio.Event()
+    ping_task = asyncio.create_task(pinger(done))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await ping_task
+
+    return {
+        "p50": statistics.median(latencies),
+        "p99": percentile(latencies, 99),
+        "rps": total / elapsed,
+        "ping_p99": percentile(ping_latencies, 99) if ping_latencies else float("nan"),
+    }
+
+
+def start_server(app, port):
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def main_async(args):
+    app = build_app(args.delay_ms / 1000)
+    server, thread = start_server(app, args.port)
+    limits = httpx.Limits(max_connections=args.concurrency + 1)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=120) as client:
+        # Warm both pools so connection setup isn't measured
+        await run_mode(client, "sync", args.concurrency, args.concurrency)
+        await run_mode(client, "async", args.concurrency, args.concurrency)
+
+        print(f"{args.requests} requests, concurrency {args.concurrency}, query {args.delay_ms} ms")
+        print(f"{'mode':>9} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>8} {'ping p99':>9}")
+        print("-" * 48)
+        for mode in args.modes:
+            result = await run_mode(client, mode, args.requests, args.concurrency)
+            print(
+                f"{mode:>9} {result['p50']:>9.1f} {result['p99']:>9.1f} "
+                f"{result['rps']:>8.1f} {result['ping_p99']:>9.1f}"
+            )
+    server.should_exit = True
+    thread.join()
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sync, blocking and async database access")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20,
+                        help="keep at or below the pool size (pool_size + max_overflow)")
+    parser.add_argument("--delay-ms", type=float, default=20)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--port", type=int, default=8765)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
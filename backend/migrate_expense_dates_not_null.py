@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Backfill NULL expense dates and make expenses.date NOT NULL.
+
+Expense listing pages on the key (date, id); a row with a NULL date can't
+be placed in that order, so it has no cursor and is skipped by every page.
+New expenses always get a date (the API defaults a missing one to today),
+but older rows and direct database edits may not have one.
+
+Like the money migration this never holds ACCESS EXCLUSIVE for more than a
+metadata change:
+
+  backfill  set date = CURRENT_DATE (the same default the API applies) on
+            rows without one, in short id-range batches
+  not-null  add a NOT VALID "date is not null" check, validate it (no write
+            lock), then SET NOT NULL, which uses the validated check instead
+            of scanning, and drop the check again
+  rebuild   recompute the expense rollups of the users whose rows changed
+
+Every phase is idempotent and can be re-run.
+
+Usage:
+    python migrate_expense_dates_not_null.py             # all phases
+    python migrate_expense_dates_not_null.py --dry-run   # count rows without a date
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import logging
+import time
+
+from sqlalchemy import text
+
+from app.database import engine
+
+import rebuild_expense_rollups
+from migrate_money_to_numeric import run_ddl
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CHECK_NAME = "expenses_date_not_null"
+
+
+def backfill(batch_size, sleep):
+    """Date the undated rows; returns the ids of the users whose rows changed"""
+    with engine.connect() as conn:
+        low, high = conn.execute(text("SELECT min(id), max(id) FROM expenses WHERE date IS NULL")).one()
+    if low is None:
+        logger.info("Backfilled expenses: no rows without a date")
+        return set()
+
+    statement = text(
+        "UPDATE expenses SET date = CURRENT_DATE "
+        "WHERE id >= :start AND id < :stop AND date IS NULL RETURNING user_id"
+    )
+    user_ids = set()
+    updated = 0
+    for start in range(low, high + 1, batch_size):
+        with engine.begin() as conn:
+            rows = conn.execute(statement, {"start": start, "stop": start + batch_size}).all()
+        updated += len(rows)
+        user_ids.update(user_id for (user_id,) in rows)
+        if sleep:
+            time.sleep(sleep)
+    logger.info(f"Backfilled expenses: {updated} row(s) for {len(user_ids)} user(s)")
+    return user_ids
+
+
+def set_not_null():
+    with engine.connect() as conn:
+        nullable = conn.execute(text(
+            "SELECT is_nullable FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = 'expenses' AND column_name = 'date'"
+        )).scalar()
+    if nullable == "NO":
+        logger.info("expenses.date is already NOT NULL")
+        return
+
+    run_ddl([
+        f'ALTER TABLE expenses DROP CONSTRAINT IF EXISTS "{CHECK_NAME}"',
+        f'ALTER TABLE expenses ADD CONSTRAINT "{CHECK_NAME}" CHECK (date IS NOT NULL) NOT VALID',
+    ])
+    run_ddl([f'ALTER TABLE expenses VALIDATE CONSTRAINT "{CHECK_NAME}"'])
+    run_ddl([
+        "ALTER TABLE expenses ALTER COLUMN date SET NOT NULL",
+        f'ALTER TABLE expenses DROP CONSTRAINT "{CHECK_NAME}"',
+    ])
+    logger.info("expenses.date is now NOT NULL")
+
+
+def migrate(batch_size=5000, sleep=0.0, dry_run=False):
+    if dry_run:
+        with engine.connect() as conn:
+            missing = conn.execute(text("SELECT count(*) FROM expenses WHERE date IS NULL")).scalar()
+        logger.info(f"{missing} expense(s) without a date")
+        return
+
+    user_ids = backfill(batch_size, sleep)
+    set_not_null()
+    for user_id in sorted(user_ids):
+        rebuild_expense_rollups.rebuild(user_id=user_id)
+    logger.info("✅ Expense date migration finished")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill NULL expense dates and make the column NOT NULL")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per backfill transaction")
+    parser.add_argument("--sleep", type=float, default=0.0, help="Seconds to pause between backfill batches")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the rows without a date")
+    args = parser.parse_args()
+
+    migrate(batch_size=args.batch_size, sleep=args.sleep, dry_run=args.dry_run)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Convert monetary columns from double precision to numeric(12, 2) online.
+
+The columns converted are every Money column in app/models.py that is still
+double precision in the database. An in-place ALTER COLUMN ... TYPE would
+rewrite each table under an ACCESS EXCLUSIVE lock, blocking reads and
+writes for the whole rewrite. Instead, each table is migrated in phases
+that only ever take that lock for a metadata change:
+
+  prepare   add a nullable shadow column <col>__numeric, a trigger that
+            keeps it equal to round(<col>::numeric, 2) on every insert and
+            update, and a NOT VALID "is not null" check on it
+  backfill  fill the shadow column for existing rows in short id-range
+            batches, one transaction per batch
+  swap      validate the check (no write lock), verify every row, then in
+            one quick transaction per table: SET NOT NULL (uses the
+            validated check, no scan), drop the trigger and the float
+            column, rename the shadow column into place; then ANALYZE
+  rebuild   recompute the group balance ledger and the expense rollups
+            from the converted rows, so the aggregates are exact sums of
+            the rounded amounts
+
+Deploy the application code with the Money column type first: it reads and
+writes correctly against both column types, so the phases can run while
+the app is serving traffic. Every phase is idempotent and can be re-run.
+Restart the API after the swap phase: asyncpg caches column types per
+connection, so pooled async connections otherwise fail their first
+statement after a swap, and bulk-import COPYs can keep failing until the
+pool recycles the connection (DB_POOL_RECYCLE).
+
+Usage:
+    python migrate_money_to_numeric.py                   # all phases
+    python migrate_money_to_numeric.py --dry-run         # show what would be migrated
+    python migrate_money_to_numeric.py --phase backfill --batch-size 2000 --sleep 0.1
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import logging
+import time
+from collections import defaultdict
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.database import engine, Base
+from app import models  # noqa: F401 - registers the tables on Base.metadata
+from app.money import Money, MONEY_PRECISION, MONEY_SCALE
+
+import rebuild_expense_rollups
+import rebuild_group_balances
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PHASES = ("prepare", "backfill", "swap", "rebuild")
+SHADOW_SUFFIX = "__numeric"
+NUMERIC_TYPE = f"numeric({MONEY_PRECISION}, {MONEY_SCALE})"
+# DDL waits at most this long for its lock, so it never queues up traffic behind it
+LOCK_TIMEOUT = "3s"
+LOCK_RETRIES = 5
+
+
+def money_columns():
+    """{table: [column, ...]} for every Money column in the models"""
+    columns = defaultdict(list)
+    for table in Base.metadata.sorted_tables:
+        for column in table.columns:
+            if isinstance(column.type, Money):
+                columns[table.name].append(column.name)
+    return columns
+
+
+def pending_columns(conn):
+    """Money columns still stored as double precision: {table: [(column, default, has_shadow)]}"""
+    rows = conn.execute(text(
+        "SELECT table_name, column_name, data_type, column_default "
+        "FROM information_schema.columns WHERE table_schema = current_schema()"
+    )).all()
+    info = {(t, c): (data_type, default) for t, c, data_type, default in rows}
+
+    pending = {}
+    for table, columns in money_columns().items():
+        todo = [
+            (column, info[(table, column)][1], (table, column + SHADOW_SUFFIX) in info)
+            for column in columns
+            if info.get((table, column), ("",))[0] == "double precision"
+        ]
+        if todo:
+            pending[table] = todo
+    return pending
+
+
+def _names(table, column):
+    return {
+        "shadow": column + SHADOW_SUFFIX,
+        "check": f"{table}_{column}{SHADOW_SUFFIX}_not_null",
+        "function": f"{table}_money_sync",
+        "trigger": f"{table}_money_sync",
+    }
+
+
+def run_ddl(statements):
+    """Run DDL in one transaction with a short lock timeout, retrying on lock contention"""
+    for attempt in range(1, LOCK_RETRIES + 1):
+        try:
+            with engine.begin() as conn:
+                conn.exec_driver_sql(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+                for statement in statements:
+                    conn.exec_driver_sql(statement)
+            return
+        except OperationalError as e:
+            if "lock timeout" not in str(e) or attempt == LOCK_RETRIES:
+                raise
+            logger.warning(f"Lock timeout, retrying ({attempt}/{LOCK_RETRIES})")
+            time.sleep(attempt)
+
+
+# ================= PHASES =================
+
+def prepare(table, columns):
+    statements = []
+    for column, _, _ in columns:
+        names = _names(table, column)
+        statements += [
+            f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS "{names["shadow"]}" {NUMERIC_TYPE}',
+            f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS "{names["check"]}"',
+            f'ALTER TABLE {table} ADD CONSTRAINT "{names["check"]}" '
+            f'CHECK ("{names["shadow"]}" IS NOT NULL) NOT VALID',
+        ]
+    names = _names(table, columns[0][0])
+    assignments = " ".join(
+        f'NEW."{column}{SHADOW_SUFFIX}" := round(NEW."{column}"::numeric, {MONEY_SCALE});'
+        for column, _, _ in columns
+    )
+    statements += [
+        f'CREATE OR REPLACE FUNCTION "{names["function"]}"() RETURNS trigger AS $$ '
+        f'BEGIN {assignments} RETURN NEW; END $$ LANGUAGE plpgsql',
+        f'DROP TRIGGER IF EXISTS "{names["trigger"]}" ON {table}',
+        f'CREATE TRIGGER "{names["trigger"]}" BEFORE INSERT OR UPDATE ON {table} '
+        f'FOR EACH ROW EXECUTE FUNCTION "{names["function"]}"()',
+    ]
+    run_ddl(statements)
+    logger.info(f"Prepared {table}: {', '.join(c for c, _, _ in columns)}")
+
+
+def backfill(table, columns, batch_size, sleep):
+    """Fill shadow columns by id range; each batch commits on its own"""
+    with engine.connect() as conn:
+        low, high = conn.execute(text(f"SELECT min(id), max(id) FROM {table}")).one()
+    if low is None:
+        logger.info(f"Backfilled {table}: empty")
+        return
+
+    assignments = ", ".join(
+        f'"{column}{SHADOW_SUFFIX}" = round("{column}"::numeric, {MONEY_SCALE})' for column, _, _ in columns
+    )
+    missing = " OR ".join(f'"{column}{SHADOW_SUFFIX}" IS NULL' for column, _, _ in columns)
+    statement = text(f"UPDATE {table} SET {assignments} WHERE id >= :start AND id < :stop AND ({missing})")
+
+    updated = 0
+    for start in range(low, high + 1, batch_size):
+        with engine.begin() as conn:
+            updated += conn.execute(statement, {"start": start, "stop": start + batch_size}).rowcount
+        if sleep:
+            time.sleep(sleep)
+    logger.info(f"Backfilled {table}: {updated} row(s) in ids {low}..{high}")
+
+
+def swap(table, columns):
+    """Validate, verify, then put the numeric columns in place of the float ones"""
+    for column, _, _ in columns:
+        run_ddl([f'ALTER TABLE {table} VALIDATE CONSTRAINT "{_names(table, column)["check"]}"'])
+
+    mismatched = " OR ".join(
+        f'"{column}{SHADOW_SUFFIX}" IS DISTINCT FROM round("{column}"::numeric, {MONEY_SCALE})'
+        for column, _, _ in columns
+    )
+    with engine.connect() as conn:
+        bad = conn.execute(text(f"SELECT count(*) FROM {table} WHERE {mismatched}")).scalar()
+    if bad:
+        raise RuntimeError(f"{table}: {bad} row(s) differ from their shadow column; re-run the backfill")
+
+    names = _names(table, columns[0][0])
+    statements = [
+        f'DROP TRIGGER IF EXISTS "{names["trigger"]}" ON {table}',
+        f'DROP FUNCTION IF EXISTS "{names["function"]}"()',
+    ]
+    for column, default, _ in columns:
+        shadow, check = _names(table, column)["shadow"], _names(table, column)["check"]
+        statements += [
+            f'ALTER TABLE {table} ALTER COLUMN "{shadow}" SET NOT NULL',
+            f'ALTER TABLE {table} DROP CONSTRAINT "{check}"',
+            f'ALTER TABLE {table} DROP COLUMN "{column}"',
+            f'ALTER TABLE {table} RENAME COLUMN "{shadow}" TO "{column}"',
+        ]
+        if default is not None:
+            statements.append(f'ALTER TABLE {table} ALTER COLUMN "{column}" SET DEFAULT {default}')
+    run_ddl(statements)
+    # The renamed columns have no planner statistics yet; ANALYZE doesn't block writes
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"ANALYZE {table}")
+    logger.info(f"Swapped {table}: {', '.join(c for c, _, _ in columns)} now {NUMERIC_TYPE}")
+
+
+def migrate(phases, batch_size=5000, sleep=0.0, dry_run=False):
+    with engine.connect() as conn:
+        pending = pending_columns(conn)
+
+    if dry_run:
+        if not pending:
+            logger.info("All money columns are already numeric")
+        for table, columns in pending.items():
+            for column, default, has_shadow in columns:
+                state = "shadow column exists" if has_shadow else "not started"
+                logger.info(f"{table}.{column}: double precision ({state}), default={default}")
+        return
+
+    for table, columns in pending.items():
+        if "prepare" in phases:
+            prepare(table, columns)
+        if "backfill" in phases:
+            backfill(table, columns, batch_size, sleep)
+        if "swap" in phases:
+            swap(table, columns)
+
+    if "rebuild" in phases:
+        rebuild_group_balances.rebuild()
+        rebuild_expense_rollups.rebuild()
+    logger.info(f"✅ Money migration finished: {', '.join(phases)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert money columns to numeric without long locks")
+    parser.add_argument("--phase", choices=PHASES, action="append", help="Run only these phases (repeatable)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per backfill transaction")
+    parser.add_argument("--sleep", type=float, default=0.0, help="Seconds to pause between backfill batches")
+    parser.add_argument("--dry-run", action="store_true", help="List the columns still to migrate")
+    args = parser.parse_args()
+
+    migrate(args.phase or PHASES, batch_size=args.batch_size, sleep=args.sleep, dry_run=args.dry_run)
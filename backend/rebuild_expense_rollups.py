@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Rebuild the analytics rollup (expense_rollups table) from raw expenses.
+
+Recomputes each user's monthly per-category totals from the expenses
+table, reports any drift against the stored rollup, and repairs it unless
+--dry-run is given.
+
+Run this once after deploying the rollup to backfill existing users,
+and any time you suspect the rollup is out of sync (e.g. after editing
+expenses directly in the database).
+
+Usage:
+    python rebuild_expense_rollups.py                # all users, repair
+    python rebuild_expense_rollups.py --user-id 12   # single user
+    python rebuild_expense_rollups.py --dry-run      # report only
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import logging
+import sys
+
+from app.database import SessionLocal, engine, Base
+from app.models import Expense, ExpenseRollup
+from app import expense_rollups
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def rebuild(user_id=None, dry_run=False):
+    """Rebuild one or all users' rollups. Returns the total number of drifted rows."""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    total_drift = 0
+    try:
+        # Users with expenses, plus users with stale rollup rows left behind
+        expense_users = db.query(Expense.user_id).distinct()
+        rollup_users = db.query(ExpenseRollup.user_id).distinct()
+        if user_id is not None:
+            expense_users = expense_users.filter(Expense.user_id == user_id)
+            rollup_users = rollup_users.filter(ExpenseRollup.user_id == user_id)
+        user_ids = sorted({uid for (uid,) in expense_users.union(rollup_users).all()})
+
+        if not user_ids:
+            logger.warning("No users with expenses found")
+            return 0
+
+        for uid in user_ids:
+            drift = expense_rollups.rebuild_user_rollups(db, uid, repair=not dry_run)
+            total_drift += len(drift)
+            for row in drift:
+                logger.warning(
+                    f"User {row['user_id']} {row['month']} {row['category']}: "
+                    f"rollup={row['stored']} expected={row['expected']}"
+                )
+            if dry_run:
+                db.rollback()
+            else:
+                db.commit()
+
+        action = "found" if dry_run else "repaired"
+        logger.info(f"✅ Checked {len(user_ids)} user(s), {action} {total_drift} drifted rollup row(s)")
+        return total_drift
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Error rebuilding expense rollups: {e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the expense analytics rollup")
+    parser.add_argument("--user-id", type=int, default=None, help="Only rebuild this user")
+    parser.add_argument("--dry-run", action="store_true", help="Report drift without repairing")
+    args = parser.parse_args()
+
+    drifted = rebuild(user_id=args.user_id, dry_run=args.dry_run)
+    # Non-zero exit on drift in dry-run mode so it can be used as a health check
+    sys.exit(1 if args.dry_run and drifted else 0)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Rebuild the group balance ledger (group_balances table) from raw rows.
+
+Recomputes every group's balances from group_expenses,
+group_expense_participants and group_settlements, reports any drift
+against the stored ledger, and repairs it unless --dry-run is given.
+
+Run this once after deploying the ledger to backfill existing groups,
+and any time you suspect the ledger is out of sync.
+
+Usage:
+    python rebuild_group_balances.py                 # all groups, repair
+    python rebuild_group_balances.py --group-id 12   # single group
+    python rebuild_group_balances.py --dry-run       # report only
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import logging
+import sys
+
+from app.database import SessionLocal, engine, Base
+from app.models import Group
+from app import group_ledger
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def rebuild(group_id=None, dry_run=False):
+    """Rebuild one or all group ledgers. Returns the total number of drifted rows."""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    total_drift = 0
+    try:
+        query = db.query(Group.id).order_by(Group.id)
+        if group_id is not None:
+            query = query.filter(Group.id == group_id)
+        group_ids = [gid for (gid,) in query.all()]
+
+        if not group_ids:
+            logger.warning("No groups found")
+            return 0
+
+        for gid in group_ids:
+            drift = group_ledger.rebuild_group_ledger(db, gid, repair=not dry_run)
+            total_drift += len(drift)
+            for row in drift:
+                logger.warning(
+                    f"Group {row['group_id']} user {row['user_id']}: "
+                    f"ledger={row['ledger']} expected={row['expected']} drift={row['drift']}"
+                )
+            if dry_run:
+                db.rollback()
+            else:
+                db.commit()
+
+        action = "found" if dry_run else "repaired"
+        logger.info(f"✅ Checked {len(group_ids)} group(s), {action} {total_drift} drifted balance(s)")
+        return total_drift
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Error rebuilding group balances: {e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the group balance ledger")
+    parser.add_argument("--group-id", type=int, default=None, help="Only rebuild this group")
+    parser.add_argument("--dry-run", action="store_true", help="Report drift without repairing")
+    args = parser.parse_args()
+
+    drifted = rebuild(group_id=args.group_id, dry_run=args.dry_run)
+    # Non-zero exit on drift in dry-run mode so it can be used as a health check
+    sys.exit(1 if args.dry_run and drifted else 0)
@@ -3,6 +3,9 @@
 -- Expense Tracker Application
 -- =========================================
 -- Run this in Supabase Dashboard → SQL Editor
+-- Money columns are NUMERIC(12, 2). Databases created before that change
+-- store them as FLOAT; convert them online with:
+--   python migrate_money_to_numeric.py
 -- Enable UUID extension (if not already enabled)
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 
@@ -24,7 +27,7 @@ CREATE TABLE IF NOT EXISTS users (
 CREATE TABLE IF NOT EXISTS expenses (
     id SERIAL PRIMARY KEY,
     category VARCHAR NOT NULL,
-    amount FLOAT NOT NULL,
+    amount NUMERIC(12, 2) NOT NULL,
     date DATE NOT NULL,
     description VARCHAR,
     user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
@@ -37,7 +40,7 @@ CREATE TABLE IF NOT EXISTS expenses (
 CREATE TABLE IF NOT EXISTS budgets (
     id SERIAL PRIMARY KEY,
     category VARCHAR NOT NULL,
-    limit_amount FLOAT NOT NULL,
+    limit_amount NUMERIC(12, 2) NOT NULL,
     month INTEGER NOT NULL,
     year INTEGER NOT NULL,
     user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
@@ -50,12 +53,12 @@ CREATE TABLE IF NOT EXISTS budgets (
 CREATE TABLE IF NOT EXISTS debts (
     id SERIAL PRIMARY KEY,
     name VARCHAR NOT NULL,
-    principal_amount FLOAT NOT NULL,
+    principal_amount NUMERIC(12, 2) NOT NULL,
     interest_rate FLOAT NOT NULL,
-    emi_amount FLOAT NOT NULL,
+    emi_amount NUMERIC(12, 2) NOT NULL,
     emi_date INTEGER NOT NULL,
     start_date DATE NOT NULL,
-    remaining_amount FLOAT NOT NULL,
+    remaining_amount NUMERIC(12, 2) NOT NULL,
     status VARCHAR DEFAULT 'active',
     user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
     created_at TIMESTAMP DEFAULT NOW()
@@ -69,7 +72,8 @@ CREATE TABLE IF NOT EXISTS friendships (
     user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
     friend_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
     status VARCHAR DEFAULT 'pending',
-    created_at TIMESTAMP DEFAULT NOW()
+    created_at TIMESTAMP DEFAULT NOW(),
+    CONSTRAINT ck_friendships_not_self CHECK (user_id <> friend_id)
 );
 
 -- =========================================
@@ -78,7 +82,7 @@ CREATE TABLE IF NOT EXISTS friendships (
 CREATE TABLE IF NOT EXISTS split_expenses (
     id SERIAL PRIMARY KEY,
     description VARCHAR NOT NULL,
-    total_amount FLOAT NOT NULL,
+    total_amount NUMERIC(12, 2) NOT NULL,
     category VARCHAR NOT NULL,
     date DATE NOT NULL,
     created_by INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
@@ -101,7 +105,7 @@ CREATE TABLE IF NOT EXISTS settlements (
     id SERIAL PRIMARY KEY,
     from_user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
     to_user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-    amount FLOAT NOT NULL,
+    amount NUMERIC(12, 2) NOT NULL,
     created_at TIMESTAMP DEFAULT NOW()
 );
 
@@ -112,7 +116,7 @@ CREATE TABLE IF NOT EXISTS transactions (
     id SERIAL PRIMARY KEY,
     user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
     stripe_payment_intent_id VARCHAR UNIQUE,
-    amount FLOAT NOT NULL,
+    amount NUMERIC(12, 2) NOT NULL,
     currency VARCHAR DEFAULT 'INR',
     payment_method VARCHAR NOT NULL,
     transaction_type VARCHAR NOT NULL,
@@ -135,7 +139,8 @@ CREATE TABLE IF NOT EXISTS groups (
     image_url VARCHAR,
     is_active BOOLEAN DEFAULT true,
     created_by INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-    created_at TIMESTAMP DEFAULT NOW()
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
 );
 
 -- =========================================
@@ -158,9 +163,10 @@ CREATE TABLE IF NOT EXISTS group_expenses (
     id SERIAL PRIMARY KEY,
     group_id INTEGER NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
     description VARCHAR NOT NULL,
-    total_amount FLOAT NOT NULL,
+    total_amount NUMERIC(12, 2) NOT NULL,
     category VARCHAR NOT NULL,
     date DATE NOT NULL,
+    split_type VARCHAR NOT NULL DEFAULT 'exact',
     paid_by INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
     created_at TIMESTAMP DEFAULT NOW()
 );
@@ -172,7 +178,7 @@ CREATE TABLE IF NOT EXISTS group_expense_participants (
     id SERIAL PRIMARY KEY,
     group_expense_id INTEGER NOT NULL REFERENCES group_expenses(id) ON DELETE CASCADE,
     user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-    share_amount FLOAT NOT NULL,
+    share_amount NUMERIC(12, 2) NOT NULL,
     UNIQUE(group_expense_id, user_id)
 );
 
@@ -184,15 +190,60 @@ CREATE TABLE IF NOT EXISTS group_settlements (
     group_id INTEGER NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
     from_user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
     to_user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-    amount FLOAT NOT NULL,
+    amount NUMERIC(12, 2) NOT NULL,
     created_at TIMESTAMP DEFAULT NOW()
 );
 
+-- =========================================
+-- Table: group_balances (materialized balance ledger)
+-- Backfilled for existing groups in the upgrades section below;
+-- python rebuild_group_balances.py checks and repairs it
+-- =========================================
+CREATE TABLE IF NOT EXISTS group_balances (
+    id SERIAL PRIMARY KEY,
+    group_id INTEGER NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    balance NUMERIC(12, 2) NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    CONSTRAINT uq_group_balances_group_user UNIQUE(group_id, user_id)
+);
+
+-- =========================================
+-- Table: expense_rollups (monthly totals per category for analytics)
+-- Backfill with: python rebuild_expense_rollups.py
+-- =========================================
+CREATE TABLE IF NOT EXISTS expense_rollups (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    category VARCHAR NOT NULL,
+    total NUMERIC(12, 2) NOT NULL DEFAULT 0,
+    count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    CONSTRAINT uq_expense_rollups_user_month_category UNIQUE(user_id, year, month, category)
+);
+
+-- =========================================
+-- Table: budget_alerts (budget thresholds already notified)
+-- =========================================
+CREATE TABLE IF NOT EXISTS budget_alerts (
+    id SERIAL PRIMARY KEY,
+    budget_id INTEGER NOT NULL REFERENCES budgets(id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    threshold INTEGER NOT NULL,
+    percent_used FLOAT NOT NULL,
+    sent_at TIMESTAMP DEFAULT NOW(),
+    CONSTRAINT uq_budget_alerts_budget_threshold UNIQUE(budget_id, threshold)
+);
+
 -- =========================================
 -- Indexes for better query performance
 -- =========================================
+CREATE INDEX IF NOT EXISTS idx_users_username_lower ON users (lower(username) text_pattern_ops);
 CREATE INDEX IF NOT EXISTS idx_expenses_user_id ON expenses(user_id);
 CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses(date);
+CREATE INDEX IF NOT EXISTS idx_expenses_user_date_id ON expenses(user_id, date, id);
 CREATE INDEX IF NOT EXISTS idx_budgets_user_id ON budgets(user_id);
 CREATE INDEX IF NOT EXISTS idx_debts_user_id ON debts(user_id);
 CREATE INDEX IF NOT EXISTS idx_friendships_user_id ON friendships(user_id);
@@ -205,9 +256,60 @@ CREATE INDEX IF NOT EXISTS idx_group_members_user_id ON group_members(user_id);
 CREATE INDEX IF NOT EXISTS idx_group_members_status ON group_members(status);
 CREATE INDEX IF NOT EXISTS idx_group_expenses_group_id ON group_expenses(group_id);
 CREATE INDEX IF NOT EXISTS idx_group_expenses_paid_by ON group_expenses(paid_by);
+CREATE INDEX IF NOT EXISTS idx_group_expenses_group_date_id ON group_expenses(group_id, date, id);
 CREATE INDEX IF NOT EXISTS idx_group_expense_participants_expense_id ON group_expense_participants(group_expense_id);
 CREATE INDEX IF NOT EXISTS idx_group_settlements_group_id ON group_settlements(group_id);
 
+-- =========================================
+-- Upgrades for databases created before these columns existed
+-- (safe to re-run; create_all does not add columns to existing tables)
+-- =========================================
+ALTER TABLE groups ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT NOW();
+-- Older group expenses count as exact splits: editing their total needs new shares
+ALTER TABLE group_expenses ADD COLUMN IF NOT EXISTS split_type VARCHAR NOT NULL DEFAULT 'exact';
+
+-- Group balance ledger: seed groups that have expenses or settlements but
+-- no ledger rows yet (groups created before the ledger existed), netting
+-- the same four sums as group_ledger.compute_group_balances
+INSERT INTO group_balances (group_id, user_id, balance)
+SELECT group_id, user_id, sum(amount)
+FROM (
+    SELECT group_id, paid_by AS user_id, total_amount AS amount FROM group_expenses
+    UNION ALL
+    SELECT e.group_id, p.user_id, -p.share_amount
+    FROM group_expense_participants p JOIN group_expenses e ON e.id = p.group_expense_id
+    UNION ALL
+    SELECT group_id, from_user_id, amount FROM group_settlements
+    UNION ALL
+    SELECT group_id, to_user_id, -amount FROM group_settlements
+) deltas
+WHERE NOT EXISTS (SELECT 1 FROM group_balances b WHERE b.group_id = deltas.group_id)
+GROUP BY group_id, user_id
+ON CONFLICT (group_id, user_id) DO NOTHING;
+
+-- Friendships: one row per unordered pair of users.
+-- Collapse existing duplicates first (keep an accepted row over a pending
+-- one, then the oldest) and drop self-friendships.
+DELETE FROM friendships WHERE id IN (
+    SELECT id FROM (
+        SELECT id, row_number() OVER (
+            PARTITION BY least(user_id, friend_id), greatest(user_id, friend_id)
+            ORDER BY (status = 'accepted') DESC, id
+        ) AS rn
+        FROM friendships
+    ) ranked
+    WHERE rn > 1
+);
+DELETE FROM friendships WHERE user_id = friend_id;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_friendships_pair
+    ON friendships (least(user_id, friend_id), greatest(user_id, friend_id));
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'ck_friendships_not_self') THEN
+        ALTER TABLE friendships ADD CONSTRAINT ck_friendships_not_self CHECK (user_id <> friend_id);
+    END IF;
+END $$;
+
 -- =========================================
 -- Enable Row Level Security (RLS)
 -- =========================================
@@ -225,6 +327,9 @@ ALTER TABLE group_members ENABLE ROW LEVEL SECURITY;
 ALTER TABLE group_expenses ENABLE ROW LEVEL SECURITY;
 ALTER TABLE group_expense_participants ENABLE ROW LEVEL SECURITY;
 ALTER TABLE group_settlements ENABLE ROW LEVEL SECURITY;
+ALTER TABLE group_balances ENABLE ROW LEVEL SECURITY;
+ALTER TABLE expense_rollups ENABLE ROW LEVEL SECURITY;
+ALTER TABLE budget_alerts ENABLE ROW LEVEL SECURITY;
 
 -- =========================================
 -- RLS Policies (Basic - Users can access their own data)
@@ -358,5 +463,6 @@ DO $$
 BEGIN
     RAISE NOTICE '✅ Database migration completed successfully!';
     RAISE NOTICE '📋 All tables, indexes, and RLS policies have been created.';
-    RAISE NOTICE '👥 Group system tables added: groups, group_members, group_expenses, group_expense_participants, group_settlements';
+    RAISE NOTICE '📊 Analytics rollup table added: expense_rollups (backfill with python rebuild_expense_rollups.py)';
+    RAISE NOTICE '👥 Group system tables added: groups, group_members, group_expenses, group_expense_participants, group_settlements, group_balances';
 END $$;
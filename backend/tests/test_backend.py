@@ -6,6 +6,7 @@ import pytest
 import requests
 from datetime import date, datetime, timedelta
 import json
+import time
 
 # Configuration
 BASE_URL = "http://localhost:8000"
@@ -79,6 +80,14 @@ def get_headers(user_key="user1"):
     }
 
 
+def register_temp_user(prefix):
+    """Register and log in a throwaway user; returns (username, headers)"""
+    username = f"{prefix}_{int(datetime.now().timestamp() * 1000)}"
+    requests.post(f"{BASE_URL}/api/register", json={"username": username, "email": f"{username}@example.com", "password": "testpass123"})
+    token = requests.post(f"{BASE_URL}/api/token", data={"username": username, "password": "testpass123"}).json()["access_token"]
+    return username, {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+
+
 # ========================================
 # AUTHENTICATION TESTS
 # ========================================
@@ -124,6 +133,24 @@ class TestAuthentication:
         assert data["username"] == TEST_USERS["user1"]["username"]
         print(f"âœ“ Current user: {data['username']}")
     
+    def test_auth_cache_metrics(self):
+        """Test that repeated authenticated requests are served from the user cache"""
+        requests.get(f"{BASE_URL}/api/users/me", headers=get_headers("user1"))
+        before = requests.get(f"{BASE_URL}/metrics").json()["auth_cache"]
+        requests.get(f"{BASE_URL}/api/users/me", headers=get_headers("user1"))
+        after = requests.get(f"{BASE_URL}/metrics").json()["auth_cache"]
+        assert after["hits"] > before["hits"]
+        print(f"âœ“ Auth cache hits: {after['hits']}, misses: {after['misses']}")
+
+    def test_db_pool_one_connection_per_request(self):
+        """Test that auth and the route share a single pooled connection"""
+        before = requests.get(f"{BASE_URL}/metrics").json()["db_pool"]["sync"]
+        response = requests.get(f"{BASE_URL}/api/groups", headers=get_headers("user1"))
+        assert response.status_code == 200
+        after = requests.get(f"{BASE_URL}/metrics").json()["db_pool"]["sync"]
+        assert after["checkouts"] - before["checkouts"] == 1
+        print(f"âœ“ DB pool checkouts: {after['checkouts']}, avg wait: {after['avg_wait_ms']} ms")
+
     def test_invalid_credentials(self):
         """Test login with invalid credentials"""
         response = requests.post(
@@ -162,7 +189,27 @@ class TestExpenses:
         assert data["amount"] == expense_data["amount"]
         test_data["expense_ids"].append(data["id"])
         print(f"âœ“ Created expense ID: {data['id']}")
-    
+
+    def test_amounts_out_of_range_rejected(self):
+        """Test that amounts too large, not positive or finer than a paisa are a 422"""
+        for path, payload in [
+            ("/api/expenses", {"category": "Food", "amount": 1e10}),
+            ("/api/expenses", {"category": "Food", "amount": 0}),
+            ("/api/expenses", {"category": "Food", "amount": -5.0}),
+            ("/api/expenses", {"category": "Food", "amount": 0.001}),
+            ("/api/budgets", {"category": "Food", "limit_amount": 0, "month": 1, "year": 2024}),
+            ("/api/payments/create-intent", {"amount": -10.0, "payment_method": "card", "transaction_type": "split_expense_payment"}),
+            ("/api/budgets", {"category": "Food", "limit_amount": 1e12, "month": 1, "year": 2024}),
+            ("/api/split-expenses", {
+                "description": "Huge", "total_amount": 1e10, "category": "Other", "participant_ids": []
+            }),
+            ("/api/settlements", {"to_username": "nobody", "amount": -1e10}),
+            ("/api/settlements", {"to_username": "nobody", "amount": 0}),
+        ]:
+            response = requests.post(f"{BASE_URL}{path}", headers=get_headers("user1"), json=payload)
+            assert response.status_code == 422, (path, response.status_code, response.text)
+        print("âœ“ Out-of-range, non-positive and sub-paisa amounts rejected")
+
     def test_list_expenses(self):
         """Test listing all expenses"""
         response = requests.get(
@@ -174,6 +221,179 @@ class TestExpenses:
         assert isinstance(data, list)
         print(f"âœ“ Listed {len(data)} expenses")
     
+    def test_list_expenses_paginated_and_filtered(self):
+        """Test cursor pagination, filters and sorting of expenses"""
+        for amount in (11.0, 22.0, 33.0):
+            requests.post(
+                f"{BASE_URL}/api/expenses",
+                headers=get_headers("user1"),
+                json={"category": "PagingTest", "amount": amount}
+            )
+
+        seen = []
+        cursor = None
+        while True:
+            url = f"{BASE_URL}/api/expenses?category=PagingTest&sort=amount_asc&limit=2"
+            if cursor:
+                url += f"&cursor={cursor}"
+            response = requests.get(url, headers=get_headers("user1"))
+            assert response.status_code == 200
+            seen.extend(e["amount"] for e in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        assert seen == sorted(seen)
+        assert {11.0, 22.0, 33.0} <= set(seen)
+
+        response = requests.get(
+            f"{BASE_URL}/api/expenses?category=PagingTest&min_amount=20&max_amount=30&unpaginated=true",
+            headers=get_headers("user1")
+        )
+        assert response.status_code == 200
+        assert response.json() and all(e["amount"] == 22.0 for e in response.json())
+
+        response = requests.get(f"{BASE_URL}/api/expenses?sort=random", headers=get_headers("user1"))
+        assert response.status_code == 400
+        print(f"âœ“ Paged through {len(seen)} filtered expenses")
+
+    def test_dated_expenses_paged_by_date(self):
+        """Test creating and updating dated expenses, then paging through them by date"""
+        _, headers = register_temp_user("dated")
+        ids = {}
+        for day in ("2024-01-03", "2024-01-01", "2024-01-02", "2024-01-02"):
+            response = requests.post(f"{BASE_URL}/api/expenses", headers=headers,
+                                     json={"category": "Dated", "amount": 10.0, "date": day})
+            assert response.status_code == 200, response.text
+            assert response.json()["date"] == day
+            ids.setdefault(day, []).append(response.json()["id"])
+
+        moved = ids["2024-01-01"][0]
+        response = requests.put(f"{BASE_URL}/api/expenses/{moved}", headers=headers, json={"date": "2024-01-05"})
+        assert response.status_code == 200, response.text
+        assert response.json()["date"] == "2024-01-05"
+
+        seen = []
+        cursor = None
+        while True:
+            url = f"{BASE_URL}/api/expenses?sort=date_desc&limit=1"
+            if cursor:
+                url += f"&cursor={cursor}"
+            response = requests.get(url, headers=headers)
+            assert response.status_code == 200
+            seen.extend((e["date"], e["id"]) for e in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        assert seen == sorted(seen, reverse=True)
+        assert [d for d, _ in seen] == ["2024-01-05", "2024-01-03", "2024-01-02", "2024-01-02"]
+        print(f"âœ“ Paged through {len(seen)} dated expenses one at a time")
+
+    def test_export_expenses(self):
+        """Test streaming CSV and NDJSON export"""
+        response = requests.get(
+            f"{BASE_URL}/api/expenses/export?format=csv&category=PagingTest",
+            headers=get_headers("user1")
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        lines = response.text.strip().splitlines()
+        assert lines[0] == "id,date,category,amount,description"
+        assert len(lines) > 1
+
+        response = requests.get(
+            f"{BASE_URL}/api/expenses/export?format=ndjson&category=PagingTest&min_amount=30",
+            headers=get_headers("user1")
+        )
+        assert response.status_code == 200
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert rows and all(r["category"] == "PagingTest" and r["amount"] >= 30 for r in rows)
+
+        response = requests.get(f"{BASE_URL}/api/expenses/export?format=xml", headers=get_headers("user1"))
+        assert response.status_code == 400
+
+        # A user not in the auth cache yet: auth and the stream share one connection
+        _, headers = register_temp_user("export")
+        before = requests.get(f"{BASE_URL}/metrics").json()["db_pool"]["sync"]
+        response = requests.get(f"{BASE_URL}/api/expenses/export?format=csv", headers=headers)
+        assert response.status_code == 200
+        after = requests.get(f"{BASE_URL}/metrics").json()["db_pool"]["sync"]
+        assert after["checkouts"] - before["checkouts"] == 1
+        print(f"âœ“ Exported {len(lines) - 1} CSV rows and {len(rows)} NDJSON rows")
+
+    def test_bulk_import_expenses(self):
+        """Test bulk import from JSON and CSV with per-row errors"""
+        response = requests.post(
+            f"{BASE_URL}/api/expenses/bulk",
+            headers=get_headers("user1"),
+            json=[
+                {"category": "BulkTest", "amount": 10.5, "date": "2024-01-15"},
+                {"category": "BulkTest", "amount": "not a number"},
+                {"category": "", "amount": 5},
+                {"category": "BulkTest", "amount": 20, "description": "second"},
+            ]
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["inserted"] == 2
+        assert [e["row"] for e in data["errors"]] == [2, 3]
+
+        csv_body = "category,amount,date,description\nBulkTest,7.25,2024-02-01,from csv\nBulkTest,,2024-02-02,\n"
+        headers = {"Authorization": get_headers("user1")["Authorization"]}
+        response = requests.post(
+            f"{BASE_URL}/api/expenses/bulk",
+            headers=headers,
+            files={"file": ("expenses.csv", csv_body, "text/csv")}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["inserted"] == 1 and data["failed"] == 1
+
+        response = requests.get(
+            f"{BASE_URL}/api/expenses?category=BulkTest&start_date=2024-01-01&end_date=2024-02-28&unpaginated=true",
+            headers=get_headers("user1")
+        )
+        assert {e["amount"] for e in response.json()} >= {10.5, 7.25}
+        print(f"âœ“ Bulk import inserted valid rows and reported {data['failed']} error(s)")
+
+    def test_bulk_import_matches_api_validation(self):
+        """Bulk rows accept the same amounts and store the same descriptions as POST /api/expenses"""
+        _, headers = register_temp_user("bulkparity")
+        amounts = [0, -5, 0.001, True, 1e12, 12.5]
+        api_statuses = [
+            requests.post(
+                f"{BASE_URL}/api/expenses",
+                headers=headers,
+                json={"category": "Parity", "amount": amount, "date": "2024-03-01"}
+            ).status_code
+            for amount in amounts
+        ]
+        assert api_statuses == [422] * 5 + [200]
+
+        response = requests.post(
+            f"{BASE_URL}/api/expenses/bulk",
+            headers=headers,
+            json=[{"category": "Parity", "amount": amount, "date": "2024-03-02", "description": ""}
+                  for amount in amounts]
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["inserted"] == 1
+        assert [e["row"] for e in data["errors"]] == [1, 2, 3, 4, 5]
+
+        response = requests.post(
+            f"{BASE_URL}/api/expenses",
+            headers=headers,
+            json={"category": "Parity", "amount": 3, "date": "2024-03-03", "description": ""}
+        )
+        assert response.status_code == 200
+        response = requests.get(
+            f"{BASE_URL}/api/expenses?category=Parity&unpaginated=true",
+            headers=headers
+        )
+        assert response.status_code == 200
+        assert [e["description"] for e in response.json()] == [None, None, None]
+        print("âœ“ Bulk import and the API reject the same amounts and store blank descriptions as null")
+
     def test_get_expense_by_id(self):
         """Test getting a specific expense"""
         pytest.skip("GET /api/expenses/{id} endpoint not implemented")
@@ -207,6 +427,14 @@ class TestExpenses:
         data = response.json()
         assert data["amount"] == update_data["amount"]
         print(f"âœ“ Updated expense ID: {expense_id}")
+
+        # date is part of the listing's keyset, so it can't be cleared
+        response = requests.put(
+            f"{BASE_URL}/api/expenses/{expense_id}",
+            headers=get_headers("user1"),
+            json={"date": None}
+        )
+        assert response.status_code == 422
     
     def test_delete_expense(self):
         """Test deleting an expense"""
@@ -230,6 +458,69 @@ class TestExpenses:
         assert response.status_code == 200  # API returns 200 not 204
         print(f"âœ“ Deleted expense ID: {expense_id}")
 
+    def test_category_analytics_follow_writes(self):
+        """Test that analytics totals track add, update and delete"""
+        def rollup_total():
+            response = requests.get(f"{BASE_URL}/api/analytics/category", headers=get_headers("user1"))
+            assert response.status_code == 200
+            return next((c["total"] for c in response.json() if c["category"] == "RollupTest"), 0.0)
+
+        before = rollup_total()
+        expense_id = requests.post(
+            f"{BASE_URL}/api/expenses",
+            headers=get_headers("user1"),
+            json={"category": "RollupTest", "amount": 40.0}
+        ).json()["id"]
+        assert rollup_total() == pytest.approx(before + 40.0)
+
+        requests.put(
+            f"{BASE_URL}/api/expenses/{expense_id}",
+            headers=get_headers("user1"),
+            json={"amount": 65.0}
+        )
+        assert rollup_total() == pytest.approx(before + 65.0)
+
+        requests.delete(f"{BASE_URL}/api/expenses/{expense_id}", headers=get_headers("user1"))
+        assert rollup_total() == pytest.approx(before)
+
+        response = requests.get(f"{BASE_URL}/api/analytics/monthly", headers=get_headers("user1"))
+        assert response.status_code == 200
+        assert all(len(m["month"]) == 7 for m in response.json())
+        print("âœ“ Analytics rollup follows expense writes")
+
+    def test_analytics_query(self):
+        """Test the analytics query API, its cache and invalidation on write"""
+        url = (
+            f"{BASE_URL}/api/analytics/query?granularity=month&group_by=category"
+            f"&metrics=sum,count,p50&start_date=2000-01-01"
+        )
+
+        def query_total():
+            response = requests.get(url, headers=get_headers("user1"))
+            assert response.status_code == 200
+            rows = response.json()["rows"]
+            assert all({"period", "category", "sum", "count", "p50"} <= set(r) for r in rows)
+            return sum(r["sum"] for r in rows if r["category"] == "QueryTest")
+
+        before = query_total()
+        hits_before = requests.get(f"{BASE_URL}/metrics").json()["analytics_cache"]["hits"]
+        assert query_total() == before
+        assert requests.get(f"{BASE_URL}/metrics").json()["analytics_cache"]["hits"] > hits_before
+
+        requests.post(
+            f"{BASE_URL}/api/expenses",
+            headers=get_headers("user1"),
+            json={"category": "QueryTest", "amount": 12.0}
+        )
+        assert query_total() == pytest.approx(before + 12.0)
+
+        response = requests.get(
+            f"{BASE_URL}/api/analytics/query?granularity=hour",
+            headers=get_headers("user1")
+        )
+        assert response.status_code == 400
+        print("âœ“ Analytics query is cached and invalidated on write")
+
 
 # ========================================
 # BUDGET TESTS
@@ -288,6 +579,120 @@ class TestBudgets:
         assert data["limit_amount"] == update_data["limit_amount"]
         print(f"âœ“ Updated budget ID: {budget_id}")
 
+    def test_budget_status(self):
+        """Test budget utilisation for the current month"""
+        today = date.today()
+        category = f"StatusTest{int(datetime.now().timestamp())}"
+        budget_id = requests.post(
+            f"{BASE_URL}/api/budgets",
+            headers=get_headers("user1"),
+            json={"category": category, "limit_amount": 200.0, "month": today.month, "year": today.year}
+        ).json()["id"]
+        test_data["budget_ids"].append(budget_id)
+        requests.post(
+            f"{BASE_URL}/api/expenses",
+            headers=get_headers("user1"),
+            json={"category": category, "amount": 50.0}
+        )
+
+        response = requests.get(
+            f"{BASE_URL}/api/budgets/status?month={today.month}&year={today.year}",
+            headers=get_headers("user1")
+        )
+        assert response.status_code == 200
+        status = next(b for b in response.json() if b["id"] == budget_id)
+        assert status["spent"] == 50.0
+        assert status["remaining"] == 150.0
+        assert status["percent_used"] == 25.0
+        assert status["projected_spend"] >= status["spent"]
+
+        response = requests.get(f"{BASE_URL}/api/budgets/status?month=13", headers=get_headers("user1"))
+        assert response.status_code == 422
+        print(f"âœ“ Budget {budget_id} is {status['percent_used']}% used")
+
+    def test_budget_alert_on_threshold(self):
+        """Test crossing 80% of a budget triggers an alert"""
+        today = date.today()
+        category = f"AlertTest{int(datetime.now().timestamp())}"
+        alerts = lambda: requests.get(f"{BASE_URL}/metrics").json()["budget_alerts"]
+        before = alerts()
+        assert before["running"]
+
+        budget_id = requests.post(
+            f"{BASE_URL}/api/budgets",
+            headers=get_headers("user1"),
+            json={"category": category, "limit_amount": 100.0, "month": today.month, "year": today.year}
+        ).json()["id"]
+        test_data["budget_ids"].append(budget_id)
+        requests.post(f"{BASE_URL}/api/expenses", headers=get_headers("user1"), json={"category": category, "amount": 90.0})
+
+        # The worker runs in the background; sends fail without SendGrid configured
+        for _ in range(50):
+            after = alerts()
+            if after["alerts_sent"] + after["alerts_failed"] > before["alerts_sent"] + before["alerts_failed"]:
+                break
+            time.sleep(0.1)
+        assert after["alerts_sent"] + after["alerts_failed"] > before["alerts_sent"] + before["alerts_failed"]
+        print(f"âœ“ Budget alert attempted (sent={after['alerts_sent']}, failed={after['alerts_failed']})")
+
+    def test_budget_alert_not_early_from_rounding(self):
+        """Test 79.96% (shown as 80.0%) doesn't fire the 80% alert, but 80% does"""
+        today = date.today()
+        category = f"AlertEdge{int(datetime.now().timestamp())}"
+        alerts = lambda: requests.get(f"{BASE_URL}/metrics").json()["budget_alerts"]
+        attempted = lambda a: a["alerts_sent"] + a["alerts_failed"]
+
+        budget_id = requests.post(
+            f"{BASE_URL}/api/budgets",
+            headers=get_headers("user1"),
+            json={"category": category, "limit_amount": 100.0, "month": today.month, "year": today.year}
+        ).json()["id"]
+        test_data["budget_ids"].append(budget_id)
+
+        for amount, expect_alert in [(79.96, False), (0.04, True)]:
+            before = attempted(alerts())
+            requests.post(f"{BASE_URL}/api/expenses", headers=get_headers("user1"), json={"category": category, "amount": amount})
+            # Give the background worker time to check the budget and send
+            for _ in range(20):
+                if attempted(alerts()) > before:
+                    break
+                time.sleep(0.1)
+            assert (attempted(alerts()) > before) == expect_alert
+        print("âœ“ 80% alert fires at exactly 80%")
+
+    def test_budget_alert_delivered_by_outbox(self):
+        """Test alert emails go through the background outbox"""
+        outbox = lambda: requests.get(f"{BASE_URL}/metrics").json()["email_outbox"]
+        before = outbox()
+        if before["transport"] != "fake":
+            pytest.skip("Server not running with EMAIL_TRANSPORT=fake")
+
+        today = date.today()
+        category = f"OutboxTest{int(datetime.now().timestamp())}"
+        budget_id = requests.post(
+            f"{BASE_URL}/api/budgets",
+            headers=get_headers("user1"),
+            json={"category": category, "limit_amount": 10.0, "month": today.month, "year": today.year}
+        ).json()["id"]
+        test_data["budget_ids"].append(budget_id)
+        requests.post(f"{BASE_URL}/api/expenses", headers=get_headers("user1"), json={"category": category, "amount": 15.0})
+
+        # Jumping past 100% sends only the 100% alert
+        for _ in range(50):
+            after = outbox()
+            if after["sent"] >= before["sent"] + 1:
+                break
+            time.sleep(0.1)
+        assert after["sent"] >= before["sent"] + 1
+        assert after["queue_depth"] == 0
+
+        # The skipped 80% alert was claimed too, so a later write sends nothing
+        requests.post(f"{BASE_URL}/api/expenses", headers=get_headers("user1"), json={"category": category, "amount": 1.0})
+        time.sleep(1)
+        after = outbox()
+        assert after["sent"] + after["failed"] == before["sent"] + before["failed"] + 1
+        print(f"âœ“ Outbox delivered {after['sent'] - before['sent']} email(s) in {after['batches'] - before['batches']} batch(es)")
+
 
 # ========================================
 # DEBT TESTS
@@ -330,6 +735,76 @@ class TestDebts:
         data = response.json()
         assert isinstance(data, list)
         print(f"âœ“ Listed {len(data)} debts")
+
+    def test_debt_schedule_and_projection(self):
+        """Test amortization schedule follows debt updates"""
+        if not test_data["debt_ids"]:
+            pytest.skip("No debts created - test_create_debt must have failed")
+
+        debt_id = test_data["debt_ids"][0]
+        response = requests.get(f"{BASE_URL}/api/debts/{debt_id}/schedule", headers=get_headers("user1"))
+        assert response.status_code == 200
+        data = response.json()
+        rows = data["schedule"]
+        assert data["pays_off"] and data["installments"] == len(rows) == 11
+        assert rows[-1]["balance"] == 0.0
+        assert abs(sum(r["principal"] for r in rows) - 50000.0) < 0.05
+        assert data["payoff_date"] == rows[-1]["date"]
+
+        requests.put(f"{BASE_URL}/api/debts/{debt_id}", headers=get_headers("user1"), json={"remaining_amount": 20000.0})
+        data = requests.get(f"{BASE_URL}/api/debts/{debt_id}/schedule", headers=get_headers("user1")).json()
+        assert data["installments"] == 5
+
+        response = requests.get(f"{BASE_URL}/api/debts/projection", headers=get_headers("user1"))
+        assert response.status_code == 200
+        projection = response.json()
+        item = next(d for d in projection["debts"] if d["debt_id"] == debt_id)
+        assert item["installments"] == 5
+        assert projection["timeline"] and projection["timeline"][-1]["balance"] == 0.0
+
+        response = requests.get(f"{BASE_URL}/api/debts/999999/schedule", headers=get_headers("user1"))
+        assert response.status_code == 404
+        print(f"âœ“ Debt {debt_id} pays off on {item['payoff_date']}")
+
+    def test_simulate_payoff_strategies(self):
+        """Test avalanche / snowball / custom payoff simulation"""
+        base = {"principal_amount": 0, "emi_date": 1, "start_date": date.today().isoformat()}
+        debts = [
+            {**base, "name": "Card", "remaining_amount": 30000.0, "interest_rate": 36.0, "emi_amount": 1500.0},
+            {**base, "name": "Car", "remaining_amount": 8000.0, "interest_rate": 8.0, "emi_amount": 500.0},
+        ]
+        ids = []
+        for debt in debts:
+            debt_id = requests.post(f"{BASE_URL}/api/debts", headers=get_headers("user2"), json=debt).json()["id"]
+            ids.append(debt_id)
+
+        try:
+            response = requests.post(
+                f"{BASE_URL}/api/debts/simulate",
+                headers=get_headers("user2"),
+                json={"extra_payment": 1000.0, "custom_order": [ids[1]]}
+            )
+            assert response.status_code == 200
+            results = {r["strategy"]: r for r in response.json()}
+            assert set(results) >= {"minimum", "avalanche", "snowball", "custom"}
+            assert results["avalanche"]["order"][0] == ids[0]
+            assert results["snowball"]["order"][0] == ids[1]
+            assert results["custom"]["order"][0] == ids[1]
+            assert results["avalanche"]["total_interest"] < results["snowball"]["total_interest"]
+            assert results["avalanche"]["months"] < results["minimum"]["months"]
+            assert len(results["avalanche"]["timeline"]) == results["avalanche"]["months"]
+            assert results["avalanche"]["timeline"][-1]["balance"] == 0.0
+
+            response = requests.post(
+                f"{BASE_URL}/api/debts/simulate",
+                headers=get_headers("user2"),
+                json={"custom_order": [999999]}
+            )
+            assert response.status_code == 400
+            print(f"âœ“ Avalanche saves {results['snowball']['total_interest'] - results['avalanche']['total_interest']:.2f} over snowball")
+        finally:
+            for debt_id in ids:
+                requests.delete(f"{BASE_URL}/api/debts/{debt_id}", headers=get_headers("user2"))
     
     def test_pay_emi(self):
         """Test paying EMI"""
@@ -415,6 +890,60 @@ class TestFriendships:
         assert isinstance(data, list)
         print(f"âœ“ Listed {len(data)} friends")
 
+    def test_concurrent_friend_requests_create_one_friendship(self):
+        """Test simultaneous requests in both directions leave a single friendship"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        headers = dict(register_temp_user(prefix) for prefix in ("pair_a", "pair_b"))
+        names = list(headers)
+
+        def send(i):
+            sender, receiver = (names[0], names[1]) if i % 2 else (names[1], names[0])
+            return requests.post(f"{BASE_URL}/api/friends/request", headers=headers[sender], json={"friend_username": receiver})
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            responses = list(pool.map(send, range(16)))
+        assert all(r.status_code == 200 for r in responses)
+        assert len({r.json()["id"] for r in responses}) == 1
+
+        rows = []
+        for name in names:
+            rows += requests.get(f"{BASE_URL}/api/friends", headers=headers[name]).json()
+            rows += requests.get(f"{BASE_URL}/api/friends/requests", headers=headers[name]).json()
+        assert len({row["id"] for row in rows}) == 1
+        assert all(row["friend_username"] in names for row in rows)
+        print(f"âœ“ 16 concurrent requests produced one friendship ({rows[0]['status']})")
+
+    def test_search_users_and_suggestions(self):
+        """Test username prefix search and did-you-mean on unknown usernames"""
+        response = requests.get(f"{BASE_URL}/api/users/search?q=TestUser&limit=5", headers=get_headers("user1"))
+        assert response.status_code == 200
+        usernames = [u["username"] for u in response.json()]
+        assert TEST_USERS["user2"]["username"] in usernames
+        assert TEST_USERS["user1"]["username"] not in usernames
+        assert usernames == sorted(usernames) and len(usernames) <= 5
+
+        response = requests.post(
+            f"{BASE_URL}/api/friends/request",
+            headers=get_headers("user1"),
+            json={"friend_username": "testusr2"}
+        )
+        assert response.status_code == 404
+        detail = response.json()["detail"]
+        assert "Did you mean" in detail and TEST_USERS["user2"]["username"] in detail
+        assert "Available users" not in detail
+        print(f"âœ“ {detail}")
+
+    def test_search_users_rate_limited(self):
+        """Test user search is throttled per user"""
+        _, headers = register_temp_user("searcher")
+
+        statuses = [requests.get(f"{BASE_URL}/api/users/search?q=test", headers=headers) for _ in range(30)]
+        limited = [r for r in statuses if r.status_code == 429]
+        assert limited and "Retry-After" in limited[0].headers
+        assert statuses[0].status_code == 200
+        print(f"âœ“ {len(limited)} of 30 rapid searches throttled")
+
 
 # ========================================
 # SPLIT EXPENSE TESTS
@@ -442,7 +971,64 @@ class TestSplitExpenses:
         assert data["total_amount"] == split_data["total_amount"]
         test_data["split_expense_ids"].append(data["id"])
         print(f"âœ“ Created split expense ID: {data['id']}")
-    
+
+    def test_create_split_expense_participants(self):
+        """Test that the creator is added and unknown participants are rejected"""
+        response = requests.post(
+            f"{BASE_URL}/api/split-expenses",
+            headers=get_headers("user1"),
+            json={
+                "description": "Taxi",
+                "total_amount": 300.0,
+                "category": "Transport",
+                "participant_ids": [test_data["user_ids"]["user2"]]
+            }
+        )
+        assert response.status_code == 200
+        data = response.json()
+        participant_ids = {p["id"] for p in data["participants"]}
+        assert participant_ids == {test_data["user_ids"]["user1"], test_data["user_ids"]["user2"]}
+        test_data["split_expense_ids"].append(data["id"])
+
+        response = requests.post(
+            f"{BASE_URL}/api/split-expenses",
+            headers=get_headers("user1"),
+            json={
+                "description": "Ghost",
+                "total_amount": 100.0,
+                "category": "Other",
+                "participant_ids": [999999999]
+            }
+        )
+        assert response.status_code == 404
+        print(f"âœ“ Split expense {data['id']} has {len(participant_ids)} participants")
+
+    def test_split_expense_participant_shares(self):
+        """Test that each participant's share comes from the server and adds up to the total"""
+        response = requests.post(
+            f"{BASE_URL}/api/split-expenses",
+            headers=get_headers("user1"),
+            json={
+                "description": "Odd paisa",
+                "total_amount": 100.01,
+                "category": "Food",
+                "participant_ids": [test_data["user_ids"]["user2"]]
+            }
+        )
+        assert response.status_code == 200
+        data = response.json()
+        test_data["split_expense_ids"].append(data["id"])
+        shares = {p["id"]: p["share_amount"] for p in data["participants"]}
+        assert round(sum(shares.values()), 2) == 100.01
+        # The leftover paisa goes to the lowest user id
+        assert shares[min(shares)] == 50.01
+        assert shares[max(shares)] == 50.0
+
+        response = requests.get(f"{BASE_URL}/api/split-expenses", headers=get_headers("user2"))
+        listed = next(e for e in response.json() if e["id"] == data["id"])
+        assert {p["id"]: p["share_amount"] for p in listed["participants"]} == shares
+        print(f"âœ“ Split expense {data['id']} shares: {shares}")
+
     def test_list_split_expenses(self):
         """Test listing split expenses"""
         response = requests.get(
@@ -502,6 +1088,25 @@ class TestGroups:
         data = response.json()
         assert isinstance(data, list)
         print(f"âœ“ Listed {len(data)} groups")
+
+    def test_list_groups_paginated_and_polled(self):
+        """Test group list pagination and the updated_since filter"""
+        response = requests.get(
+            f"{BASE_URL}/api/groups?skip=0&limit=1",
+            headers=get_headers("user1")
+        )
+        assert response.status_code == 200
+        assert len(response.json()) <= 1
+
+        future = (datetime.utcnow() + timedelta(days=1)).isoformat()
+        response = requests.get(
+            f"{BASE_URL}/api/groups",
+            headers=get_headers("user1"),
+            params={"updated_since": future}
+        )
+        assert response.status_code == 200
+        assert response.json() == []
+        print("âœ“ Group list supports skip/limit and updated_since")
     
     def test_invite_to_group(self):
         """Test inviting a friend to group"""
@@ -516,6 +1121,238 @@ class TestGroups:
         )
         assert response.status_code == 200
         print(f"âœ“ Invited user to group ID: {group_id}")
+
+    def test_invite_members_reports_each_username(self):
+        """Test a batch invite reports every username's outcome"""
+        owner, owner_headers = register_temp_user("inv_owner")
+        friend, friend_headers = register_temp_user("inv_friend")
+        stranger, _ = register_temp_user("inv_stranger")
+        request_id = requests.post(f"{BASE_URL}/api/friends/request", headers=owner_headers, json={"friend_username": friend}).json()["id"]
+        requests.post(f"{BASE_URL}/api/friends/accept/{request_id}", headers=friend_headers)
+        group_id = requests.post(f"{BASE_URL}/api/groups", headers=owner_headers, json={"name": "Invite batch"}).json()["id"]
+
+        response = requests.post(
+            f"{BASE_URL}/api/groups/{group_id}/invite",
+            headers=owner_headers,
+            json={"usernames": [friend, "no_such_user_xyz", owner, stranger, friend.upper()]}
+        )
+        assert response.status_code == 200
+        assert response.json()["message"] == (
+            "Successfully invited 1 user(s). "
+            "Users not found: no_such_user_xyz. "
+            f"Cannot invite yourself: {owner}. "
+            f"Not friends with: {stranger}. You can only invite friends to groups. "
+            f"Already members: {friend.upper()}"
+        )
+        pending = requests.get(f"{BASE_URL}/api/groups/invitations/pending", headers=friend_headers).json()
+        assert group_id in [g["id"] for g in pending]
+        print(f"âœ“ {response.json()['message']}")
+
+    def test_create_group_expense_validates_members(self):
+        """Test group expense creation with many participants and a non-member"""
+        owner, owner_headers = register_temp_user("gx_owner")
+        members = [register_temp_user(f"gx_member{i}") for i in range(3)]
+        outsider, outsider_headers = register_temp_user("gx_outsider")
+        group_id = requests.post(f"{BASE_URL}/api/groups", headers=owner_headers, json={"name": "Dinner"}).json()["id"]
+        for name, headers in members:
+            request_id = requests.post(f"{BASE_URL}/api/friends/request", headers=owner_headers, json={"friend_username": name}).json()["id"]
+            requests.post(f"{BASE_URL}/api/friends/accept/{request_id}", headers=headers)
+        requests.post(f"{BASE_URL}/api/groups/{group_id}/invite", headers=owner_headers, json={"usernames": [name for name, _ in members]})
+        for _, headers in members:
+            assert requests.post(f"{BASE_URL}/api/groups/{group_id}/join", headers=headers).status_code == 200
+
+        ids = {}
+        for name, headers in [(owner, owner_headers), *members, (outsider, outsider_headers)]:
+            ids[name] = requests.get(f"{BASE_URL}/api/users/me", headers=headers).json()["id"]
+        participant_ids = [ids[owner]] + [ids[name] for name, _ in members]
+        payload = {
+            "description": "Team dinner",
+            "total_amount": 400.0,
+            "category": "Food",
+            "paid_by": ids[owner],
+            "participants": [{"user_id": uid, "share_amount": 100.0} for uid in participant_ids],
+        }
+        response = requests.post(f"{BASE_URL}/api/groups/{group_id}/expenses", headers=owner_headers, json=payload)
+        assert response.status_code == 201
+        assert sorted(p["user_id"] for p in response.json()["participants"]) == sorted(participant_ids)
+
+        payload["participants"][-1]["user_id"] = ids[outsider]
+        response = requests.post(f"{BASE_URL}/api/groups/{group_id}/expenses", headers=owner_headers, json=payload)
+        assert response.status_code == 400
+        assert response.json()["detail"] == f"User {ids[outsider]} is not a member of this group"
+
+        response = requests.post(f"{BASE_URL}/api/groups/{group_id}/expenses", headers=outsider_headers, json=payload)
+        assert response.status_code == 403
+        print(f"âœ“ Group expense with {len(participant_ids)} participants created; non-members rejected")
+
+    def test_bulk_create_group_expenses(self):
+        """Test bulk group expense import is all-or-nothing and updates the ledger"""
+        owner, owner_headers = register_temp_user("gxb_owner")
+        member, member_headers = register_temp_user("gxb_member")
+        outsider, outsider_headers = register_temp_user("gxb_outsider")
+        group_id = requests.post(f"{BASE_URL}/api/groups", headers=owner_headers, json={"name": "Trip"}).json()["id"]
+        request_id = requests.post(f"{BASE_URL}/api/friends/request", headers=owner_headers, json={"friend_username": member}).json()["id"]
+        requests.post(f"{BASE_URL}/api/friends/accept/{request_id}", headers=member_headers)
+        requests.post(f"{BASE_URL}/api/groups/{group_id}/invite", headers=owner_headers, json={"usernames": [member]})
+        assert requests.post(f"{BASE_URL}/api/groups/{group_id}/join", headers=member_headers).status_code == 200
+        owner_id = requests.get(f"{BASE_URL}/api/users/me", headers=owner_headers).json()["id"]
+        member_id = requests.get(f"{BASE_URL}/api/users/me", headers=member_headers).json()["id"]
+        outsider_id = requests.get(f"{BASE_URL}/api/users/me", headers=outsider_headers).json()["id"]
+
+        def row(paid_by, amount, shares):
+            return {
+                "description": f"Trip {amount}",
+                "total_amount": amount,
+                "category": "Travel",
+                "paid_by": paid_by,
+                "participants": [{"user_id": uid, "share_amount": share} for uid, share in shares],
+            }
+
+        rows = [row(owner_id, 100.0, [(owner_id, 50.0), (member_id, 50.0)]) for _ in range(20)]
+        rows.append(row(member_id, 60.0, [(owner_id, 30.0), (member_id, 30.0)]))
+        bad = rows + [
+            row(outsider_id, 10.0, [(owner_id, 10.0)]),
+            row(owner_id, 10.0, [(owner_id, 5.0), (member_id, 4.0)]),
+        ]
+        url = f"{BASE_URL}/api/groups/{group_id}/expenses/bulk"
+        response = requests.post(url, headers=owner_headers, json={"expenses": bad})
+        assert response.status_code == 400
+        assert [e["row"] for e in response.json()["detail"]["errors"]] == [21, 22]
+        assert requests.get(f"{BASE_URL}/api/groups/{group_id}/expenses", headers=owner_headers).json() == []
+
+        response = requests.post(url, headers=outsider_headers, json={"expenses": rows})
+        assert response.status_code == 403
+
+        response = requests.post(url, headers=owner_headers, json={"expenses": rows})
+        assert response.status_code == 201
+        assert response.json()["created"] == len(rows)
+        assert len(requests.get(f"{BASE_URL}/api/groups/{group_id}/expenses", headers=owner_headers).json()) == len(rows)
+        balances = requests.get(f"{BASE_URL}/api/groups/{group_id}/balances", headers=owner_headers).json()
+        assert abs(balances[str(owner_id)]["balance"] - 970.0) < 0.01
+        assert abs(balances[str(member_id)]["balance"] + 970.0) < 0.01
+        print(f"âœ“ Bulk created {len(rows)} group expenses; invalid batch rejected as a whole")
+
+    def test_group_expense_split_types(self):
+        """Test server-side equal, percentage, shares and itemized splits"""
+        owner, owner_headers = register_temp_user("gxs_owner")
+        members = [register_temp_user(f"gxs_member{i}") for i in range(2)]
+        group_id = requests.post(f"{BASE_URL}/api/groups", headers=owner_headers, json={"name": "Flat"}).json()["id"]
+        for name, headers in members:
+            request_id = requests.post(f"{BASE_URL}/api/friends/request", headers=owner_headers, json={"friend_username": name}).json()["id"]
+            requests.post(f"{BASE_URL}/api/friends/accept/{request_id}", headers=headers)
+        requests.post(f"{BASE_URL}/api/groups/{group_id}/invite", headers=owner_headers, json={"usernames": [name for name, _ in members]})
+        for _, headers in members:
+            assert requests.post(f"{BASE_URL}/api/groups/{group_id}/join", headers=headers).status_code == 200
+        a, b, c = [requests.get(f"{BASE_URL}/api/users/me", headers=h).json()["id"]
+                   for h in [owner_headers] + [h for _, h in members]]
+        url = f"{BASE_URL}/api/groups/{group_id}/expenses"
+
+        def create(total, split_type, participants=(), items=None):
+            payload = {"description": split_type, "total_amount": total, "category": "Bills",
+                       "paid_by": a, "split_type": split_type, "participants": list(participants)}
+            if items:
+                payload["items"] = items
+            return requests.post(url, headers=owner_headers, json=payload)
+
+        def shares(response):
+            assert response.status_code == 201, response.text
+            return {p["user_id"]: p["share_amount"] for p in response.json()["participants"]}
+
+        assert shares(create(100.0, "equal", [{"user_id": a}, {"user_id": b}, {"user_id": c}])) == {a: 33.34, b: 33.33, c: 33.33}
+        assert shares(create(200.0, "percentage", [{"user_id": a, "percentage": 50}, {"user_id": b, "percentage": 25},
+                                                   {"user_id": c, "percentage": 25}])) == {a: 100.0, b: 50.0, c: 50.0}
+        assert shares(create(10.0, "shares", [{"user_id": a, "shares": 2}, {"user_id": b, "shares": 1}])) == {a: 6.67, b: 3.33}
+        # 15.00 of tax/tip spread by subtotal (30 / 30 / 40)
+        assert shares(create(115.0, "itemized", items=[{"amount": 60.0, "user_ids": [a, b]},
+                                                       {"amount": 40.0, "user_ids": [c]}])) == {a: 34.5, b: 34.5, c: 46.0}
+
+        response = create(100.0, "percentage", [{"user_id": a, "percentage": 50}, {"user_id": b, "percentage": 40}])
+        assert response.status_code == 400
+        assert "Percentages must add up to 100" in response.json()["detail"]
+        response = create(100.0, "exact", [{"user_id": a, "share_amount": 50.0}, {"user_id": b, "share_amount": 49.99}])
+        assert response.status_code == 400
+        balances = requests.get(f"{BASE_URL}/api/groups/{group_id}/balances?source=live", headers=owner_headers).json()
+        assert sum(round(entry["balance"] * 100) for entry in balances.values()) == 0
+        print("âœ“ Equal, percentage, shares and itemized splits add up to the total to the paisa")
+
+    def test_update_group_expense_total_resplits(self):
+        """Test that editing a group expense's total re-splits it and keeps balances at zero"""
+        owner, owner_headers = register_temp_user("gxu_owner")
+        member, member_headers = register_temp_user("gxu_member")
+        group_id = requests.post(f"{BASE_URL}/api/groups", headers=owner_headers, json={"name": "Edits"}).json()["id"]
+        request_id = requests.post(f"{BASE_URL}/api/friends/request", headers=owner_headers, json={"friend_username": member}).json()["id"]
+        requests.post(f"{BASE_URL}/api/friends/accept/{request_id}", headers=member_headers)
+        requests.post(f"{BASE_URL}/api/groups/{group_id}/invite", headers=owner_headers, json={"usernames": [member]})
+        assert requests.post(f"{BASE_URL}/api/groups/{group_id}/join", headers=member_headers).status_code == 200
+        a, b = [requests.get(f"{BASE_URL}/api/users/me", headers=h).json()["id"] for h in (owner_headers, member_headers)]
+        url = f"{BASE_URL}/api/groups/{group_id}/expenses"
+
+        def create(split_type, participants):
+            response = requests.post(url, headers=owner_headers, json={
+                "description": split_type, "total_amount": 200.0, "category": "Food",
+                "paid_by": a, "split_type": split_type, "participants": participants,
+            })
+            assert response.status_code == 201, response.text
+            return response.json()["id"]
+
+        def assert_balanced():
+            ledger = requests.get(f"{BASE_URL}/api/groups/{group_id}/balances", headers=owner_headers).json()
+            live = requests.get(f"{BASE_URL}/api/groups/{group_id}/balances?source=live", headers=owner_headers).json()
+            assert sum(round(entry["balance"] * 100) for entry in ledger.values()) == 0
+            assert ledger == live
+
+        equal_id = create("equal", [{"user_id": a}, {"user_id": b}])
+        response = requests.put(f"{url}/{equal_id}", headers=owner_headers, json={"total_amount": 1000.01})
+        assert response.status_code == 200, response.text
+        assert response.json()["split_type"] == "equal"
+        assert {p["user_id"]: p["share_amount"] for p in response.json()["participants"]} == {a: 500.01, b: 500.0}
+        assert_balanced()
+        response = requests.put(f"{url}/{equal_id}", headers=owner_headers, json={"date": "2024-02-01"})
+        assert response.status_code == 200, response.text
+        assert response.json()["date"] == "2024-02-01"
+
+        # An exact split can't be redone from the total alone
+        exact_id = create("exact", [{"user_id": a, "share_amount": 150.0}, {"user_id": b, "share_amount": 50.0}])
+        response = requests.put(f"{url}/{exact_id}", headers=owner_headers, json={"total_amount": 300.0})
+        assert response.status_code == 422
+        response = requests.put(f"{url}/{exact_id}", headers=owner_headers, json={
+            "total_amount": 300.0,
+            "participants": [{"user_id": a, "share_amount": 100.0}, {"user_id": b, "share_amount": 200.0}],
+        })
+        assert response.status_code == 200, response.text
+        assert {p["user_id"]: p["share_amount"] for p in response.json()["participants"]} == {a: 100.0, b: 200.0}
+        assert_balanced()
+        print("âœ“ Edited group expense totals re-split and balances still net to zero")
+
+    def test_group_balances_exact_after_many_expenses(self):
+        """Test that ledger and live balances agree to the paisa after many fractional expenses"""
+        owner, owner_headers = register_temp_user("gxn_owner")
+        members = [register_temp_user(f"gxn_member{i}") for i in range(2)]
+        group_id = requests.post(f"{BASE_URL}/api/groups", headers=owner_headers, json={"name": "Snacks"}).json()["id"]
+        for name, headers in members:
+            request_id = requests.post(f"{BASE_URL}/api/friends/request", headers=owner_headers, json={"friend_username": name}).json()["id"]
+            requests.post(f"{BASE_URL}/api/friends/accept/{request_id}", headers=headers)
+        requests.post(f"{BASE_URL}/api/groups/{group_id}/invite", headers=owner_headers, json={"usernames": [name for name, _ in members]})
+        for _, headers in members:
+            assert requests.post(f"{BASE_URL}/api/groups/{group_id}/join", headers=headers).status_code == 200
+        ids = [requests.get(f"{BASE_URL}/api/users/me", headers=h).json()["id"]
+               for h in [owner_headers] + [h for _, h in members]]
+
+        # 0.1 and 0.2 have no exact float representation; 0.10 split three ways leaves a paisa over
+        expenses = [
+            {"description": f"Snack {i}", "total_amount": 0.1 if i % 2 else 0.2, "category": "Food",
+             "paid_by": ids[i % 3], "split_type": "equal", "participants": [{"user_id": uid} for uid in ids]}
+            for i in range(300)
+        ]
+        response = requests.post(f"{BASE_URL}/api/groups/{group_id}/expenses/bulk", headers=owner_headers, json={"expenses": expenses})
+        assert response.status_code == 201
+
+        url = f"{BASE_URL}/api/groups/{group_id}/balances"
+        ledger = requests.get(url, headers=owner_headers).json()
+        live = requests.get(f"{url}?source=live", headers=owner_headers).json()
+        assert ledger == live
+        assert sum(round(entry["balance"] * 100) for entry in ledger.values()) == 0
+        print(f"âœ“ Ledger matches live aggregation exactly after {len(expenses)} fractional expenses")
     
     def test_get_pending_invitations(self):
         """Test getting pending group invitations"""
@@ -575,6 +1412,26 @@ class TestGroups:
         assert data["total_amount"] == expense_data["total_amount"]
         print(f"âœ“ Created group expense ID: {data['id']}")
     
+    def test_list_group_expenses_keyset(self):
+        """Test cursor pagination of group expenses"""
+        if not test_data["group_ids"]:
+            pytest.skip("No groups created yet")
+
+        group_id = test_data["group_ids"][0]
+        response = requests.get(
+            f"{BASE_URL}/api/groups/{group_id}/expenses?limit=1",
+            headers=get_headers("user1")
+        )
+        assert response.status_code == 200
+        assert len(response.json()) <= 1
+
+        response = requests.get(
+            f"{BASE_URL}/api/groups/{group_id}/expenses?cursor=not-a-cursor",
+            headers=get_headers("user1")
+        )
+        assert response.status_code == 400
+        print("âœ“ Group expenses are keyset-paginated")
+
     def test_get_group_balances(self):
         """Test getting group balances"""
         if not test_data["group_ids"]:
@@ -590,6 +1447,63 @@ class TestGroups:
         assert isinstance(data, dict)
         print(f"âœ“ Retrieved group balances")
 
+    def test_group_balances_net_to_zero(self):
+        """Test that ledger balances across a group always net to zero"""
+        if not test_data["group_ids"]:
+            pytest.skip("No groups created yet")
+
+        group_id = test_data["group_ids"][0]
+        response = requests.get(
+            f"{BASE_URL}/api/groups/{group_id}/balances",
+            headers=get_headers("user1")
+        )
+        assert response.status_code == 200
+        total = sum(entry["balance"] for entry in response.json().values())
+        assert abs(total) < 0.01
+        print(f"âœ“ Group balances net to {total}")
+
+    def test_group_balances_live_matches_ledger(self):
+        """Test that the SQL aggregation agrees with the balance ledger"""
+        if not test_data["group_ids"]:
+            pytest.skip("No groups created yet")
+
+        group_id = test_data["group_ids"][0]
+        ledger = requests.get(
+            f"{BASE_URL}/api/groups/{group_id}/balances",
+            headers=get_headers("user1")
+        )
+        live = requests.get(
+            f"{BASE_URL}/api/groups/{group_id}/balances?source=live",
+            headers=get_headers("user1")
+        )
+        assert ledger.status_code == 200
+        assert live.status_code == 200
+        assert ledger.json() == live.json()
+        print(f"âœ“ Live aggregation matches ledger")
+
+    def test_settlement_suggestion_modes(self):
+        """Test every settlement mode and the reported transfer count"""
+        if not test_data["group_ids"]:
+            pytest.skip("No groups created yet")
+
+        group_id = test_data["group_ids"][0]
+        for mode in ["greedy", "heap", "exact"]:
+            response = requests.get(
+                f"{BASE_URL}/api/groups/{group_id}/settlements/suggestions?mode={mode}",
+                headers=get_headers("user1")
+            )
+            assert response.status_code == 200
+            data = response.json()
+            assert int(response.headers["X-Settlement-Transfers"]) == len(data)
+            assert "X-Settlement-Compute-Ms" in response.headers
+            print(f"âœ“ {mode}: {len(data)} transfer(s)")
+
+        response = requests.get(
+            f"{BASE_URL}/api/groups/{group_id}/settlements/suggestions?mode=invalid",
+            headers=get_headers("user1")
+        )
+        assert response.status_code == 400
+
 
 # ========================================
 # MAIN TEST RUNNER
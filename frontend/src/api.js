@@ -116,7 +116,8 @@ export async function getCurrentUser() {
 /* ================= EXPENSES ================= */
 
 export async function getExpenses() {
-  const res = await fetch(`${API_BASE}/api/expenses`, {
+  // The dashboard and charts work on the full history
+  const res = await fetch(`${API_BASE}/api/expenses?unpaginated=true`, {
     headers: authHeaders(),
   });
   return handleResponse(res);
@@ -163,6 +164,23 @@ export async function deleteExpense(id) {
   return handleResponse(res);
 }
 
+/* ================= ANALYTICS ================= */
+
+// params: { startDate, endDate, granularity, groupBy: [], metrics: [] }
+export async function queryAnalytics({ startDate, endDate, granularity, groupBy = [], metrics = [] } = {}) {
+  const params = new URLSearchParams();
+  if (startDate) params.set("start_date", startDate);
+  if (endDate) params.set("end_date", endDate);
+  if (granularity) params.set("granularity", granularity);
+  if (groupBy.length) params.set("group_by", groupBy.join(","));
+  if (metrics.length) params.set("metrics", metrics.join(","));
+
+  const res = await fetch(`${API_BASE}/api/analytics/query?${params}`, {
+    headers: authHeaders(),
+  });
+  return handleResponse(res);
+}
+
 /* ================= DEBTS ================= */
 
 export async function getDebts() {
@@ -220,8 +238,42 @@ export async function deleteDebt(id) {
   return handleResponse(res);
 }
 
+export async function getDebtSchedule(id) {
+  const res = await fetch(`${API_BASE}/api/debts/${id}/schedule`, {
+    headers: authHeaders(),
+  });
+  return handleResponse(res);
+}
+
+export async function getDebtProjection() {
+  const res = await fetch(`${API_BASE}/api/debts/projection`, {
+    headers: authHeaders(),
+  });
+  return handleResponse(res);
+}
+
+export async function simulateDebtPayoff(extraPayment = 0, customOrder = null) {
+  const res = await fetch(`${API_BASE}/api/debts/simulate`, {
+    method: "POST",
+    headers: authHeaders(),
+    body: JSON.stringify({
+      extra_payment: parseFloat(extraPayment) || 0,
+      ...(customOrder && { custom_order: customOrder }),
+    }),
+  });
+  return handleResponse(res);
+}
+
 /* ================= FRIENDS ================= */
 
+export async function searchUsers(query, limit = 10) {
+  const params = new URLSearchParams({ q: query, limit });
+  const res = await fetch(`${API_BASE}/api/users/search?${params}`, {
+    headers: authHeaders(),
+  });
+  return handleResponse(res);
+}
+
 export async function getFriends() {
   const res = await fetch(`${API_BASE}/api/friends`, {
     headers: authHeaders(),
@@ -493,10 +545,15 @@ export async function addGroupExpense(groupId, expenseData) {
     total_amount: parseFloat(expenseData.total_amount),
     category: expenseData.category,
     paid_by: expenseData.paid_by,
-    participants: expenseData.participants.map(p => ({
+    // Server computes shares for equal/percentage/shares/itemized splits
+    split_type: expenseData.split_type || "exact",
+    participants: (expenseData.participants || []).map(p => ({
       user_id: p.user_id,
-      share_amount: parseFloat(p.share_amount),
+      ...(p.share_amount !== undefined && { share_amount: parseFloat(p.share_amount) }),
+      ...(p.percentage !== undefined && { percentage: parseFloat(p.percentage) }),
+      ...(p.shares !== undefined && { shares: parseFloat(p.shares) }),
     })),
+    ...(expenseData.items && { items: expenseData.items }),
     ...(expenseData.date && { date: expenseData.date }),
   };
 
@@ -508,6 +565,16 @@ export async function addGroupExpense(groupId, expenseData) {
   return handleResponse(res);
 }
 
+export async function bulkAddGroupExpenses(groupId, expenses) {
+  // All-or-nothing: a 400 lists every invalid row and nothing is saved
+  const res = await fetch(`${API_BASE}/api/groups/${groupId}/expenses/bulk`, {
+    method: "POST",
+    headers: authHeaders(),
+    body: JSON.stringify({ expenses }),
+  });
+  return handleResponse(res);
+}
+
 export async function updateGroupExpense(groupId, expenseId, expenseData) {
   const payload = {};
   if (expenseData.description) payload.description = expenseData.description;
@@ -516,9 +583,13 @@ export async function updateGroupExpense(groupId, expenseId, expenseData) {
   if (expenseData.paid_by) payload.paid_by = expenseData.paid_by;
   if (expenseData.date) payload.date = expenseData.date;
   if (expenseData.participants) {
+    // New participants re-split the expense; a new total alone only re-splits equal splits
+    payload.split_type = expenseData.split_type || "exact";
     payload.participants = expenseData.participants.map(p => ({
       user_id: p.user_id,
-      share_amount: parseFloat(p.share_amount),
+      ...(p.share_amount !== undefined && { share_amount: parseFloat(p.share_amount) }),
+      ...(p.percentage !== undefined && { percentage: parseFloat(p.percentage) }),
+      ...(p.shares !== undefined && { shares: parseFloat(p.shares) }),
     }));
   }
 
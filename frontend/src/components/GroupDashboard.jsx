@@ -404,12 +404,13 @@ function AddGroupExpenseModal({ groupMembers, currentUserId, onClose, onSubmit }
       return;
     }
     
-    // Validate custom splits if custom method selected
+    // Validate custom splits if custom method selected (in paise, like the server)
     if (formData.split_method === 'custom') {
-      const totalSplits = Object.values(formData.custom_splits).reduce((sum, val) => sum + parseFloat(val || 0), 0);
-      const totalAmount = parseFloat(formData.total_amount);
-      if (Math.abs(totalSplits - totalAmount) > 0.01) {
-        toast.error(`Custom splits (₹${totalSplits.toFixed(2)}) must equal total amount (₹${totalAmount.toFixed(2)})`);
+      const toPaise = (value) => Math.round(parseFloat(value || 0) * 100);
+      const totalSplits = Object.values(formData.custom_splits).reduce((sum, val) => sum + toPaise(val), 0);
+      const totalAmount = toPaise(formData.total_amount);
+      if (totalSplits !== totalAmount) {
+        toast.error(`Custom splits (₹${(totalSplits / 100).toFixed(2)}) must equal total amount (₹${(totalAmount / 100).toFixed(2)})`);
         return;
       }
     }
@@ -417,14 +418,10 @@ function AddGroupExpenseModal({ groupMembers, currentUserId, onClose, onSubmit }
     setSubmitting(true);
     try {
       const totalAmount = parseFloat(formData.total_amount);
-      const participantCount = formData.participants.length;
       
-      // Calculate participants array with share_amount for each
+      // Equal splits are computed by the server; custom ones send each share_amount
       const participants = formData.split_method === 'equal' 
-        ? formData.participants.map(id => ({ 
-            user_id: parseInt(id),
-            share_amount: parseFloat((totalAmount / participantCount).toFixed(2))
-          }))
+        ? formData.participants.map(id => ({ user_id: parseInt(id) }))
         : formData.participants.map(id => ({
             user_id: parseInt(id),
             share_amount: parseFloat(formData.custom_splits[id] || 0)
@@ -435,6 +432,7 @@ function AddGroupExpenseModal({ groupMembers, currentUserId, onClose, onSubmit }
         total_amount: totalAmount,
         category: formData.category,
         paid_by: parseInt(formData.paid_by),
+        split_type: formData.split_method === 'equal' ? "equal" : "exact",
         participants: participants,
         ...(formData.date && { date: formData.date })
       };
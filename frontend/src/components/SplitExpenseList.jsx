@@ -26,8 +26,12 @@ export default function SplitExpenseList({ refresh, onPaymentClick }) {
     setSuggestions(await getSettlementSuggestions());
   }
 
+  // The server's share for this user; leftover paise make shares differ by up to ₹0.01
+  const shareFor = (expense) =>
+    expense.participants.find(p => p.id === currentUserId)?.share_amount ?? 0;
+
   const handleSplitPayment = (expense) => {
-    const splitAmount = expense.total_amount / expense.participants.length;
+    const splitAmount = shareFor(expense);
     if (onPaymentClick) {
       onPaymentClick(expense, splitAmount, "split");
     }
@@ -60,7 +64,7 @@ export default function SplitExpenseList({ refresh, onPaymentClick }) {
 
       <h3>🤝 Split Expenses</h3>
       {splitExpenses.map(exp => {
-        const splitAmount = exp.total_amount / exp.participants.length;
+        const splitAmount = shareFor(exp);
         return (
           <div key={exp.id} style={{ 
             padding: '12px', 